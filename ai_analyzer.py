@@ -1,74 +1,118 @@
+import asyncio
+import copy
 import httpx
-import PyPDF2
-import docx
-import io
 import os
 import json
-from datetime import datetime
-from typing import Dict, Any
-from openai import AsyncOpenAI
+import tempfile
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from extraction import iter_pdf_chunks, iter_docx_chunks, MAX_PDF_PAGES, MAX_DOCX_PARAGRAPHS
+from http_client import download_to_file, DownloadTooLargeError
+from metrics import stage, record_llm_usage, LLM_REQUESTS
+from chunking import count_tokens, truncate_to_tokens, split_into_chunks
+from llm_backends import get_llm_router, close_llm_router
+from partial_json import IncrementalJSONParser
 
 # ==========================================================
 # 1. CONFIGURATION (Inchangée)
 # ==========================================================
-try:
-    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception as e:
-    print(f"⚠️ Erreur initialisation OpenAI: {e}")
-    import openai
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+# Backends (OpenAI, serveur compatible local, stub hors ligne), routage et
+# requêtes de couverture : llm_backends.py. Les clients sont ouverts par
+# open_llm_client() au démarrage des processus qui analysent, ou au premier appel.
+def open_llm_client():
+    get_llm_router().open()
+
+
+async def close_llm_client():
+    await close_llm_router()
+
+# Modèle (model_signature(), ci-dessous) et version du prompt : ils font partie de la
+# clé du cache d'analyse et sont enregistrés avec chaque analyse ; toute modification
+# du prompt d'évaluation doit incrémenter PROMPT_VERSION.
+PROMPT_VERSION = "2024.2-map-reduce"
+
+# --- Paramètres de l'analyse par morceaux (map-reduce) ---
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "auto")                              # "auto", "single" ou "chunked"
+SINGLE_CALL_MAX_TOKENS = int(os.getenv("SINGLE_CALL_MAX_TOKENS", "4000"))       # au-delà, mode "auto" => morceaux
+CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "3000"))
+CHUNK_CONCURRENCY = int(os.getenv("ANALYSIS_CHUNK_CONCURRENCY", "4"))
+DOCUMENT_TOKEN_BUDGET = int(os.getenv("DOCUMENT_TOKEN_BUDGET", "60000"))        # tokens lus au maximum par document
+# Réponse finale reçue en flux : les champs complets sont publiés avant la fin de la réponse
+ANALYSIS_STREAMING = os.getenv("ANALYSIS_STREAMING", "false").lower() == "true"
+
+def token_model() -> str:
+    """Modèle du backend principal : son encodage sert au décompte des tokens."""
+    return get_llm_router().primary_model
+
+
+def model_signature() -> str:
+    """Backends configurés, dans l'ordre : fait partie de la clé du cache d'analyse."""
+    return get_llm_router().signature()
+
+# Reçoit l'analyse partielle à chaque champ complété (voir _stream_json_analysis)
+PartialCallback = Callable[[Dict[str, Any]], Awaitable[None]]
 
 # ==========================================================
 # 2. EXTRACTION DE TEXTE (Avec le correctif pour l'URL)
 # ==========================================================
-async def extract_text_from_file(file_url: str) -> str:
+async def extract_text_from_file(file_url: str, local_path: Optional[str] = None) -> str:
     """
     Télécharge un fichier depuis une URL (PDF ou DOCX), en extrait le texte,
     et applique une logique de troncature pour économiser les tokens.
+    Si `local_path` pointe vers le fichier déjà reçu lors du dépôt, il est lu
+    directement et le téléchargement est évité.
+    Le parsing s'exécute dans le pool de processus d'extraction (extraction.py).
     """
-    print(f"INFO: Tentative de téléchargement et d'extraction depuis {file_url}")
+    # Les fichiers du stockage local (STORAGE_BACKEND=local) sont lus sans passer par HTTP
+    if not local_path and file_url.startswith("file://"):
+        local_path = url2pathname(urlparse(file_url).path)
 
-    async with httpx.AsyncClient() as http_client:
-        try:
-            response = await http_client.get(file_url, follow_redirects=True, timeout=30.0)
-            response.raise_for_status()
-            file_content_bytes = response.content
-        except httpx.RequestError as e:
-            print(f"ERREUR: Échec du téléchargement du fichier: {e}")
-            raise ValueError(f"Impossible de télécharger le fichier depuis l'URL: {file_url}")
+    temp_path = None
+    if local_path and os.path.exists(local_path):
+        print(f"INFO: Extraction depuis le fichier local {local_path}")
+        # L'extension du fichier local fait foi pour le format
+        clean_url = local_path
+    else:
+        print(f"INFO: Tentative de téléchargement et d'extraction depuis {file_url}")
 
-    file_in_memory = io.BytesIO(file_content_bytes)
-    text = ""
+        # --- LE CORRECTIF EST ICI ---
+        # On nettoie l'URL pour enlever les paramètres comme '?'
+        clean_url = file_url.split('?')[0]
 
-    # --- LE CORRECTIF EST ICI ---
-    # On nettoie l'URL pour enlever les paramètres comme '?'
-    clean_url = file_url.split('?')[0]
+        # Téléchargement en flux (client HTTP partagé) directement dans un fichier temporaire :
+        # les processus d'extraction lisent un fichier, on évite de leur transmettre les octets
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(clean_url)[1], delete=False) as tmp:
+            temp_path = tmp.name
+            try:
+                with stage("download"):
+                    timings = await download_to_file(file_url, tmp)
+            except (httpx.HTTPError, DownloadTooLargeError) as e:
+                tmp.close()
+                os.remove(temp_path)
+                print(f"ERREUR: Échec du téléchargement du fichier: {e}")
+                raise ValueError(f"Impossible de télécharger le fichier depuis l'URL: {file_url}")
+        print(
+            f"INFO: Téléchargement {timings['bytes']} octets ({timings['http_version']}) - "
+            f"connexion {timings['connect_ms']} ms, TTFB {timings['ttfb_ms']} ms, transfert {timings['transfer_ms']} ms"
+        )
+        local_path = temp_path
+
+    # Hors mode "single", tout le document est extrait : la limite est le budget de tokens de l'analyse
+    max_pages = MAX_PDF_PAGES if ANALYSIS_MODE == "single" else None
+    max_paragraphs = MAX_DOCX_PARAGRAPHS if ANALYSIS_MODE == "single" else None
 
     try:
         if clean_url.lower().endswith('.pdf'):
-            pdf_reader = PyPDF2.PdfReader(file_in_memory)
-            num_pages = len(pdf_reader.pages)
-            max_pages = min(num_pages, 10)
-            
-            for page_num in range(max_pages):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            if num_pages > 10:
-                text += f"\n[Note: Document tronqué - {num_pages} pages au total, les 10 premières pages ont été analysées]"
+            with stage("extraction"):
+                chunks = [chunk async for chunk in iter_pdf_chunks(local_path, max_pages)]
             print("INFO: Extraction PDF réussie.")
 
         elif clean_url.lower().endswith('.docx'):
-            document = docx.Document(file_in_memory)
-            max_paragraphs = 100
-            paragraphs = document.paragraphs[:max_paragraphs]
-            
-            for paragraph in paragraphs:
-                if paragraph.text.strip():
-                    text += paragraph.text + "\n"
-            
-            if len(document.paragraphs) > max_paragraphs:
-                text += f"\n[Note: Document tronqué - {len(document.paragraphs)} paragraphes au total, les 100 premiers ont été analysés]"
+            with stage("extraction"):
+                chunks = [chunk async for chunk in iter_docx_chunks(local_path, max_paragraphs)]
             print("INFO: Extraction DOCX réussie.")
         else:
             raise ValueError(f"Format de fichier non supporté dans l'URL nettoyée: {clean_url}")
@@ -76,20 +120,18 @@ async def extract_text_from_file(file_url: str) -> str:
     except Exception as e:
         print(f"ERREUR: Échec de l'analyse du contenu du fichier. {e}")
         raise ValueError(f"Erreur lors de l'analyse du contenu du fichier: {file_url}")
+    finally:
+        if temp_path:
+            os.remove(temp_path)
 
-    return text
+    # Une seule concaténation, au lieu de `text += ...` à chaque page
+    return "".join(chunks)
 
 # ==========================================================
 # 3. ANALYSE IA (MISE À JOUR AVEC VALIDATION)
 # ==========================================================
-async def analyze_business_plan(text: str, student_name: str, project_title: str) -> Dict[str, Any]:
-    """Analyser un plan d'affaires avec GPT-3.5-turbo (économique)"""
-    words = text.split()
-    if len(words) > 3000:
-        text = ' '.join(words[:3000]) + "\n\n[Document tronqué pour l'analyse]"
-    
-    # NOUVEAU PROMPT AMÉLIORÉ
-    system_prompt = """Tu es un expert en évaluation de plans d'affaires académiques.
+# NOUVEAU PROMPT AMÉLIORÉ
+SYSTEM_PROMPT = """Tu es un expert en évaluation de plans d'affaires académiques.
 
 ÉTAPE 1 - VALIDATION : Vérifie d'abord si le document est un plan d'affaires valide.
 Un plan d'affaires DOIT contenir au minimum :
@@ -126,176 +168,250 @@ IMPORTANT :
 - Sois STRICT sur les scores. Un document incomplet < 40/100
 - Note 0 les sections totalement absentes
 - Retourne UNIQUEMENT le JSON, aucun autre texte"""
-    
-    user_prompt = f"Plan d'affaires de {student_name} - Projet: {project_title}\n\n{text}\n\nFournis l'analyse JSON."
-    
+
+# Résumé d'une section pour l'analyse par morceaux (étape "map")
+SECTION_SUMMARY_PROMPT = """Tu prépares l'évaluation d'un plan d'affaires académique trop long pour être lu d'un bloc.
+On te donne UNE section du document. Résume-la en français en 150 à 250 mots, de façon factuelle.
+Conserve impérativement : le produit/service, la clientèle cible et l'analyse de marché, le modèle de revenus,
+la stratégie marketing, et TOUS les chiffres (prix, volumes, coûts, projections financières, hypothèses).
+Si la section ne contient rien d'utile pour évaluer un plan d'affaires, réponds simplement "Section sans contenu pertinent"."""
+
+DEFAULT_SCORES = {
+    'viabilite_concept': 10,
+    'etude_marche': 10,
+    'modele_economique': 10,
+    'strategie_marketing': 10,
+    'projections_financieres': 10
+}
+
+
+def rejected_analysis(reason: str) -> Dict[str, Any]:
+    return {
+        "document_valide": False,
+        "raison_rejet": reason,
+        "score_global": 0,
+        "scores": {
+            "viabilite_concept": 0,
+            "etude_marche": 0,
+            "modele_economique": 0,
+            "strategie_marketing": 0,
+            "projections_financieres": 0
+        },
+        "resume_executif": reason,
+        "points_forts": [],
+        "axes_amelioration": ["Document non conforme aux exigences d'un plan d'affaires"],
+        "recommandations": ["Soumettre un véritable plan d'affaires"]
+    }
+
+
+def _normalize_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Valide et complète le JSON renvoyé par le modèle (même schéma quel que soit le mode)."""
+    # Vérifier si le document est valide
+    if not analysis.get('document_valide', True):
+        # Document rejeté
+        return rejected_analysis(analysis.get('raison_rejet', 'Document non conforme'))
+
+    # Document valide - continuer avec le traitement normal
+    if 'scores' not in analysis: 
+        analysis['scores'] = {}
+
+    for key, default in DEFAULT_SCORES.items():
+        if key not in analysis['scores']: 
+            analysis['scores'][key] = default
+
+    # Convertir les scores en entiers
+    for key, value in analysis['scores'].items():
+        try:
+            analysis['scores'][key] = int(value)
+        except (ValueError, TypeError):
+            analysis['scores'][key] = 0  # 0 si erreur de conversion
+
+    # Calculer le score global si absent
+    if 'score_global' not in analysis:
+        total = sum(analysis['scores'].values())
+        analysis['score_global'] = int(total)
+    else:
+        try:
+            analysis['score_global'] = int(analysis['score_global'])
+        except:
+            analysis['score_global'] = sum(analysis['scores'].values())
+
+    return analysis
+
+
+def _as_int(value) -> Optional[int]:
     try:
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def normalize_partial_analysis(partial: Any) -> Dict[str, Any]:
+    """
+    Analyse partielle (reçue en flux) prête au rendu : mêmes conversions que
+    _normalize_analysis, mais un champ absent ou illisible reste absent (« … »).
+    """
+    analysis = dict(partial) if isinstance(partial, dict) else {}
+    # Le verdict de rejet n'est affiché qu'avec l'analyse finale
+    analysis.pop('document_valide', None)
+    scores = analysis.get('scores')
+    scores = {key: _as_int(value) for key, value in scores.items()} if isinstance(scores, dict) else {}
+    analysis['scores'] = {key: value for key, value in scores.items() if value is not None}
+    if 'score_global' in analysis:
+        score_global = _as_int(analysis['score_global'])
+        if score_global is None:
+            del analysis['score_global']
+        else:
+            analysis['score_global'] = score_global
+    for key in ('points_forts', 'axes_amelioration', 'recommandations'):
+        if key in analysis and not isinstance(analysis[key], list):
+            analysis[key] = [str(analysis[key])]
+    return analysis
+
+
+async def _chat_completion(messages, max_tokens: int, purpose: str, **kwargs):
+    """
+    Appel au modèle par le routeur : backend choisi d'après ses statistiques,
+    limiteur du backend (débit, tentatives, disjoncteur) et requête de couverture
+    si la réponse tarde. Retourne la réponse et le backend qui l'a produite.
+    """
+    estimated_tokens = sum(count_tokens(m["content"], token_model()) for m in messages) + max_tokens
+    try:
+        with stage("llm_call"):
+            raw, backend = await get_llm_router().call(
+                purpose,
+                lambda backend: backend.create(messages=messages, max_tokens=max_tokens, **kwargs),
+                estimated_tokens
+            )
+    except Exception:
+        LLM_REQUESTS.labels(outcome="error").inc()
+        raise
+    LLM_REQUESTS.labels(outcome="success").inc()
+    response = raw.parse()
+    record_llm_usage(getattr(response, "usage", None))
+    return response, backend
+
+
+async def _stream_json_analysis(messages, on_partial: PartialCallback, **kwargs) -> Tuple[Dict[str, Any], str]:
+    """
+    Même appel que _request_json_analysis, en flux : chaque champ complété de
+    l'analyse (résumé, chaque note, listes...) est transmis à `on_partial` sans
+    attendre la fin de la réponse. Pas de requête de couverture : deux flux
+    publieraient des analyses partielles concurrentes (bascule sur échec seulement).
+    """
+    estimated_tokens = sum(count_tokens(m["content"], token_model()) for m in messages) + kwargs["max_tokens"]
+
+    async def stream(backend):
+        # Le flux est lu en entier dans la requête : une coupure en cours de réponse
+        # est retentée (puis reportée) comme un échec de l'appel lui-même
+        parser = IncrementalJSONParser()
+        raw = await backend.create(messages=messages, stream=True, **kwargs)
+        async for chunk in raw.parse():
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if parser.feed(chunk.choices[0].delta.content):
+                await on_partial(copy.deepcopy(parser.partial))
+        return SimpleNamespace(headers=getattr(raw, "headers", None), parser=parser)
+
+    try:
+        with stage("llm_call"):
+            # Usage distinct : ces latences couvrent toute la réponse diffusée et
+            # ne doivent pas fixer le délai de couverture des analyses non diffusées
+            result, backend = await get_llm_router().call("analysis_stream", stream, estimated_tokens, hedge=False)
+    except Exception:
+        LLM_REQUESTS.labels(outcome="error").inc()
+        raise
+    LLM_REQUESTS.labels(outcome="success").inc()
+    parser = result.parser
+    # Le flux ne renvoie pas `usage` avec cette version du SDK : décompte local
+    record_llm_usage(SimpleNamespace(
+        prompt_tokens=estimated_tokens - kwargs["max_tokens"],
+        completion_tokens=count_tokens(parser.buffer, token_model()),
+    ))
+    return json.loads(parser.buffer), backend.label
+
+
+async def _request_json_analysis(user_prompt: str,
+                                 on_partial: Optional[PartialCallback] = None) -> Tuple[Dict[str, Any], str]:
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    options = dict(max_tokens=1000, temperature=0.7, response_format={"type": "json_object"})
+    if on_partial is not None and ANALYSIS_STREAMING:
+        return await _stream_json_analysis(messages, on_partial, **options)
+    response, backend = await _chat_completion(messages, purpose="analysis", **options)
+    return json.loads(response.choices[0].message.content), backend.label
+
+
+async def _summarize_section(section: str, index: int, total: int, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        response, _ = await _chat_completion(
+            [
+                {"role": "system", "content": SECTION_SUMMARY_PROMPT},
+                {"role": "user", "content": f"Section {index + 1}/{total} :\n\n{section}"}
             ],
-            temperature=0.7,
-            max_tokens=1000,
-            response_format={"type": "json_object"}
+            max_tokens=400,
+            purpose="summary",
+            temperature=0.2,
         )
-        analysis = json.loads(response.choices[0].message.content)
-        
-        # Vérifier si le document est valide
-        if not analysis.get('document_valide', True):
-            # Document rejeté
-            return {
-                "document_valide": False,
-                "raison_rejet": analysis.get('raison_rejet', 'Document non conforme'),
-                "score_global": 0,
-                "scores": {
-                    "viabilite_concept": 0,
-                    "etude_marche": 0,
-                    "modele_economique": 0,
-                    "strategie_marketing": 0,
-                    "projections_financieres": 0
-                },
-                "resume_executif": analysis.get('raison_rejet', 'Document rejeté'),
-                "points_forts": [],
-                "axes_amelioration": ["Document non conforme aux exigences d'un plan d'affaires"],
-                "recommandations": ["Soumettre un véritable plan d'affaires"]
-            }
-        
-        # Document valide - continuer avec le traitement normal
-        if 'scores' not in analysis: 
-            analysis['scores'] = {}
-        
-        default_scores = {
-            'viabilite_concept': 10, 
-            'etude_marche': 10, 
-            'modele_economique': 10, 
-            'strategie_marketing': 10, 
-            'projections_financieres': 10
-        }
-        
-        for key, default in default_scores.items():
-            if key not in analysis['scores']: 
-                analysis['scores'][key] = default
-        
-        # Convertir les scores en entiers
-        for key, value in analysis['scores'].items():
-            try:
-                analysis['scores'][key] = int(value)
-            except (ValueError, TypeError):
-                analysis['scores'][key] = 0  # 0 si erreur de conversion
-
-        # Calculer le score global si absent
-        if 'score_global' not in analysis:
-            total = sum(analysis['scores'].values())
-            analysis['score_global'] = int(total)
-        else:
-            try:
-                analysis['score_global'] = int(analysis['score_global'])
-            except:
-                analysis['score_global'] = sum(analysis['scores'].values())
+        return response.choices[0].message.content.strip()
 
-        return analysis
-        
-    except Exception as e:
-        print(f"Erreur OpenAI: {e}")
-        return {
-            "document_valide": True,
-            "error": str(e), 
-            "resume_executif": "Erreur lors de l'analyse automatique.", 
-            "score_global": 50, 
-            "scores": default_scores, 
-            "points_forts": ["Analyse non disponible"], 
-            "axes_amelioration": ["Analyse non disponible"], 
-            "recommandations": ["Réessayer l'analyse"]
-        }
 
-# ==========================================================
-# 4. GÉNÉRATION DU RAPPORT (MISE À JOUR POUR GÉRER LES REJETS)
-# ==========================================================
-def generate_formatted_report(analysis: Dict[str, Any], student_name: str, project_title: str, processing_time: int) -> str:
-    """Générer un rapport HTML formaté"""
-    
-    # Vérifier si le document a été rejeté
-    if not analysis.get('document_valide', True):
-        return f"""
-        <div style="font-family: 'Inter', -apple-system, sans-serif; line-height: 1.6; color: #333;">
-            <div style="background: linear-gradient(135deg, #f44336 0%, #d32f2f 100%); color: white; padding: 30px; border-radius: 16px; margin-bottom: 30px; text-align: center;">
-                <h1 style="margin: 0 0 10px 0;">❌ Document Non Valide</h1>
-                <p style="margin: 0; opacity: 0.9;">Ce document n'est pas un plan d'affaires</p>
-            </div>
-            <div style="background: #ffebee; padding: 25px; border-radius: 12px; margin-bottom: 25px; border-left: 4px solid #f44336;">
-                <h2 style="color: #c62828; margin-top: 0;">🚫 Raison du Rejet</h2>
-                <p style="margin: 0; font-size: 1.1em;">{analysis.get('raison_rejet', 'Document non conforme aux exigences')}</p>
-            </div>
-            <div style="background: #f8f9fa; padding: 25px; border-radius: 12px; margin-bottom: 25px;">
-                <h2 style="color: #333; margin-top: 0;">📋 Informations de la Soumission</h2>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr><td style="padding: 8px 0;"><strong>Étudiant:</strong></td><td style="padding: 8px 0;">{student_name}</td></tr>
-                    <tr><td style="padding: 8px 0;"><strong>Titre du projet:</strong></td><td style="padding: 8px 0;">{project_title}</td></tr>
-                    <tr><td style="padding: 8px 0;"><strong>Date:</strong></td><td style="padding: 8px 0;">{datetime.now().strftime('%d/%m/%Y à %H:%M')}</td></tr>
-                    <tr><td style="padding: 8px 0;"><strong>Score:</strong></td><td style="padding: 8px 0;"><span style="font-size: 1.5em; color: #f44336; font-weight: bold;">0/100</span></td></tr>
-                </table>
-            </div>
-            <div style="background: #fff3e0; padding: 25px; border-radius: 12px; margin-bottom: 25px;">
-                <h2 style="color: #F57C00; margin-top: 0;">⚠️ Recommandation</h2>
-                <p style="margin: 0;">L'étudiant doit soumettre un véritable plan d'affaires comprenant au minimum :</p>
-                <ul style="margin: 10px 0 0 20px;">
-                    <li>Une description claire du produit ou service</li>
-                    <li>Une analyse du marché cible</li>
-                    <li>Un modèle économique ou stratégie de revenus</li>
-                </ul>
-            </div>
-            <div style="background: #f5f5f5; padding: 20px; border-radius: 12px; text-align: center; color: #666; font-size: 0.9em;">
-                <p style="margin: 0;">⚡ Analyse effectuée en {processing_time} secondes<br>📧 Notification envoyée au professeur</p>
-            </div>
-        </div>
-        """
-    
-    # Rapport normal pour un document valide
-    scores = analysis.get('scores', {})
-    score_global = analysis.get('score_global', 0)
-    
-    if score_global >= 80: color_score = "#4CAF50"
-    elif score_global >= 60: color_score = "#FF9800"
-    else: color_score = "#f44336"
-    
-    completude = analysis.get('completude', 'N/A')
-    
-    report_html = f"""
-    <div style="font-family: 'Inter', -apple-system, sans-serif; line-height: 1.6; color: #333;">
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; border-radius: 16px; margin-bottom: 30px;">
-            <h1 style="margin: 0 0 10px 0;">📊 Rapport d'Analyse Automatique</h1>
-            <p style="margin: 0; opacity: 0.9;">Évaluation par Intelligence Artificielle</p>
-        </div>
-        <div style="background: #f8f9fa; padding: 25px; border-radius: 12px; margin-bottom: 25px;">
-            <h2 style="color: #333; margin-top: 0;">📋 Informations du Projet</h2>
-            <table style="width: 100%; border-collapse: collapse;">
-                <tr><td style="padding: 8px 0;"><strong>Étudiant:</strong></td><td style="padding: 8px 0;">{student_name}</td></tr>
-                <tr><td style="padding: 8px 0;"><strong>Projet:</strong></td><td style="padding: 8px 0;">{project_title}</td></tr>
-                <tr><td style="padding: 8px 0;"><strong>Date:</strong></td><td style="padding: 8px 0;">{datetime.now().strftime('%d/%m/%Y à %H:%M')}</td></tr>
-                <tr><td style="padding: 8px 0;"><strong>Score Global:</strong></td><td style="padding: 8px 0;"><span style="font-size: 1.5em; color: {color_score}; font-weight: bold;">{score_global}/100</span></td></tr>
-                <tr><td style="padding: 8px 0;"><strong>Complétude:</strong></td><td style="padding: 8px 0;">{completude}</td></tr>
-            </table>
-        </div>
-        <div style="background: #e3f2fd; padding: 25px; border-radius: 12px; margin-bottom: 25px; border-left: 4px solid #2196F3;">
-            <h2 style="color: #1976D2; margin-top: 0;">🎯 Résumé Exécutif</h2>
-            <p style="margin: 0;">{analysis.get('resume_executif', 'Non disponible')}</p>
-        </div>
-        <div style="margin-bottom: 25px;">
-            <h2 style="color: #333;">📊 Scores Détaillés</h2>
-            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(180px, 1fr)); gap: 15px;">
-                <div style="background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;"><div style="color: #666; font-size: 0.9em; margin-bottom: 5px;">Viabilité du Concept</div><div style="font-size: 1.8em; font-weight: bold; color: #667eea;">{scores.get('viabilite_concept', 0)}/20</div></div>
-                <div style="background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;"><div style="color: #666; font-size: 0.9em; margin-bottom: 5px;">Étude de Marché</div><div style="font-size: 1.8em; font-weight: bold; color: #667eea;">{scores.get('etude_marche', 0)}/20</div></div>
-                <div style="background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;"><div style="color: #666; font-size: 0.9em; margin-bottom: 5px;">Modèle Économique</div><div style="font-size: 1.8em; font-weight: bold; color: #667eea;">{scores.get('modele_economique', 0)}/20</div></div>
-                <div style="background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;"><div style="color: #666; font-size: 0.9em; margin-bottom: 5px;">Stratégie Marketing</div><div style="font-size: 1.8em; font-weight: bold; color: #667eea;">{scores.get('strategie_marketing', 0)}/20</div></div>
-                <div style="background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;"><div style="color: #666; font-size: 0.9em; margin-bottom: 5px;">Projections Financières</div><div style="font-size: 1.8em; font-weight: bold; color: #667eea;">{scores.get('projections_financieres', 0)}/20</div></div>
-            </div>
-        </div>
-        <div style="background: #e8f5e9; padding: 25px; border-radius: 12px; margin-bottom: 25px;"><h2 style="color: #2E7D32; margin-top: 0;">💪 Points Forts</h2><ul style="margin: 0; padding-left: 20px;">{''.join([f"<li style='margin: 5px 0;'>{point}</li>" for point in analysis.get('points_forts', [])])}</ul></div>
-        <div style="background: #fff3e0; padding: 25px; border-radius: 12px; margin-bottom: 25px;"><h2 style="color: #F57C00; margin-top: 0;">🎯 Axes d'Amélioration</h2><ul style="margin: 0; padding-left: 20px;">{''.join([f"<li style='margin: 5px 0;'>{axe}</li>" for axe in analysis.get('axes_amelioration', [])])}</ul></div>
-        <div style="background: #f3e5f5; padding: 25px; border-radius: 12px; margin-bottom: 25px;"><h2 style="color: #7B1FA2; margin-top: 0;">💡 Recommandations</h2><ol style="margin: 0; padding-left: 20px;">{''.join([f"<li style='margin: 5px 0;'>{reco}</li>" for reco in analysis.get('recommandations', [])])}</ol></div>
-        <div style="background: #f5f5f5; padding: 20px; border-radius: 12px; text-align: center; color: #666; font-size: 0.9em;"><p style="margin: 0;">⚡ Analyse générée par GPT-3.5 en {processing_time} secondes<br>📧 Ce rapport a été envoyé au professeur responsable</p></div>
-    </div>
+async def _analyze_in_chunks(text: str, student_name: str, project_title: str,
+                             on_partial: Optional[PartialCallback] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Analyse par morceaux : chaque section est résumée en parallèle (concurrence
+    plafonnée), puis un appel final évalue le plan à partir des résumés et
+    produit le même JSON que l'analyse en un seul appel.
+    """
+    note = ""
+    if count_tokens(text, token_model()) > DOCUMENT_TOKEN_BUDGET:
+        text = truncate_to_tokens(text, DOCUMENT_TOKEN_BUDGET, token_model())
+        note = f"\n\n[Document tronqué : seuls les {DOCUMENT_TOKEN_BUDGET} premiers tokens ont été lus]"
+
+    sections = split_into_chunks(text, CHUNK_TOKENS, token_model())
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+    summaries = await asyncio.gather(*[
+        _summarize_section(section, i, len(sections), semaphore) for i, section in enumerate(sections)
+    ])
+    print(f"INFO: Analyse par morceaux - {len(sections)} sections résumées.")
+
+    combined = "\n\n".join(f"--- Section {i + 1}/{len(sections)} ---\n{summary}" for i, summary in enumerate(summaries))
+    user_prompt = (
+        f"Plan d'affaires de {student_name} - Projet: {project_title}\n\n"
+        f"Le document complet a été découpé en {len(sections)} sections, résumées ci-dessous dans l'ordre. "
+        f"Évalue le plan d'affaires dans son ensemble.\n\n{combined}{note}\n\nFournis l'analyse JSON."
+    )
+    return await _request_json_analysis(user_prompt, on_partial)
+
+
+async def analyze_business_plan(text: str, student_name: str, project_title: str,
+                                on_partial: Optional[PartialCallback] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Analyser un plan d'affaires avec le backend configuré (LLM_BACKENDS).
+    Les documents longs sont analysés par morceaux au lieu d'être tronqués.
+    Avec ANALYSIS_STREAMING, `on_partial` reçoit l'analyse partielle au fil de la réponse.
+    Retourne l'analyse et le backend:modèle qui a produit l'évaluation finale.
+    Lève LLMUnavailableError si le modèle reste indisponible malgré les tentatives.
     """
-    return report_html
\ No newline at end of file
+    use_chunks = ANALYSIS_MODE == "chunked" or (
+        ANALYSIS_MODE == "auto" and count_tokens(text, token_model()) > SINGLE_CALL_MAX_TOKENS
+    )
+
+    try:
+        if use_chunks:
+            analysis, model = await _analyze_in_chunks(text, student_name, project_title, on_partial)
+        else:
+            words = text.split()
+            if len(words) > 3000:
+                text = ' '.join(words[:3000]) + "\n\n[Document tronqué pour l'analyse]"
+            user_prompt = f"Plan d'affaires de {student_name} - Projet: {project_title}\n\n{text}\n\nFournis l'analyse JSON."
+            analysis, model = await _request_json_analysis(user_prompt, on_partial)
+
+        return _normalize_analysis(analysis), model
+
+    except Exception as e:
+        # Plus de fausse note 50/100 : l'erreur remonte et la soumission est rejouée ou marquée en erreur
+        print(f"Erreur LLM: {e}")
+        raise
@@ -0,0 +1,90 @@
+# ==========================================================
+# CACHE D'ANALYSE ADRESSÉ PAR LE CONTENU
+# ==========================================================
+# Deux niveaux, chacun borné en taille (octets) avec éviction LRU :
+#   1. texte extrait, indexé par le SHA-256 du fichier déposé ;
+#   2. analyse normalisée, indexée par (hash du texte, version du prompt, modèle).
+# Une resoumission du même document ne retélécharge rien et ne rappelle pas l'IA.
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+
+def sha256_hex(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _size_of(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class ByteLRUCache:
+    """Cache LRU dont la capacité est exprimée en octets et non en nombre d'entrées."""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return  # une entrée plus grosse que le cache entier n'est pas conservée
+
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+text_cache = ByteLRUCache("text", TEXT_CACHE_MAX_BYTES)
+analysis_cache = ByteLRUCache("analysis", ANALYSIS_CACHE_MAX_BYTES)
+
+
+def analysis_cache_key(text_hash: str, prompt_version: str, model: str) -> Tuple[str, str, str]:
+    return (text_hash, prompt_version, model)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {"text": text_cache.stats(), "analysis": analysis_cache.stats()}
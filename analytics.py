@@ -0,0 +1,154 @@
+# ==========================================================
+# STATISTIQUES DE NOTES PAR PROFESSEUR
+# ==========================================================
+# Les agrégats viennent de professor_score_summary (migration 009) : une ligne
+# par critère avec effectif, somme, somme des carrés et histogramme exact des
+# notes. Moyenne, écart type, percentiles et distribution s'en déduisent sans
+# relire les soumissions : le coût ne dépend pas de leur nombre.
+# Seule la liste des valeurs aberrantes lit submission_scores, limitée aux
+# lignes hors des bornes calculées depuis l'histogramme.
+import math
+from typing import Dict, Any, List
+
+from report import SCORE_LABELS
+
+ANALYTICS_PERCENTILES = (10, 25, 50, 75, 90)
+ANALYTICS_MAX_OUTLIERS = 50
+# En dessous de cet effectif, les bornes de Tukey n'ont pas de sens
+ANALYTICS_MIN_OUTLIER_SAMPLE = 5
+OUTLIER_MIN_ZSCORE = 2.0
+
+CRITERIA_LABELS = [("score_global", "Score Global")] + SCORE_LABELS
+CRITERIA_MAX = {name: 20 for name, _ in SCORE_LABELS}
+CRITERIA_MAX["score_global"] = 100
+
+
+def _value_at_rank(histogram: List[int], rank: int) -> int:
+    """Valeur de rang `rank` (0 = plus petite) dans la série décrite par l'histogramme."""
+    seen = 0
+    for value, count in enumerate(histogram):
+        seen += count
+        if seen > rank:
+            return value
+    return len(histogram) - 1
+
+
+def histogram_percentile(histogram: List[int], n: int, percentile: float) -> float:
+    """Même interpolation linéaire que percentile_cont de PostgreSQL."""
+    position = (n - 1) * percentile / 100
+    lower = _value_at_rank(histogram, math.floor(position))
+    upper = _value_at_rank(histogram, math.ceil(position))
+    return lower + (upper - lower) * (position - math.floor(position))
+
+
+def _distribution(histogram: List[int], max_score: int) -> List[Dict[str, int]]:
+    # Un point par case pour les critères sur 20 ; tranches de 10 pour le score global,
+    # la dernière (90-100) incluant la note maximale
+    if max_score > 20:
+        edges = [(start, start + 9) for start in range(0, max_score - 10, 10)] + [(max_score - 10, max_score)]
+    else:
+        edges = [(value, value) for value in range(max_score + 1)]
+    return [{"min": low, "max": high, "count": sum(histogram[low:high + 1])} for low, high in edges]
+
+
+def criterion_stats(name: str, label: str, n: int, total: int, total_sq: int,
+                    histogram: List[int]) -> Dict[str, Any]:
+    max_score = CRITERIA_MAX[name]
+    stats: Dict[str, Any] = {"criterion": name, "label": label, "max": max_score, "count": n}
+    if n <= 0:
+        stats.update({"mean": None, "std": None, "min_score": None, "max_score": None,
+                      "percentiles": {}, "distribution": _distribution([0] * 101, max_score), "fences": None})
+        return stats
+
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    percentiles = {f"p{p}": round(histogram_percentile(histogram, n, p), 2) for p in ANALYTICS_PERCENTILES}
+    q1, q3 = percentiles["p25"], percentiles["p75"]
+    iqr = q3 - q1
+    stats.update({
+        "mean": round(mean, 2),
+        "std": round(math.sqrt(variance), 2),
+        "min_score": _value_at_rank(histogram, 0),
+        "max_score": _value_at_rank(histogram, n - 1),
+        "percentiles": percentiles,
+        "distribution": _distribution(histogram, max_score),
+        "fences": {"low": round(q1 - 1.5 * iqr, 2), "high": round(q3 + 1.5 * iqr, 2)}
+        if n >= ANALYTICS_MIN_OUTLIER_SAMPLE else None,
+    })
+    return stats
+
+
+async def _fetch_outliers(conn, professor_id: str, criteria: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Soumissions hors des bornes de Tukey sur au moins un critère, et à au moins
+    OUTLIER_MIN_ZSCORE écarts types de la moyenne (évite de signaler toute la
+    classe quand l'écart interquartile est nul).
+    """
+    bounds = {}
+    for name, stats in criteria.items():
+        if not stats["fences"] or not stats["std"]:
+            continue
+        margin = OUTLIER_MIN_ZSCORE * stats["std"]
+        low = min(stats["fences"]["low"], stats["mean"] - margin)
+        high = max(stats["fences"]["high"], stats["mean"] + margin)
+        bounds[name] = (low, high)
+    if not bounds:
+        return []
+
+    # Noms de colonnes issus de CRITERIA_LABELS, jamais de la requête HTTP
+    conditions, params = [], [professor_id]
+    for name, (low, high) in bounds.items():
+        conditions.append(f"(sc.{name} < %s OR sc.{name} > %s)")
+        params.extend([low, high])
+    columns = ", ".join(f"sc.{name}" for name, _ in CRITERIA_LABELS)
+    cursor = await conn.execute(
+        f"""
+        SELECT s.id, s.student_name, s.project_title, {columns}
+        FROM submission_scores sc JOIN submissions s ON s.id = sc.submission_id
+        WHERE sc.professor_id = %s AND ({' OR '.join(conditions)})
+        ORDER BY sc.score_global NULLS LAST, s.id
+        LIMIT %s
+        """,
+        params + [ANALYTICS_MAX_OUTLIERS]
+    )
+    outliers = []
+    for row in await cursor.fetchall():
+        scores = dict(zip((name for name, _ in CRITERIA_LABELS), row[3:]))
+        flags = []
+        for name, (low, high) in bounds.items():
+            value = scores[name]
+            if value is None or low <= value <= high:
+                continue
+            stats = criteria[name]
+            flags.append({
+                "criterion": name,
+                "score": value,
+                "direction": "bas" if value < low else "haut",
+                "zscore": round((value - stats["mean"]) / stats["std"], 2),
+            })
+        outliers.append({
+            "submission_id": str(row[0]), "student_name": row[1], "project_title": row[2],
+            "scores": scores, "flags": flags,
+        })
+    return outliers
+
+
+async def fetch_professor_analytics(conn, professor_id: str) -> Dict[str, Any]:
+    cursor = await conn.execute(
+        "SELECT criterion, n, total, total_sq, histogram FROM professor_score_summary WHERE professor_id = %s",
+        (professor_id,)
+    )
+    rows = {row[0]: row[1:] for row in await cursor.fetchall()}
+
+    criteria: Dict[str, Dict[str, Any]] = {}
+    for name, label in CRITERIA_LABELS:
+        n, total, total_sq, histogram = rows.get(name, (0, 0, 0, [0] * 101))
+        criteria[name] = criterion_stats(name, label, n, total, total_sq, histogram)
+
+    return {
+        "analyzed": criteria["score_global"]["count"],
+        "class_average": criteria["score_global"]["mean"],
+        "criteria": list(criteria.values()),
+        "outliers": await _fetch_outliers(conn, professor_id, criteria),
+    }
+
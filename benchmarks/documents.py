@@ -0,0 +1,90 @@
+# ==========================================================
+# GÉNÉRATION DE PLANS D'AFFAIRES FACTICES (PDF / DOCX)
+# ==========================================================
+# Les PDF sont écrits à la main (texte Helvetica, un flux par page) : aucune
+# dépendance en plus de celles de l'application. Chaque document reçoit une
+# graine qui rend son texte unique, pour ne pas fausser les caches.
+import random
+from typing import List
+
+SECTIONS = [
+    "Sommaire exécutif", "Étude de marché", "Proposition de valeur", "Modèle d'affaires",
+    "Stratégie marketing", "Plan des opérations", "Équipe de gestion", "Prévisions financières",
+]
+WORDS = (
+    "clients marché croissance revenus marge concurrence segment canal distribution prix coût "
+    "investissement trésorerie rentabilité partenaires fournisseurs production innovation risque "
+    "stratégie équipe objectifs ventes prévisions financement subvention local export numérique"
+).split()
+
+
+def _sentences(rng: random.Random, count: int) -> List[str]:
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 18))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def business_plan_paragraphs(seed: str, paragraphs: int) -> List[str]:
+    rng = random.Random(seed)
+    lines = [f"Plan d'affaires - projet {seed}"]
+    for i in range(paragraphs):
+        if i % 12 == 0:
+            lines.append(SECTIONS[(i // 12) % len(SECTIONS)])
+        lines.append(" ".join(_sentences(rng, rng.randint(2, 4))))
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, seed: str, pages: int):
+    rng = random.Random(seed)
+    page_streams = []
+    for page in range(pages):
+        lines = [f"Plan d'affaires {seed} - page {page + 1}"] + _sentences(rng, 35)
+        commands = ["BT", "/F1 10 Tf", "50 800 Td", "12 TL"]
+        for line in lines:
+            for start in range(0, len(line), 95):
+                commands.append(f"({_pdf_escape(line[start:start + 95])}) '")
+        commands.append("ET")
+        page_streams.append("\n".join(commands).encode("latin-1", "replace"))
+
+    # Objets : 1 catalogue, 2 arbre des pages, 3 police, puis (page, contenu) par page
+    objects = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for stream in page_streams:
+        page_id, content_id = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, seed: str, paragraphs: int):
+    import docx
+    document = docx.Document()
+    for i, text in enumerate(business_plan_paragraphs(seed, paragraphs)):
+        if i == 0:
+            document.add_heading(text, level=1)
+        else:
+            document.add_paragraph(text)
+    document.save(path)
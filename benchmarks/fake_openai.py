@@ -0,0 +1,131 @@
+# ==========================================================
+# FAUX SERVEUR OPENAI POUR LES BENCHMARKS
+# ==========================================================
+# Imite POST /v1/chat/completions : latence configurable (loi log-normale
+# autour de la moyenne), proportion de réponses 429 avec Retry-After, en-têtes
+# x-ratelimit-* et champ `usage`, pour exercer le limiteur comme en production.
+# Avec "stream": true, la réponse est envoyée en morceaux (text/event-stream) :
+# le premier après FAKE_OPENAI_TTFT_RATIO de la latence, le reste étalé ensuite.
+#
+# Lancement seul : FAKE_OPENAI_LATENCY_MS=800 FAKE_OPENAI_429_RATE=0.05 \
+#                  uvicorn benchmarks.fake_openai:app --port 9100
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "800"))
+LATENCY_SIGMA = float(os.getenv("FAKE_OPENAI_LATENCY_SIGMA", "0.35"))
+RATE_429 = float(os.getenv("FAKE_OPENAI_429_RATE", "0"))
+RPM_LIMIT = int(os.getenv("FAKE_OPENAI_RPM", "3500"))
+TPM_LIMIT = int(os.getenv("FAKE_OPENAI_TPM", "90000"))
+TTFT_RATIO = float(os.getenv("FAKE_OPENAI_TTFT_RATIO", "0.15"))
+STREAM_PIECE_CHARS = 12
+
+app = FastAPI(title="Faux OpenAI (benchmarks)")
+stats = {"requests": 0, "rate_limited": 0}
+
+
+def _analysis_payload(seed: str) -> dict:
+    rng = random.Random(seed)
+    scores = {name: rng.randint(8, 19) for name in (
+        "viabilite_concept", "etude_marche", "modele_economique", "strategie_marketing", "projections_financieres"
+    )}
+    return {
+        "document_valide": True,
+        "score_global": rng.randint(45, 92),
+        "resume_executif": "Plan d'affaires cohérent, marché bien ciblé, finances à consolider.",
+        "scores": scores,
+        "points_forts": ["Proposition de valeur claire", "Équipe complémentaire"],
+        "axes_amelioration": ["Hypothèses financières peu justifiées"],
+        "recommandations": ["Détailler le plan de trésorerie sur 3 ans", "Valider le prix auprès de clients"],
+    }
+
+
+def _latency_seconds() -> float:
+    if LATENCY_MS <= 0:
+        return 0.0
+    mu = math.log(LATENCY_MS / 1000) - LATENCY_SIGMA ** 2 / 2
+    return random.lognormvariate(mu, LATENCY_SIGMA)
+
+
+def _ratelimit_headers(tokens: int) -> dict:
+    return {
+        "x-ratelimit-limit-requests": str(RPM_LIMIT),
+        "x-ratelimit-remaining-requests": str(RPM_LIMIT - 1),
+        "x-ratelimit-limit-tokens": str(TPM_LIMIT),
+        "x-ratelimit-remaining-tokens": str(max(0, TPM_LIMIT - tokens)),
+    }
+
+
+async def _stream_chunks(completion_id: str, model: str, content: str, duration: float):
+    pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+    for index, piece in enumerate(pieces + [None]):
+        chunk = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": {"content": piece} if piece is not None else {},
+                "finish_reason": None if piece is not None else "stop",
+            }],
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        if piece is not None:
+            await asyncio.sleep(duration / len(pieces))
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    latency = _latency_seconds()
+    streaming = bool(body.get("stream"))
+    await asyncio.sleep(latency * TTFT_RATIO if streaming else latency)
+
+    if RATE_429 and random.random() < RATE_429:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429, headers={"retry-after-ms": str(random.randint(200, 1500))}
+        )
+
+    prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+    prompt_tokens = len(prompt) // 4
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        content = json.dumps(_analysis_payload(prompt[-200:]), ensure_ascii=False)
+    else:
+        content = "Résumé de la section : marché, clients cibles, chiffres clés et risques principaux."
+    completion_tokens = len(content) // 4
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    if streaming:
+        return StreamingResponse(
+            _stream_chunks(completion_id, body.get("model", "gpt-3.5-turbo"), content, latency * (1 - TTFT_RATIO)),
+            media_type="text/event-stream", headers=_ratelimit_headers(prompt_tokens + completion_tokens)
+        )
+    return JSONResponse(
+        {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        },
+        headers=_ratelimit_headers(prompt_tokens + completion_tokens)
+    )
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,447 @@
+# ==========================================================
+# BENCHMARK DE BOUT EN BOUT (HORS LIGNE)
+# ==========================================================
+# Démarre l'application réelle (uvicorn main:app) contre des substituts locaux :
+#   - faux serveur OpenAI (benchmarks/fake_openai.py), latence et taux de 429 réglables ;
+#   - stockage sur disque (STORAGE_BACKEND=local) à la place de Supabase ;
+#   - une base Postgres temporaire créée sur --database-url (ou embarquée avec
+#     le paquet `pgserver` s'il est installé), schéma de base + migrations.
+# Rejoue une soirée de remise : rafales de /submissions (PDF/DOCX de tailles
+# variées) pendant que les professeurs consultent tableau de bord et rapports.
+# Mesure p50/p95/p99 par opération, jobs/s et pic de RSS (processus web et
+# enfants), puis compare au fichier de référence : code de sortie 1 en cas de régression.
+#
+# Usage :
+#   python benchmarks/run.py --database-url postgresql://postgres@localhost/postgres
+#   python benchmarks/run.py --database-url ... --update-baseline
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+import jwt
+import psycopg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.documents import write_pdf, write_docx  # noqa: E402
+from migrate import apply_migrations  # noqa: E402
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+JWT_SECRET = "benchmark-secret"
+
+# Tailles de documents : (format, pages ou paragraphes, poids dans le mélange)
+DOCUMENT_MIX = [
+    ("pdf", 2, 3), ("pdf", 10, 4), ("pdf", 40, 1),
+    ("docx", 30, 3), ("docx", 120, 2), ("docx", 400, 1),
+]
+
+# Sens de chaque métrique pour la détection de régression
+LOWER_IS_BETTER = "lower"
+HIGHER_IS_BETTER = "higher"
+LATENCY_SLACK_MS = 20.0
+
+
+# --- A. INFRASTRUCTURE LOCALE ---
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_embedded_postgres(workdir: str) -> str:
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--database-url (ou BENCH_DATABASE_URL) est requis quand `pgserver` n'est pas installé.")
+    server = pgserver.get_server(os.path.join(workdir, "pgdata"), cleanup_mode="stop")
+    return server.get_uri()
+
+
+def create_database(admin_url: str) -> Tuple[str, str]:
+    """Crée une base jetable sur le serveur indiqué ; retourne (nom, url)."""
+    name = f"lancement_bench_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(admin_url, autocommit=True) as conn:
+        conn.execute(f"CREATE DATABASE {name} TEMPLATE template0 ENCODING 'UTF8'")
+    return name, psycopg.conninfo.make_conninfo(admin_url, dbname=name)
+
+
+def drop_database(admin_url: str, name: str):
+    with psycopg.connect(admin_url, autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+
+
+def prepare_schema(database_url: str, professors: int) -> List[str]:
+    with psycopg.connect(database_url) as conn:
+        conn.execute((Path(__file__).parent / "schema.sql").read_text(encoding="utf-8"))
+        conn.commit()
+    apply_migrations(database_url)
+    with psycopg.connect(database_url) as conn:
+        ids = [
+            str(conn.execute(
+                "INSERT INTO professors (email, name, course) VALUES (%s, %s, 'Entrepreneuriat') RETURNING id",
+                (f"prof{i}@bench.local", f"Professeur {i}")
+            ).fetchone()[0])
+            for i in range(professors)
+        ]
+        conn.commit()
+    return ids
+
+
+def start_process(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_for_http(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Le service {url} n'a pas démarré en {timeout:.0f} s")
+
+
+class RssSampler(threading.Thread):
+    """Relève la RSS totale d'un processus et de ses descendants (pool d'extraction compris)."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.peak_bytes = 0
+        self._halt = threading.Event()
+
+    @staticmethod
+    def _tree_rss(root: int) -> int:
+        children: Dict[int, List[int]] = {}
+        rss: Dict[int, int] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                children.setdefault(int(fields[1]), []).append(int(entry))
+                rss[int(entry)] = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, IndexError, ValueError):
+                continue
+        total, stack = 0, [root]
+        while stack:
+            pid = stack.pop()
+            total += rss.get(pid, 0)
+            stack.extend(children.get(pid, []))
+        return total
+
+    def run(self):
+        if not os.path.isdir("/proc"):
+            return
+        while not self._halt.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._tree_rss(self.pid))
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# --- B. CHARGE ---
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class Workload:
+    def __init__(self, base_url: str, professor_ids: List[str], corpus: List[str], args):
+        self.base_url = base_url
+        self.professor_ids = professor_ids
+        self.corpus = corpus
+        self.args = args
+        self.latencies: Dict[str, List[float]] = {"submit": [], "dashboard": [], "report": []}
+        self.errors: Dict[str, int] = {"submit": 0, "dashboard": 0, "report": 0}
+        self.submitted: Dict[str, str] = {}   # submission_id -> professor_id
+        self.done = asyncio.Event()
+
+    def token(self, professor_id: str) -> str:
+        return jwt.encode({"sub": professor_id, "exp": time.time() + 3600}, JWT_SECRET, algorithm="HS256")
+
+    async def _timed(self, kind: str, coro):
+        start = time.perf_counter()
+        try:
+            response = await coro
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies[kind].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[kind] += 1
+        return response if ok else None
+
+    async def submit(self, client: httpx.AsyncClient, index: int, semaphore: asyncio.Semaphore):
+        path = self.corpus[index % len(self.corpus)]
+        professor_id = random.choice(self.professor_ids)
+        async with semaphore:
+            with open(path, "rb") as f:
+                response = await self._timed("submit", client.post("/submissions", data={
+                    "student_name": f"Étudiant {index}", "student_email": f"etudiant{index}@bench.local",
+                    "professor_id": professor_id, "project_title": f"Projet {index}",
+                }, files={"file": (os.path.basename(path), f.read())}))
+        if response is not None:
+            self.submitted[response.json()["id"]] = professor_id
+
+    async def deadline_burst(self, client: httpx.AsyncClient):
+        """Rafales de remises : N étudiants par vague, vagues rapprochées."""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        index = 0
+        while index < self.args.submissions:
+            wave = min(self.args.burst_size, self.args.submissions - index)
+            await asyncio.gather(*[self.submit(client, index + i, semaphore) for i in range(wave)])
+            index += wave
+            await asyncio.sleep(self.args.burst_interval)
+
+    async def professor_reader(self, client: httpx.AsyncClient, professor_id: str):
+        headers = {"Authorization": f"Bearer {self.token(professor_id)}"}
+        while not self.done.is_set():
+            page = await self._timed("dashboard", client.get("/api/professor/dashboard", headers=headers))
+            if page is not None:
+                body = page.json()
+                items = body["items"] if isinstance(body, dict) else body
+                completed = [s["id"] for s in items if s["status"] == "completed"]
+                for submission_id in random.sample(completed, min(2, len(completed))):
+                    await self._timed("report", client.get(f"/api/analysis/{submission_id}", headers=headers))
+            await asyncio.sleep(self.args.read_interval)
+
+
+async def wait_for_jobs(database_url: str, expected: int, timeout: float) -> Dict[str, Any]:
+    """Attend la fin des analyses ; retourne l'horodatage de la dernière et le décompte par statut."""
+    deadline = time.monotonic() + timeout
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as conn:
+        while True:
+            cursor = await conn.execute("SELECT status, count(*) FROM submissions GROUP BY status")
+            counts = dict(await cursor.fetchall())
+            finished = counts.get("completed", 0) + counts.get("error", 0)
+            if finished >= expected or time.monotonic() > deadline:
+                return {"counts": counts, "finished_at": time.monotonic(), "timed_out": finished < expected}
+            await asyncio.sleep(0.25)
+
+
+async def run_workload(base_url: str, database_url: str, professor_ids: List[str], corpus: List[str], args):
+    workload = Workload(base_url, professor_ids, corpus, args)
+    limits = httpx.Limits(max_connections=args.concurrency + len(professor_ids) + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        readers = [asyncio.create_task(workload.professor_reader(client, p)) for p in professor_ids]
+        started = time.monotonic()
+        await workload.deadline_burst(client)
+        jobs = await wait_for_jobs(database_url, len(workload.submitted), args.job_timeout)
+        workload.done.set()
+        await asyncio.gather(*readers)
+        stats = (await client.get("/api/stats")).json()
+
+    elapsed = jobs["finished_at"] - started
+    return workload, jobs, elapsed, stats
+
+
+# --- C. RÉSULTATS ET RÉFÉRENCE ---
+def summarize(workload: Workload, jobs: Dict[str, Any], elapsed: float, peak_rss: int) -> Dict[str, Any]:
+    metrics: Dict[str, Any] = {}
+    for kind, values in workload.latencies.items():
+        for p in (50, 95, 99):
+            metrics[f"{kind}_p{p}_ms"] = round(percentile(values, p) * 1000, 1)
+        metrics[f"{kind}_count"] = len(values)
+        metrics[f"{kind}_errors"] = workload.errors[kind]
+    completed = jobs["counts"].get("completed", 0)
+    metrics["jobs_completed"] = completed
+    metrics["jobs_failed"] = jobs["counts"].get("error", 0)
+    metrics["jobs_per_sec"] = round(completed / elapsed, 3) if elapsed > 0 else 0.0
+    metrics["wall_time_s"] = round(elapsed, 2)
+    metrics["peak_rss_mb"] = round(peak_rss / (1024 * 1024), 1)
+    metrics["timed_out"] = jobs["timed_out"]
+    return metrics
+
+
+def metric_direction(name: str) -> Optional[str]:
+    # Le p99 d'une centaine de mesures est trop bruité pour servir de garde-fou : affiché seulement
+    if name.endswith(("_p50_ms", "_p95_ms", "_errors")) or name in ("peak_rss_mb", "jobs_failed"):
+        return LOWER_IS_BETTER
+    if name == "jobs_per_sec":
+        return HIGHER_IS_BETTER
+    return None
+
+
+def compare_to_baseline(metrics: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    if metrics.get("timed_out"):
+        regressions.append("les analyses ne se sont pas terminées dans le délai imparti")
+    for name, reference in baseline.get("metrics", {}).items():
+        direction, value = metric_direction(name), metrics.get(name)
+        if direction is None or value is None:
+            continue
+        if direction == LOWER_IS_BETTER:
+            # Marge absolue pour les petites valeurs (bruit de mesure de quelques dizaines de ms / erreurs isolées)
+            slack = LATENCY_SLACK_MS if name.endswith("_ms") else (1 if name.endswith("errors") or name == "jobs_failed" else 0)
+            limit = reference * (1 + tolerance) + slack
+            if value > limit:
+                regressions.append(f"{name}: {value} > {limit:.1f} (référence {reference})")
+        elif value < reference * (1 - tolerance):
+            regressions.append(f"{name}: {value} < {reference * (1 - tolerance):.3f} (référence {reference})")
+    return regressions
+
+
+# --- D. ORCHESTRATION ---
+def build_corpus(directory: str, count: int, duplicate_ratio: float) -> List[str]:
+    rng = random.Random(42)
+    weighted = [spec for spec in DOCUMENT_MIX for _ in range(spec[2])]
+    unique = max(1, int(count * (1 - duplicate_ratio)))
+    paths = []
+    for i in range(unique):
+        kind, size, _ = rng.choice(weighted)
+        path = os.path.join(directory, f"plan_{i}_{size}.{kind}")
+        (write_pdf if kind == "pdf" else write_docx)(path, f"bench-{i}", size)
+        paths.append(path)
+    # Quelques remises en double (même fichier soumis deux fois) : exercent les caches
+    return paths + [rng.choice(paths) for _ in range(count - unique)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de l'API d'analyse")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Serveur Postgres local (une base temporaire y est créée puis supprimée)")
+    parser.add_argument("--submissions", type=int, default=60)
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--burst-interval", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=20, help="Remises simultanées max")
+    parser.add_argument("--professors", type=int, default=4)
+    parser.add_argument("--read-interval", type=float, default=0.5)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-429-rate", type=float, default=0.02)
+    parser.add_argument("--llm-tpm", type=int, default=2_000_000, help="Quota de tokens/minute simulé")
+    parser.add_argument("--web-workers", type=int, default=1)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Dégradation relative tolérée")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Écrit les résultats JSON dans ce fichier")
+    parser.add_argument("--keep", action="store_true", help="Conserve le répertoire de travail (journaux)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lancement-bench-")
+    admin_url = args.database_url or start_embedded_postgres(workdir)
+    db_name, database_url = create_database(admin_url)
+    processes: List[subprocess.Popen] = []
+    try:
+        professor_ids = prepare_schema(database_url, args.professors)
+        corpus_dir = os.path.join(workdir, "corpus")
+        os.makedirs(corpus_dir)
+        corpus = build_corpus(corpus_dir, args.submissions, args.duplicate_ratio)
+
+        env = dict(os.environ)
+        env.update({
+            "FAKE_OPENAI_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_OPENAI_429_RATE": str(args.llm_429_rate),
+            "FAKE_OPENAI_TPM": str(args.llm_tpm),
+        })
+        openai_port = free_port()
+        processes.append(start_process(
+            [sys.executable, "-m", "uvicorn", "benchmarks.fake_openai:app", "--port", str(openai_port)],
+            env, os.path.join(workdir, "fake_openai.log")
+        ))
+
+        env.update({
+            "DATABASE_URL": database_url,
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "STORAGE_BACKEND": "local",
+            "LOCAL_STORAGE_DIR": os.path.join(workdir, "storage"),
+            "UPLOAD_SPOOL_DIR": os.path.join(workdir, "spool"),
+            "JWT_SECRET": JWT_SECRET,
+            "LLM_BACKOFF_BASE": "0.2",
+            "LLM_TPM": str(args.llm_tpm),
+        })
+        app_port = free_port()
+        app_process = start_process(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+             "--workers", str(args.web_workers), "--no-access-log"],
+            env, os.path.join(workdir, "app.log")
+        )
+        processes.append(app_process)
+        base_url = f"http://127.0.0.1:{app_port}"
+        wait_for_http(f"http://127.0.0.1:{openai_port}/stats")
+        wait_for_http(f"{base_url}/api/stats")
+
+        sampler = RssSampler(app_process.pid)
+        sampler.start()
+        workload, jobs, elapsed, stats = asyncio.run(
+            run_workload(base_url, database_url, professor_ids, corpus, args)
+        )
+        sampler.stop()
+        metrics = summarize(workload, jobs, elapsed, sampler.peak_bytes)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        drop_database(admin_url, db_name)
+        if args.keep:
+            print(f"Répertoire de travail conservé : {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "scenario": {k: v for k, v in vars(args).items()
+                     if k not in ("database_url", "baseline", "update_baseline", "output", "keep", "tolerance")},
+        "metrics": metrics,
+        "service_stats": {k: stats.get(k) for k in ("analysis_cache", "llm", "llm_backends", "downloads")},
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.update_baseline:
+        Path(args.baseline).write_text(
+            json.dumps({"scenario": result["scenario"], "metrics": metrics}, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8"
+        )
+        print(f"Référence mise à jour : {args.baseline}")
+        return
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print("Aucune référence : lancer avec --update-baseline pour l'enregistrer.")
+        return
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("scenario") != result["scenario"]:
+        print("ATTENTION : scénario différent de celui de la référence, comparaison indicative.")
+    regressions = compare_to_baseline(metrics, baseline, args.tolerance)
+    if regressions:
+        print("RÉGRESSIONS DÉTECTÉES :")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("Aucune régression par rapport à la référence.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+-- Schéma de base (tables créées dans Supabase avant les migrations du dépôt).
+-- Utilisé par les benchmarks pour monter une base Postgres locale vide.
+CREATE TABLE IF NOT EXISTS professors (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    course TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    student_name TEXT NOT NULL,
+    student_email TEXT NOT NULL,
+    professor_id UUID REFERENCES professors(id),
+    project_title TEXT NOT NULL,
+    file_url TEXT,
+    file_name TEXT,
+    file_size BIGINT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    submission_date TIMESTAMPTZ NOT NULL DEFAULT now(),
+    score INTEGER
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    id UUID PRIMARY KEY,
+    submission_id UUID REFERENCES submissions(id),
+    report_content TEXT,
+    score_global INTEGER,
+    generated_at TIMESTAMPTZ,
+    processing_time_seconds INTEGER
+);
@@ -0,0 +1,155 @@
+# ==========================================================
+# BENCHMARK DE L'INDEX DE QUASI-DOUBLONS (MinHash + LSH)
+# ==========================================================
+# Remplit l'index de similarity.py dans une base temporaire jusqu'à 100 000
+# documents et mesure, à chaque palier, le temps d'une recherche (signature
+# du texte + requête find_similar) pour :
+#   - des copies retouchées de documents indexés (doivent être retrouvées) ;
+#   - des documents inédits (ne doivent rien trouver).
+# Le temps de recherche doit rester à peu près constant quand le corpus grandit.
+#
+# Usage :
+#   python benchmarks/similarity_index.py --database-url postgresql://postgres@localhost/postgres
+#   python benchmarks/similarity_index.py --database-url ... --sizes 1000,10000 --queries 50
+# Compter quelques minutes pour 100 000 documents (signatures calculées en Python).
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List
+
+import psycopg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.documents import business_plan_paragraphs  # noqa: E402
+from benchmarks.run import create_database, drop_database, prepare_schema, start_embedded_postgres, percentile  # noqa: E402
+from similarity import document_signature, band_buckets, find_similar, BANDS  # noqa: E402
+
+INSERT_BATCH = 2000
+
+
+def document_text(seed: str, paragraphs: int) -> str:
+    return "\n".join(business_plan_paragraphs(seed, paragraphs))
+
+
+def retouched(text: str, rate: float, rng: random.Random) -> str:
+    """Copie légèrement modifiée : une proportion `rate` des mots est remplacée."""
+    return " ".join(word if rng.random() >= rate else rng.choice(("projet", "entreprise", "nous")) for word in text.split())
+
+
+def index_documents(conn, professor_id: str, start: int, end: int, paragraphs: int) -> List[str]:
+    """Insère les documents [start, end) : soumission, signature et bandes, par COPY."""
+    ids = []
+    for batch_start in range(start, end, INSERT_BATCH):
+        rows = []
+        for i in range(batch_start, min(batch_start + INSERT_BATCH, end)):
+            signature = document_signature(document_text(f"doc-{i}", paragraphs))
+            rows.append((str(uuid.uuid4()), i, signature))
+        with conn.cursor() as cursor:
+            with cursor.copy("COPY submissions (id, student_name, student_email, professor_id, project_title, status) FROM STDIN") as copy:
+                for submission_id, i, _ in rows:
+                    copy.write_row((submission_id, f"Étudiant {i}", f"e{i}@bench.local", professor_id, f"Projet {i}", "completed"))
+            with cursor.copy("COPY document_signatures (submission_id, signature, shingle_count) FROM STDIN") as copy:
+                for submission_id, _, signature in rows:
+                    copy.write_row((submission_id, signature["signature"], signature["shingle_count"]))
+            with cursor.copy("COPY document_lsh_bands (band, bucket, submission_id) FROM STDIN") as copy:
+                for submission_id, _, signature in rows:
+                    for band, bucket in zip(range(BANDS), band_buckets(signature["signature"])):
+                        copy.write_row((band, bucket, submission_id))
+        conn.commit()
+        ids.extend(submission_id for submission_id, _, _ in rows)
+        print(f"    {batch_start + len(rows)} documents indexés", end="\r", flush=True)
+    conn.execute("ANALYZE document_lsh_bands")
+    conn.execute("ANALYZE document_signatures")
+    conn.commit()
+    print()
+    return ids
+
+
+async def measure_queries(database_url: str, ids: List[str], queries: int, paragraphs: int,
+                          rate: float, rng: random.Random) -> Dict[str, Any]:
+    hit_times, miss_times, found, false_positives = [], [], 0, 0
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as conn:
+        for q in range(queries):
+            target = rng.randrange(len(ids))
+            text = retouched(document_text(f"doc-{target}", paragraphs), rate, rng)
+            started = time.perf_counter()
+            signature = document_signature(text)
+            matches = await find_similar(conn, signature["signature"])
+            hit_times.append((time.perf_counter() - started) * 1000)
+            found += any(m["submission_id"] == ids[target] for m in matches)
+
+            text = document_text(f"inedit-{q}-{rng.random()}", paragraphs)
+            started = time.perf_counter()
+            signature = document_signature(text)
+            matches = await find_similar(conn, signature["signature"])
+            miss_times.append((time.perf_counter() - started) * 1000)
+            false_positives += len(matches)
+    return {
+        "copy_p50_ms": round(percentile(hit_times, 50), 2),
+        "copy_p95_ms": round(percentile(hit_times, 95), 2),
+        "unique_p50_ms": round(percentile(miss_times, 50), 2),
+        "unique_p95_ms": round(percentile(miss_times, 95), 2),
+        "recall": round(found / queries, 3),
+        "false_positives": false_positives,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'index de quasi-doublons")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Serveur Postgres (une base temporaire y est créée puis supprimée)")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Paliers de taille du corpus")
+    parser.add_argument("--queries", type=int, default=100, help="Recherches par palier (copies + inédits)")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphes par document (~40 mots chacun)")
+    parser.add_argument("--retouch-rate", type=float, default=0.05, help="Proportion de mots modifiés dans les copies")
+    parser.add_argument("--output", help="Écrit les résultats en JSON dans ce fichier")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    workdir = tempfile.mkdtemp(prefix="lancement-simbench-")
+    admin_url = args.database_url or start_embedded_postgres(workdir)
+    db_name, database_url = create_database(admin_url)
+    rng = random.Random(42)
+    results = []
+    try:
+        professor_id = prepare_schema(database_url, 1)[0]
+        ids: List[str] = []
+        with psycopg.connect(database_url) as conn:
+            for size in sizes:
+                print(f"--- Palier {size} documents ---")
+                started = time.perf_counter()
+                ids += index_documents(conn, professor_id, len(ids), size, args.paragraphs)
+                indexing = time.perf_counter() - started
+                row = {"documents": size, "indexing_seconds": round(indexing, 1)}
+                row.update(asyncio.run(measure_queries(
+                    database_url, ids, args.queries, args.paragraphs, args.retouch_rate, rng
+                )))
+                row["index_mb"] = round(float(conn.execute(
+                    "SELECT (pg_total_relation_size('document_lsh_bands') "
+                    "+ pg_total_relation_size('document_signatures')) / 1048576.0"
+                ).fetchone()[0]), 1)
+                results.append(row)
+                print(json.dumps(row))
+    finally:
+        drop_database(admin_url, db_name)
+
+    print("\n documents | copie p50/p95 (ms) | inédit p50/p95 (ms) | rappel | faux positifs | index (Mo)")
+    for row in results:
+        print(f" {row['documents']:>9} | {row['copy_p50_ms']:>7} / {row['copy_p95_ms']:<8} | "
+              f"{row['unique_p50_ms']:>7} / {row['unique_p95_ms']:<9} | {row['recall']:>6} | "
+              f"{row['false_positives']:>13} | {row['index_mb']:>9}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# ==========================================================
+# BENCHMARK DE DÉMARRAGE À FROID
+# ==========================================================
+# Mesure, dans des processus neufs :
+#   - le temps d'import de main.py (médiane de --runs) et les modules lourds
+#     effectivement chargés, avec les imports directs les plus coûteux (-X importtime) ;
+#   - le temps jusqu'à la première requête : du lancement du serveur (uvicorn seul,
+#     ou gunicorn avec gunicorn.conf.py et --workers processus) à la première
+#     réponse de /health/live, /health/ready puis de la page étudiant ;
+#   - la durée de l'arrêt (SIGTERM jusqu'à la fin du processus).
+#
+# Usage :
+#   python benchmarks/startup.py --database-url postgresql://postgres@localhost/postgres
+#   python benchmarks/startup.py --database-url ... --server gunicorn --workers 4 --runs 5
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.run import create_database, drop_database, prepare_schema, start_embedded_postgres, free_port  # noqa: E402
+
+# Modules qui ne doivent plus être chargés par le simple import de l'application
+HEAVY_MODULES = ("openai", "PyPDF2", "docx", "passlib", "supabase")
+
+IMPORT_SNIPPET = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(env: Dict[str, str]) -> Dict[str, Any]:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(env: Dict[str, str], top: int = 8) -> List[Dict[str, Any]]:
+    """Imports directs de main.py (et leurs dépendances) les plus coûteux, en ms cumulées."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Sortie en ordre postfixe, deux espaces par niveau : les modules de niveau 1
+        # qui précèdent la ligne de `main` (niveau 0) sont ses imports directs
+        if not name.startswith("   "):
+            if name.strip() == "main":
+                break
+            modules = []
+        elif not name.startswith("     "):
+            modules.append({"module": name.strip(), "ms": round(int(cumulative) / 1000, 1)})
+    return sorted(modules, key=lambda m: m["ms"], reverse=True)[:top]
+
+
+def wait_for_status(client: httpx.Client, url: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} n'a pas répondu en {timeout:.0f} s")
+
+
+def measure_first_request(server: str, workers: int, env: Dict[str, str], workdir: str) -> Dict[str, Any]:
+    port = free_port()
+    if server == "gunicorn":
+        args = [sys.executable, "-m", "gunicorn", "main:app", "--workers", str(workers), "--bind", f"127.0.0.1:{port}"]
+    else:
+        args = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log"]
+    base_url = f"http://127.0.0.1:{port}"
+    log = open(os.path.join(workdir, f"{server}.log"), "a")
+    started = time.perf_counter()
+    process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        with httpx.Client(timeout=2) as client:
+            live = wait_for_status(client, f"{base_url}/health/live", started, 60)
+            ready = wait_for_status(client, f"{base_url}/health/ready", started, 60)
+            page = wait_for_status(client, f"{base_url}/student", started, 60)
+    finally:
+        stop_started = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutdown = time.perf_counter() - stop_started
+        log.close()
+    return {"live_s": live, "ready_s": ready, "first_page_s": page, "shutdown_s": shutdown}
+
+
+def median_of(runs: List[Dict[str, Any]], key: str) -> float:
+    return round(statistics.median(run[key] for run in runs), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage à froid de l'application")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Serveur Postgres (une base temporaire y est créée puis supprimée)")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn")
+    parser.add_argument("--workers", type=int, default=2, help="Processus web (gunicorn seulement)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Écrit les résultats en JSON dans ce fichier")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lancement-startup-")
+    admin_url = args.database_url or start_embedded_postgres(workdir)
+    db_name, database_url = create_database(admin_url)
+    try:
+        prepare_schema(database_url, 1)
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": database_url,
+            "OPENAI_API_KEY": "benchmark",
+            "STORAGE_BACKEND": "local",
+            "LOCAL_STORAGE_DIR": os.path.join(workdir, "storage"),
+            "UPLOAD_SPOOL_DIR": os.path.join(workdir, "spool"),
+            # Démarrage du serveur web seul : les analyses tournent dans le processus `worker`
+            "ANALYSIS_WORKER_MODE": "external",
+        })
+        imports = [measure_import(env) for _ in range(args.runs)]
+        starts = [measure_first_request(args.server, args.workers, env, workdir) for _ in range(args.runs)]
+        result = {
+            "server": args.server,
+            "workers": args.workers if args.server == "gunicorn" else 1,
+            "import_main_s": median_of(imports, "seconds"),
+            "heavy_modules_loaded": imports[-1]["loaded"],
+            "slowest_imports_ms": import_profile(env),
+            "live_s": median_of(starts, "live_s"),
+            "ready_s": median_of(starts, "ready_s"),
+            "first_page_s": median_of(starts, "first_page_s"),
+            "shutdown_s": median_of(starts, "shutdown_s"),
+        }
+    finally:
+        drop_database(admin_url, db_name)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
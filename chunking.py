@@ -0,0 +1,76 @@
+# ==========================================================
+# DÉCOUPAGE DU TEXTE EN MORCEAUX MESURÉS EN TOKENS
+# ==========================================================
+# Utilise tiktoken quand il est installé ; sinon une estimation prudente
+# (≈ 4 caractères par token) permet de fonctionner sans la dépendance.
+import re
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encodings = {}
+
+
+def _get_encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    key = model or "default"
+    if key not in _encodings:
+        try:
+            _encodings[key] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            _encodings[key] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[key]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def split_into_chunks(text: str, chunk_tokens: int, model: Optional[str] = None) -> List[str]:
+    """
+    Découpe le texte en morceaux d'au plus `chunk_tokens` tokens, en coupant
+    de préférence aux limites de paragraphes pour garder les sections entières.
+    """
+    paragraphs = [p for p in re.split(r"\n\s*\n|\n", text) if p.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in paragraphs:
+        paragraph_tokens = count_tokens(paragraph, model)
+
+        # Un paragraphe trop long est lui-même coupé en tranches
+        while paragraph_tokens > chunk_tokens:
+            head = truncate_to_tokens(paragraph, chunk_tokens, model)
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.append(head)
+            paragraph = paragraph[len(head):]
+            paragraph_tokens = count_tokens(paragraph, model)
+
+        if current_tokens + paragraph_tokens > chunk_tokens and current:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        if paragraph.strip():
+            current.append(paragraph)
+            current_tokens += paragraph_tokens
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
@@ -0,0 +1,72 @@
+# ==========================================================
+# CORPS DE RÉPONSE COMPRESSÉS (gzip / brotli)
+# ==========================================================
+# Négociation de Accept-Encoding et compression des corps servis tels quels
+# (rapports, pages HTML, annuaire des professeurs). PrecompressedBody garde
+# les trois variantes d'un contenu qui ne change pas, avec un ETag fort tiré
+# du contenu : une requête ne coûte alors qu'une recherche de variante.
+# Chaque variante a son propre ETag (suffixe de l'encodage) : un ETag fort
+# désigne des octets précis, et un cache ne doit pas servir la version gzip
+# à un client qui revalide sa copie non compressée.
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from dashboard import etag_matches
+
+try:
+    import brotli
+except ImportError:
+    # Dépendance de requirements.txt : sans elle, tout est servi en gzip
+    brotli = None
+    print("⚠️ Module brotli absent : les réponses et les pages figées ne seront compressées qu'en gzip.")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag de la variante `encoding` d'un contenu dont `etag` désigne la version non compressée."""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def compress(body: bytes, encoding: Optional[str], brotli_quality: int = 5) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class PrecompressedBody:
+    """Contenu figé compressé une fois pour toutes, servi avec un ETag fort par variante et 304 sur revalidation."""
+
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+        # Compressé hors du chemin des requêtes : brotli au niveau maximal
+        self._variants: Dict[Optional[str], bytes] = {None: body, "gzip": compress(body, "gzip")}
+        if brotli is not None:
+            self._variants["br"] = compress(body, "br", brotli_quality=11)
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        etag = encoded_etag(self.etag, encoding)
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=self._variants[encoding], media_type=self.media_type, headers=headers)
+
+    def sizes(self) -> Dict[str, int]:
+        return {encoding or "identity": len(body) for encoding, body in self._variants.items()}
@@ -0,0 +1,159 @@
+# ==========================================================
+# TABLEAU DE BORD PROFESSEUR : PAGINATION PAR CURSEUR ET ETAG
+# ==========================================================
+# Les soumissions sont servies par pages, triées par (submission_date, id)
+# décroissants. Le curseur encode la dernière ligne de la page : la page
+# suivante repart de là via l'index (professor_id, submission_date DESC, id DESC),
+# sans OFFSET ni relecture des pages précédentes.
+# Chaque professeur a un compteur de modifications (migration 005, incrémenté
+# par déclencheur) : tant qu'il ne bouge pas, le tableau de bord est inchangé
+# et la réponse 304 ne lit aucune soumission.
+# Sans filtre, les statistiques de la première page viennent des compteurs par
+# statut et du résumé des notes (migration 009) : coût constant.
+import base64
+import hashlib
+import uuid
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(submission_date: datetime, submission_id: str) -> str:
+    raw = f"{submission_date.isoformat()}|{submission_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submission_date, submission_id = raw.split("|", 1)
+        # Le curseur vient du client : un identifiant qui n'est pas un UUID ferait échouer la requête SQL
+        return datetime.fromisoformat(submission_date), str(uuid.UUID(submission_id))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError("Curseur de pagination invalide")
+
+
+async def dashboard_version(conn, professor_id: str) -> int:
+    cursor = await conn.execute(
+        "SELECT version FROM professor_change_counters WHERE professor_id = %s", (professor_id,)
+    )
+    row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+def dashboard_etag(professor_id: str, version: int, params: Dict[str, Any]) -> str:
+    """ETag faible : même version des données + mêmes paramètres = même page."""
+    key = "&".join(f"{k}={params[k]}" for k in sorted(params) if params[k] is not None)
+    digest = hashlib.sha1(f"{professor_id}:{version}:{key}".encode()).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible : le préfixe W/ est ignoré des deux côtés
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def filter_clause(professor_id: str, status: Optional[str], date_from: Optional[date], date_to: Optional[date]):
+    clauses, params = ["professor_id = %s"], [professor_id]
+    if status:
+        clauses.append("status = %s")
+        params.append(status)
+    if date_from:
+        clauses.append("submission_date >= %s")
+        params.append(date_from)
+    if date_to:
+        # Borne incluse : toute la journée de date_to
+        clauses.append("submission_date < %s::date + 1")
+        params.append(date_to)
+    return clauses, params
+
+
+async def fetch_dashboard_page(conn, professor_id: str, limit: int = DASHBOARD_PAGE_SIZE,
+                               cursor: Optional[str] = None, status: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, Any]:
+    limit = max(1, min(limit, DASHBOARD_MAX_PAGE_SIZE))
+    clauses, params = filter_clause(professor_id, status, date_from, date_to)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        clauses.append("(submission_date, id) < (%s, %s)")
+        params.extend([after_date, after_id])
+
+    query = f"""
+        SELECT id, student_name, student_email, project_title, submission_date, status, score
+        FROM submissions
+        WHERE {' AND '.join(clauses)}
+        ORDER BY submission_date DESC, id DESC
+        LIMIT %s
+    """
+    # Une ligne de plus que demandé : indique s'il reste une page sans requête COUNT
+    db_cursor = await conn.execute(query, params + [limit + 1])
+    rows = await db_cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items: List[Dict[str, Any]] = [
+        {"id": str(row[0]), "student_name": row[1], "student_email": row[2], "project_title": row[3],
+         "submission_date": row[4], "status": row[5], "score": row[6]}
+        for row in rows
+    ]
+    page = {
+        "items": items,
+        "next_cursor": encode_cursor(rows[-1][4], str(rows[-1][0])) if has_more else None,
+    }
+    # Les statistiques globales ne sont calculées qu'avec la première page
+    if cursor is None:
+        page["summary"] = await _dashboard_summary(conn, professor_id, status, date_from, date_to)
+    return page
+
+
+async def _dashboard_summary(conn, professor_id: str, status: Optional[str],
+                             date_from: Optional[date], date_to: Optional[date]) -> Dict[str, Any]:
+    if not (status or date_from or date_to):
+        return await _precomputed_summary(conn, professor_id)
+
+    clauses, params = filter_clause(professor_id, status, date_from, date_to)
+    db_cursor = await conn.execute(
+        f"""
+        SELECT count(*),
+               count(*) FILTER (WHERE status = 'completed'),
+               count(*) FILTER (WHERE status IN ('pending', 'processing')),
+               round(avg(score) FILTER (WHERE status = 'completed' AND score IS NOT NULL))
+        FROM submissions WHERE {' AND '.join(clauses)}
+        """,
+        params
+    )
+    total, completed, in_progress, average = await db_cursor.fetchone()
+    return {
+        "total": total, "completed": completed, "in_progress": in_progress,
+        "average_score": int(average) if average is not None else 0,
+    }
+
+
+async def _precomputed_summary(conn, professor_id: str) -> Dict[str, Any]:
+    db_cursor = await conn.execute(
+        """
+        SELECT COALESCE(sum(c.n), 0),
+               COALESCE(sum(c.n) FILTER (WHERE c.status = 'completed'), 0),
+               COALESCE(sum(c.n) FILTER (WHERE c.status IN ('pending', 'processing')), 0),
+               (SELECT round(total::numeric / n) FROM professor_score_summary
+                WHERE professor_id = %s AND criterion = 'score_global' AND n > 0)
+        FROM professor_status_counts c WHERE c.professor_id = %s
+        """,
+        (professor_id, professor_id)
+    )
+    total, completed, in_progress, average = await db_cursor.fetchone()
+    return {
+        "total": int(total), "completed": int(completed), "in_progress": int(in_progress),
+        "average_score": int(average) if average is not None else 0,
+    }
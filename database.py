@@ -0,0 +1,264 @@
+# ==========================================================
+# POOL DE CONNEXIONS POSTGRES
+# ==========================================================
+# Un seul pool asynchrone pour toute la durée de vie de l'application,
+# partagé par les routes FastAPI et par les tâches d'analyse en arrière-plan.
+#
+# Réplique en lecture (optionnelle, DATABASE_REPLICA_URL) : les routes en
+# lecture seule passent par read_connection(), qui choisit la réplique tant
+# que son retard reste sous REPLICA_MAX_LAG_SECONDS, et le primaire sinon
+# (réplique injoignable, en retard, ou pas encore arrivée à la position WAL
+# d'une écriture que le client doit relire : lecture de ses propres écritures).
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import Optional, Dict, Any
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))   # retard relu au plus une fois par intervalle
+
+# --- Paramètres du pool (surchargeables par variables d'environnement) ---
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))        # attente max pour obtenir une connexion
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))     # fermeture des connexions inactives
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_HEALTH_CHECK = os.getenv("DB_POOL_HEALTH_CHECK", "1") == "1"  # vérifie la connexion avant de la prêter
+
+_pool: Optional[AsyncConnectionPool] = None
+_acquire_stats = {"count": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+
+_replica_pool: Optional[AsyncConnectionPool] = None
+_replica_connections: "weakref.WeakSet" = weakref.WeakSet()
+_replica_state: Dict[str, Any] = {"checked_at": 0.0, "healthy": False, "lag_seconds": None, "replay_lsn": 0, "error": None}
+_replica_check_lock = asyncio.Lock()
+_read_stats = {"replica": 0, "primary": 0, "fallback_lag": 0, "fallback_position": 0, "fallback_error": 0}
+
+
+async def open_pool() -> AsyncConnectionPool:
+    """Crée et ouvre le pool (appelé une seule fois au démarrage de l'application)."""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    _pool = AsyncConnectionPool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection if DB_POOL_HEALTH_CHECK else None,
+        name="lancement",
+        open=False,
+    )
+    await _pool.open(wait=True, timeout=DB_POOL_TIMEOUT)
+    print(f"--- INFO: Pool Postgres ouvert (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE}). ---")
+    await _open_replica_pool()
+    return _pool
+
+
+async def _mark_replica(conn):
+    _replica_connections.add(conn)
+
+
+async def _open_replica_pool():
+    global _replica_pool
+    if not DATABASE_REPLICA_URL or _replica_pool is not None:
+        return
+    _replica_pool = AsyncConnectionPool(
+        DATABASE_REPLICA_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection if DB_POOL_HEALTH_CHECK else None,
+        configure=_mark_replica,
+        name="lancement-replica",
+        open=False,
+    )
+    # Sans attendre : une réplique indisponible ne bloque pas le démarrage (lectures sur le primaire)
+    await _replica_pool.open(wait=False)
+    print("--- INFO: Pool de la réplique en lecture ouvert. ---")
+
+
+async def close_pool():
+    """Ferme proprement le pool (appelé à l'arrêt de l'application)."""
+    global _pool, _replica_pool
+    if _replica_pool is not None:
+        await _replica_pool.close()
+        _replica_pool = None
+    if _pool is None:
+        return
+    await _pool.close()
+    _pool = None
+    print("--- INFO: Pool Postgres fermé. ---")
+
+
+def get_pool() -> AsyncConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Le pool Postgres n'est pas initialisé (open_pool() non appelé).")
+    return _pool
+
+
+def _record_acquire(elapsed_ms: float):
+    _acquire_stats["count"] += 1
+    _acquire_stats["total_ms"] += elapsed_ms
+    _acquire_stats["last_ms"] = elapsed_ms
+    if elapsed_ms > _acquire_stats["max_ms"]:
+        _acquire_stats["max_ms"] = elapsed_ms
+
+
+@asynccontextmanager
+async def connection():
+    """
+    Emprunte une connexion au pool pour la durée du bloc `async with`.
+    La transaction est validée en sortie normale et annulée en cas d'exception.
+    """
+    pool = get_pool()
+    start = time.perf_counter()
+    acquired = False
+    try:
+        async with pool.connection() as conn:
+            acquired = True
+            _record_acquire((time.perf_counter() - start) * 1000)
+            yield conn
+    except PoolTimeout:
+        if not acquired:
+            _acquire_stats["timeouts"] += 1
+        raise
+
+
+# ==========================================================
+# LECTURES SUR LA RÉPLIQUE
+# ==========================================================
+def parse_lsn(lsn: str) -> int:
+    """Position WAL "16/B374D848" -> entier comparable."""
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+async def current_wal_lsn(conn) -> str:
+    """Position WAL du primaire après une écriture validée : la réplique doit l'avoir rejouée pour la relire."""
+    cursor = await conn.execute("SELECT pg_current_wal_lsn()::text")
+    return (await cursor.fetchone())[0]
+
+
+async def _refresh_replica_state():
+    async with _replica_check_lock:
+        if time.monotonic() - _replica_state["checked_at"] < REPLICA_CHECK_INTERVAL:
+            return
+        try:
+            async with _replica_pool.connection(timeout=1) as conn:
+                # Réplique à jour de tout ce qu'elle a reçu : retard nul même si le primaire n'écrit rien
+                cursor = await conn.execute(
+                    """
+                    SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0
+                                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END,
+                           CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+                                ELSE pg_current_wal_lsn() END::text
+                    """
+                )
+                lag, replay_lsn = await cursor.fetchone()
+            _replica_state.update(healthy=True, lag_seconds=float(lag or 0), replay_lsn=parse_lsn(replay_lsn), error=None)
+        except Exception as e:
+            _replica_state.update(healthy=False, error=str(e)[:200])
+        _replica_state["checked_at"] = time.monotonic()
+
+
+async def _replica_route(min_lsn: Optional[str]) -> Optional[str]:
+    """None si la lecture peut aller sur la réplique, sinon la raison du repli sur le primaire."""
+    if time.monotonic() - _replica_state["checked_at"] >= REPLICA_CHECK_INTERVAL:
+        await _refresh_replica_state()
+    if not _replica_state["healthy"]:
+        return "fallback_error"
+    if _replica_state["lag_seconds"] > REPLICA_MAX_LAG_SECONDS:
+        return "fallback_lag"
+    if min_lsn:
+        try:
+            if _replica_state["replay_lsn"] < parse_lsn(min_lsn):
+                return "fallback_position"
+        except ValueError:
+            return "fallback_position"
+    return None
+
+
+@asynccontextmanager
+async def read_connection(min_lsn: Optional[str] = None):
+    """
+    Connexion pour une lecture seule : la réplique si elle est configurée, à
+    jour (retard et position `min_lsn` de la dernière écriture du client) et
+    joignable, sinon le primaire. Même usage que connection().
+    """
+    async with AsyncExitStack() as stack:
+        conn = None
+        if _replica_pool is not None:
+            reason = await _replica_route(min_lsn)
+            if reason is None:
+                try:
+                    conn = await stack.enter_async_context(_replica_pool.connection())
+                    _read_stats["replica"] += 1
+                except (PoolTimeout, psycopg.OperationalError) as e:
+                    _replica_state.update(healthy=False, error=str(e)[:200], checked_at=time.monotonic())
+                    reason = "fallback_error"
+            if reason is not None:
+                _read_stats[reason] += 1
+        if conn is None:
+            conn = await stack.enter_async_context(connection())
+            _read_stats["primary"] += 1
+        yield conn
+
+
+def is_replica(conn) -> bool:
+    return conn in _replica_connections
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Statistiques du pool : connexions utilisées, en attente et latence d'acquisition."""
+    if _pool is None:
+        return {"status": "closed"}
+
+    stats = _pool.get_stats()
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    count = _acquire_stats["count"]
+    return {
+        "status": "open",
+        "min_size": _pool.min_size,
+        "max_size": _pool.max_size,
+        "size": size,
+        "available": available,
+        "in_use": size - available,
+        "waiting": stats.get("requests_waiting", 0),
+        "acquire_count": count,
+        "acquire_timeouts": _acquire_stats["timeouts"],
+        "acquire_avg_ms": round(_acquire_stats["total_ms"] / count, 3) if count else 0.0,
+        "acquire_max_ms": round(_acquire_stats["max_ms"], 3),
+        "acquire_last_ms": round(_acquire_stats["last_ms"], 3),
+        "connection_errors": stats.get("connections_errors", 0),
+        "replica": _replica_stats(),
+    }
+
+
+def _replica_stats() -> Dict[str, Any]:
+    if _replica_pool is None:
+        return {"status": "disabled"}
+    stats = _replica_pool.get_stats()
+    return {
+        "status": "healthy" if _replica_state["healthy"] else "unavailable",
+        "size": stats.get("pool_size", 0),
+        "available": stats.get("pool_available", 0),
+        "lag_seconds": _replica_state["lag_seconds"],
+        "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+        "last_error": _replica_state["error"],
+        "reads": dict(_read_stats),
+    }
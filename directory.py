@@ -0,0 +1,89 @@
+# ==========================================================
+# ANNUAIRE DES PROFESSEURS EN MÉMOIRE
+# ==========================================================
+# La page étudiant charge la liste des professeurs à chaque visite : c'est la
+# requête la plus fréquente en période de remise. La liste est gardée dans
+# chaque processus web, déjà sérialisée et compressée, pendant au plus
+# PROFESSORS_CACHE_TTL secondes. Toute modification de la table professors
+# la vide aussitôt : notification `professor_directory` (migration 012),
+# reçue par la connexion d'écoute de events.py.
+import asyncio
+import json
+import os
+import time
+from typing import Optional, Dict, Any
+
+from compression import PrecompressedBody
+from database import connection as db_connection, read_connection
+
+PROFESSORS_CACHE_TTL = float(os.getenv("PROFESSORS_CACHE_TTL", "300"))
+PROFESSOR_DIRECTORY_CHANNEL = "professor_directory"
+
+
+class ProfessorDirectory:
+    def __init__(self, ttl: float = PROFESSORS_CACHE_TTL):
+        self.ttl = ttl
+        self._body: Optional[PrecompressedBody] = None
+        self._expires_at = 0.0
+        # Incrémentée à chaque invalidation : un chargement commencé avant n'est pas conservé
+        self._generation = 0
+        # Après une invalidation, la réplique peut ne pas encore avoir la modification :
+        # le chargement suivant lit le primaire
+        self._read_primary = True
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    async def get(self) -> PrecompressedBody:
+        body = self._fresh()
+        if body is not None:
+            self.hits += 1
+            return body
+        # Une seule lecture en base quand plusieurs requêtes trouvent le cache vide
+        async with self._lock:
+            body = self._fresh()
+            if body is not None:
+                self.hits += 1
+                return body
+            generation = self._generation
+            body = await self._load(primary=self._read_primary)
+            if generation == self._generation:
+                self._body, self._expires_at = body, time.monotonic() + self.ttl
+                self._read_primary = False
+            return body
+
+    def _fresh(self) -> Optional[PrecompressedBody]:
+        if self._body is not None and time.monotonic() < self._expires_at:
+            return self._body
+        return None
+
+    async def _load(self, primary: bool) -> PrecompressedBody:
+        self.loads += 1
+        async with (db_connection() if primary else read_connection()) as conn:
+            cursor = await conn.execute("SELECT id, email, name, course FROM professors ORDER BY name, id")
+            rows = await cursor.fetchall()
+        professors = [{"id": str(row[0]), "email": row[1], "name": row[2], "course": row[3]} for row in rows]
+        return PrecompressedBody(
+            json.dumps(professors, ensure_ascii=False).encode("utf-8"), "application/json",
+            # Revalidé à chaque visite : un nouveau professeur apparaît sans attendre
+            "public, no-cache"
+        )
+
+    def invalidate(self, payload: Optional[str] = None):
+        self._generation += 1
+        self._body = None
+        self._read_primary = True
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": self._fresh() is not None,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+professor_directory = ProfessorDirectory()
@@ -0,0 +1,187 @@
+# ==========================================================
+# ÉVÉNEMENTS DE STATUT DES SOUMISSIONS (LISTEN/NOTIFY -> SSE)
+# ==========================================================
+# Un déclencheur Postgres (migration 006) publie chaque changement de statut
+# ou de score sur le canal `submission_events`, au moment du COMMIT ; le
+# pipeline y publie aussi les analyses partielles (événements `partial`).
+# Chaque processus web écoute ce canal sur une connexion dédiée (hors pool) et
+# redistribue les événements aux flux Server-Sent Events ouverts chez lui :
+# cela fonctionne quel que soit le processus (web ou `worker`) qui a fait l'écriture.
+# La même connexion écoute d'autres canaux pour le compte d'autres modules
+# (add_channel_listener), par exemple l'invalidation de l'annuaire des professeurs.
+import asyncio
+import json
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Set, List, AsyncIterator, Awaitable, Callable
+
+import psycopg
+
+from database import DATABASE_URL
+
+SUBMISSION_EVENTS_CHANNEL = "submission_events"
+SSE_HEARTBEAT_SECONDS = 15
+SSE_QUEUE_SIZE = 100
+TERMINAL_STATUSES = ("completed", "error")
+
+# Événement envoyé quand des notifications ont pu être perdues (reconnexion, file pleine)
+RESYNC_EVENT = {"type": "resync"}
+
+
+def submission_key(submission_id: str) -> str:
+    return f"submission:{submission_id}"
+
+
+def professor_key(professor_id: str) -> str:
+    return f"professor:{professor_id}"
+
+
+class SubmissionEventBroker:
+    """Écoute LISTEN/NOTIFY et distribue les événements aux abonnés du processus."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._channel_listeners: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.received = 0
+        self.dropped = 0
+
+    def add_channel_listener(self, channel: str, callback: Callable[[Optional[str]], None]):
+        """
+        `callback(payload)` pour chaque notification de `channel` (à enregistrer avant start()).
+        Appelé avec None après une coupure : des notifications ont pu être perdues.
+        """
+        self._channel_listeners.setdefault(channel, []).append(callback)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen_loop(), name="submission-events")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.connected = False
+
+    async def _listen_loop(self):
+        delay = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True) as conn:
+                    for channel in (SUBMISSION_EVENTS_CHANNEL, *self._channel_listeners):
+                        await conn.execute(f"LISTEN {channel}")
+                    if not self.connected:
+                        print(f"--- INFO: Écoute du canal {SUBMISSION_EVENTS_CHANNEL} active. ---")
+                    self.connected = True
+                    delay = 1.0
+                    async for notify in conn.notifies():
+                        if notify.channel == SUBMISSION_EVENTS_CHANNEL:
+                            self._dispatch(notify.payload)
+                        else:
+                            self._notify_listeners(notify.channel, notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"--- ERREUR: Écoute des événements interrompue ({e}), reconnexion dans {delay:.0f} s ---")
+            # Des notifications ont pu être manquées : les clients doivent se resynchroniser
+            self.connected = False
+            self._broadcast(RESYNC_EVENT)
+            for channel in self._channel_listeners:
+                self._notify_listeners(channel, None)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self.received += 1
+        # Changement de statut (migration 006) ou analyse partielle publiée par le pipeline
+        event.setdefault("type", "status")
+        for key in (submission_key(event.get("submission_id")), professor_key(event.get("professor_id"))):
+            for queue in self._subscribers.get(key, ()):
+                self._offer(queue, event)
+
+    def _notify_listeners(self, channel: str, payload: Optional[str]):
+        for callback in self._channel_listeners.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"--- ERREUR: Traitement d'une notification {channel}: {e} ---")
+
+    def _broadcast(self, event: Dict[str, Any]):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, event)
+
+    def _offer(self, queue: asyncio.Queue, event: Dict[str, Any]):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client trop lent : on vide sa file et on lui demande de recharger
+            self.dropped += queue.qsize()
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC_EVENT)
+
+    @contextmanager
+    def subscribe(self, key: str):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self.connected,
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def sse_stream(request, broker: SubmissionEventBroker, key: str,
+                     snapshot: Callable[[], Awaitable[List[Dict[str, Any]]]],
+                     public: bool = False, stop_on_terminal: bool = False) -> AsyncIterator[str]:
+    """
+    Flux SSE d'un abonné : l'état actuel d'abord, lu après l'abonnement pour
+    ne manquer aucune transition, puis les changements au fil de l'eau, avec un
+    battement régulier pour garder la connexion ouverte derrière les proxys.
+    """
+    with broker.subscribe(key) as queue:
+        yield "retry: 3000\n\n"
+        for event in await snapshot():
+            yield format_sse(_public_view(event) if public else event)
+            if stop_on_terminal and event.get("status") in TERMINAL_STATUSES:
+                return
+
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if public and event["type"] == "partial":
+                continue
+            yield format_sse(_public_view(event) if public else event)
+            if stop_on_terminal and event.get("status") in TERMINAL_STATUSES:
+                return
+
+
+def _public_view(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Le flux d'une soumission n'est pas authentifié : seul le statut y circule."""
+    return {key: event[key] for key in ("type", "submission_id", "status", "previous_status") if key in event}
+
+
+submission_events = SubmissionEventBroker()
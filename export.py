@@ -0,0 +1,193 @@
+# ==========================================================
+# EXPORT EN LOT DES NOTES ET DES RAPPORTS D'UN PROFESSEUR
+# ==========================================================
+# Deux exports servis en flux (StreamingResponse) :
+#   - un CSV des notes (note globale et notes par critère) pour l'import dans le LMS ;
+#   - une archive ZIP des rapports HTML, autonomes (feuille de style incluse).
+# Les lignes sont lues par lots de EXPORT_FETCH_SIZE, paginés par clé
+# (submission_date, id) comme le tableau de bord, et chaque lot est écrit puis
+# envoyé avant de lire le suivant : l'archive n'existe jamais entière en
+# mémoire, quelle que soit la taille de la classe. La connexion n'est empruntée
+# que le temps de lire un lot, jamais pendant l'envoi au client (lent).
+# Le ZIP est écrit dans une destination non positionnable : zipfile place
+# alors la taille et le CRC de chaque fichier après ses données (descripteur),
+# ce qui permet d'envoyer chaque rapport dès qu'il est compressé.
+import asyncio
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from typing import Optional, Dict, List, Tuple, AsyncIterator, Callable
+
+from database import read_connection
+from dashboard import filter_clause
+from report import render_report, report_document, report_cache, TEMPLATE_VERSION, SCORE_LABELS
+
+EXPORT_FETCH_SIZE = 100
+
+GRADES_COLUMNS = (
+    ["submission_id", "student_name", "student_email", "project_title", "submission_date", "status", "score_global"]
+    + [key for key, _ in SCORE_LABELS]
+)
+
+# Un lot de soumissions filtrées comme le tableau de bord, dans l'ordre de l'index (professor_id, submission_date, id)
+_SUBMISSIONS = """
+    SELECT * FROM submissions WHERE {where} ORDER BY submission_date DESC, id DESC LIMIT %s
+"""
+
+GRADES_QUERY = """
+    SELECT s.id, s.student_name, s.student_email, s.project_title, s.submission_date, s.status,
+           COALESCE(sc.score_global, s.score), {criteria}
+    FROM ({submissions}) s
+    LEFT JOIN submission_scores sc ON sc.submission_id = s.id
+    ORDER BY s.submission_date DESC, s.id DESC
+"""
+
+# LEFT JOIN : une ligne par soumission du lot (sans rapport, elle est ignorée à l'écriture),
+# pour qu'un lot incomplet signifie bien la fin de la sélection
+REPORTS_QUERY = """
+    SELECT s.id, s.student_name, s.project_title, a.id, a.analysis_json, a.report_content,
+           a.generated_at, a.processing_time_seconds, s.submission_date, a.model
+    FROM ({submissions}) s
+    LEFT JOIN LATERAL (
+        SELECT id, analysis_json, report_content, generated_at, processing_time_seconds, model
+        FROM analyses WHERE submission_id = s.id ORDER BY generated_at DESC LIMIT 1
+    ) a ON true
+    ORDER BY s.submission_date DESC, s.id DESC
+"""
+
+
+def _query(template: str, professor_id: str, status: Optional[str], date_from: Optional[date],
+           date_to: Optional[date], after: Optional[tuple]) -> Tuple[str, List]:
+    clauses, params = filter_clause(professor_id, status, date_from, date_to)
+    if after is not None:
+        clauses.append("(submission_date, id) < (%s, %s)")
+        params.extend(after)
+    submissions = _SUBMISSIONS.format(where=" AND ".join(clauses))
+    criteria = ", ".join(f"sc.{key}" for key, _ in SCORE_LABELS)
+    return template.format(submissions=submissions, criteria=criteria), params + [EXPORT_FETCH_SIZE]
+
+
+async def _iter_batches(template: str, key: Callable[[tuple], tuple], professor_id: str, status: Optional[str],
+                        date_from: Optional[date], date_to: Optional[date]) -> AsyncIterator[List[tuple]]:
+    """
+    Lots de lignes, sur la réplique quand elle est disponible. `key` donne le
+    couple (submission_date, id) d'une ligne : le lot suivant commence après.
+    """
+    after = None
+    while True:
+        query, params = _query(template, professor_id, status, date_from, date_to, after)
+        async with read_connection() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall()
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_FETCH_SIZE:
+            break
+        after = key(rows[-1])
+
+
+# ==========================================================
+# CSV DES NOTES
+# ==========================================================
+def _csv_cell(value):
+    # Un nom saisi par l'étudiant ne doit pas être interprété comme une formule par le tableur
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+async def stream_grades_csv(professor_id: str, status: Optional[str] = None,
+                            date_from: Optional[date] = None, date_to: Optional[date] = None) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM : Excel ouvre alors le fichier en UTF-8 (accents des noms)
+    buffer.write("\ufeff")
+    writer.writerow(GRADES_COLUMNS)
+    batches = _iter_batches(GRADES_QUERY, lambda row: (row[4], row[0]), professor_id, status, date_from, date_to)
+    async for rows in batches:
+        for row in rows:
+            submission_id, *values = row
+            writer.writerow([str(submission_id)] + [
+                value.isoformat() if isinstance(value, date) else _csv_cell(value) for value in values
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ==========================================================
+# ARCHIVE ZIP DES RAPPORTS
+# ==========================================================
+class _ZipSink:
+    """Destination de zipfile sans seek/tell : les octets écrits sont repris par le générateur."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def report_filename(student_name: str, project_title: str, submission_id: str) -> str:
+    stem = re.sub(r"[^\w\-]+", "_", f"{student_name}-{project_title}").strip("_")[:80] or "rapport"
+    # Le début de l'identifiant évite les collisions entre homonymes
+    return f"rapports/{stem}_{submission_id[:8]}.html"
+
+
+def _write_reports(archive: zipfile.ZipFile, sink: _ZipSink, rows: List[tuple], cached: Dict[str, str]) -> bytes:
+    for (submission_id, student_name, project_title, analysis_id, analysis_json, report_content,
+         generated_at, processing_time, _, model) in rows:
+        if analysis_json is not None:
+            html = cached.get(str(analysis_id))
+            if html is None:
+                html = render_report(analysis_json, student_name, project_title, generated_at, processing_time,
+                                     model=model)
+        elif report_content:
+            # Analyses antérieures à la migration 008 : seul le HTML figé existe
+            html = report_content
+        else:
+            continue
+        info = zipfile.ZipInfo(
+            report_filename(student_name, project_title, str(submission_id)),
+            date_time=generated_at.timetuple()[:6] if generated_at else (1980, 1, 1, 0, 0, 0),
+        )
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, report_document(html, f"{student_name} - {project_title}"))
+    return sink.drain()
+
+
+async def stream_reports_zip(professor_id: str, status: Optional[str] = None,
+                             date_from: Optional[date] = None, date_to: Optional[date] = None) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    batches = _iter_batches(REPORTS_QUERY, lambda row: (row[8], row[0]), professor_id, status, date_from, date_to)
+    async for rows in batches:
+        # Un rapport déjà rendu pour l'API est repris tel quel ; l'export ne remplit pas le cache.
+        # Le cache n'est lu que depuis la boucle d'événements (il n'est pas protégé contre les threads)
+        cached = {}
+        for row in rows:
+            analysis_id, analysis_json = row[3], row[4]
+            if analysis_json is not None:
+                html = report_cache.get((str(analysis_id), TEMPLATE_VERSION))
+                if html is not None:
+                    cached[str(analysis_id)] = html
+        # Rendu et compression (CPU) hors de la boucle d'événements
+        data = await asyncio.to_thread(_write_reports, archive, sink, rows, cached)
+        if data:
+            yield data
+    # Répertoire central de l'archive : quelques dizaines d'octets par rapport
+    archive.close()
+    yield sink.drain()
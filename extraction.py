@@ -0,0 +1,188 @@
+# ==========================================================
+# EXTRACTION DE TEXTE DANS UN POOL DE PROCESSUS
+# ==========================================================
+# Le parsing PyPDF2 / python-docx est purement CPU : il tourne dans un
+# ProcessPoolExecutor pour ne jamais bloquer la boucle d'événements de l'API.
+# Les pages d'un PDF sont réparties en lots extraits en parallèle, et le texte
+# est restitué morceau par morceau (page ou paragraphe) pour être joint une
+# seule fois à la fin.
+# Chaque tâche reçoit une limite de temps CPU : un PDF piégé ou pathologique
+# tue le processus d'extraction, pas le worker de l'API.
+# Chaque document a son propre pool : un processus tué (BrokenProcessPool) ou
+# une limite de temps dépassée n'interrompt que ce document, jamais les
+# extractions des autres soumissions.
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows : pas de limite CPU par tâche
+    resource = None
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))    # processus par document
+EXTRACTION_DOCUMENTS = int(os.getenv("EXTRACTION_DOCUMENTS", "2"))      # documents extraits simultanément
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "2"))
+EXTRACTION_CPU_LIMIT = int(os.getenv("EXTRACTION_CPU_LIMIT", "20"))      # secondes CPU par tâche
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "60"))        # secondes (horloge) par document
+MAX_PDF_PAGES = 10
+MAX_DOCX_PARAGRAPHS = 100
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+# --- A. FONCTIONS EXÉCUTÉES DANS LES PROCESSUS D'EXTRACTION ---
+def _limit_cpu():
+    """Borne le temps CPU de la tâche courante ; au-delà, le noyau tue le processus (SIGXCPU)."""
+    if resource is None or EXTRACTION_CPU_LIMIT <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + EXTRACTION_CPU_LIMIT
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _pdf_page_count(path: str) -> int:
+    import PyPDF2
+    _limit_cpu()
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _pdf_pages(path: str, start: int, end: int) -> List[str]:
+    import PyPDF2
+    _limit_cpu()
+    reader = PyPDF2.PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, end)]
+
+
+def _docx_paragraphs(path: str, max_paragraphs: Optional[int]) -> Tuple[List[str], int]:
+    import docx
+    _limit_cpu()
+    document = docx.Document(path)
+    selected = document.paragraphs if max_paragraphs is None else document.paragraphs[:max_paragraphs]
+    return [p.text + "\n" for p in selected if p.text.strip()], len(document.paragraphs)
+
+
+# --- B. POOLS DE PROCESSUS PAR DOCUMENT ---
+_context = None
+_active_pools = set()
+# Borne le nombre total de processus d'extraction : EXTRACTION_DOCUMENTS x EXTRACTION_WORKERS
+_document_slots = asyncio.Semaphore(EXTRACTION_DOCUMENTS)
+
+
+def _mp_context():
+    global _context
+    if _context is None:
+        methods = multiprocessing.get_all_start_methods()
+        _context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return _context
+
+
+def _kill_pool(executor: ProcessPoolExecutor):
+    # shutdown() n'arrête pas une tâche en cours : les processus du pool (attribut
+    # privé, seul accès possible) sont tués pour qu'un document bloqué ne tourne pas indéfiniment
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+
+
+class _DocumentPool:
+    """Processus d'extraction réservés à un seul document, tués s'il échoue ou dépasse son temps."""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, min(workers, EXTRACTION_WORKERS))
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.deadline = 0.0
+
+    async def __aenter__(self) -> "_DocumentPool":
+        await _document_slots.acquire()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        self.deadline = asyncio.get_running_loop().time() + EXTRACTION_TIMEOUT
+        _active_pools.add(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _active_pools.discard(self)
+        if exc_type is None:
+            self.executor.shutdown(wait=False)
+        else:
+            _kill_pool(self.executor)
+        _document_slots.release()
+
+    async def iter_results(self, calls) -> AsyncIterator:
+        """
+        Soumet tous les appels au pool d'un coup (exécution parallèle) puis produit
+        leurs résultats dans l'ordre de soumission, dès qu'ils sont prêts.
+        """
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self.executor, func, *args) for func, *args in calls]
+        try:
+            for future in futures:
+                yield await asyncio.wait_for(future, timeout=max(0.0, self.deadline - loop.time()))
+        except BrokenProcessPool:
+            raise ExtractionError("Extraction interrompue : processus tué (limite de temps CPU dépassée ?)")
+        except asyncio.TimeoutError:
+            raise ExtractionError(f"Extraction interrompue : plus de {EXTRACTION_TIMEOUT:.0f} s")
+        except asyncio.CancelledError:
+            # Annulation de l'appelant lui-même : elle suit son cours. Sinon (pool arrêté
+            # à l'extinction du processus), c'est un échec d'extraction ordinaire.
+            if asyncio.current_task().cancelling():
+                raise
+            raise ExtractionError("Extraction interrompue : pool d'extraction arrêté")
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def run_one(self, func, *args):
+        results = self.iter_results([(func, *args)])
+        try:
+            return await results.__anext__()
+        finally:
+            await results.aclose()
+
+
+def shutdown_executor():
+    """Arrêt du processus : les extractions en cours échouent (ExtractionError) et leurs processus sont tués."""
+    for pool in list(_active_pools):
+        _kill_pool(pool.executor)
+    _active_pools.clear()
+
+
+# --- C. API ASYNCHRONE ---
+async def iter_pdf_chunks(path: str, max_pages: Optional[int] = MAX_PDF_PAGES) -> AsyncIterator[str]:
+    """Produit le texte page par page ; les lots de pages sont extraits en parallèle."""
+    async with _DocumentPool(EXTRACTION_WORKERS) as pool:
+        num_pages = await pool.run_one(_pdf_page_count, path)
+        limit = num_pages if max_pages is None else min(num_pages, max_pages)
+
+        batches = [
+            (_pdf_pages, path, start, min(start + EXTRACTION_PAGES_PER_TASK, limit))
+            for start in range(0, limit, EXTRACTION_PAGES_PER_TASK)
+        ]
+        async for pages in pool.iter_results(batches):
+            for page_text in pages:
+                yield page_text
+
+    if num_pages > limit:
+        yield f"\n[Note: Document tronqué - {num_pages} pages au total, les {limit} premières pages ont été analysées]"
+
+
+async def iter_docx_chunks(path: str, max_paragraphs: Optional[int] = MAX_DOCX_PARAGRAPHS) -> AsyncIterator[str]:
+    """Produit le texte paragraphe par paragraphe."""
+    async with _DocumentPool(1) as pool:
+        paragraphs, total = await pool.run_one(_docx_paragraphs, path, max_paragraphs)
+    for paragraph in paragraphs:
+        yield paragraph
+
+    if max_paragraphs is not None and total > max_paragraphs:
+        yield f"\n[Note: Document tronqué - {total} paragraphes au total, les {max_paragraphs} premiers ont été analysés]"
@@ -0,0 +1,31 @@
+# ==========================================================
+# SERVEUR DE PRODUCTION : GUNICORN + WORKERS UVICORN
+# ==========================================================
+# Entrée `web` du Procfile : `gunicorn main:app` lit ce fichier automatiquement.
+# - WEB_CONCURRENCY processus (variable fixée par Heroku selon la taille du dyno) ;
+# - preload_app : main.py est importé une seule fois par le maître puis partagé
+#   par fork, un nouveau worker est prêt sans refaire les imports ;
+# - arrêt progressif (SIGTERM) : les requêtes en cours ont WEB_CONNECTION_DRAIN_SECONDS,
+#   puis les analyses en cours ANALYSIS_DRAIN_SECONDS (job_queue.py), le tout sous
+#   GRACEFUL_TIMEOUT, lui-même inférieur aux 30 s laissées par Heroku avant SIGKILL.
+# En mode ANALYSIS_WORKER_MODE=inprocess, chaque processus web a ses propres
+# workers d'analyse : ANALYSIS_WORKERS est multiplié par WEB_CONCURRENCY.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn_worker.LancementUvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "28"))
+# Un worker bloqué plus longtemps que ce délai est remplacé par le maître
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+accesslog = "-"
+forwarded_allow_ips = "*"
+
+
+def child_exit(server, worker):
+    # Métriques Prometheus multi-processus : les fichiers du worker terminé ne comptent plus dans les jauges
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
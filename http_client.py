@@ -0,0 +1,169 @@
+# ==========================================================
+# CLIENT HTTP ASYNCHRONE PARTAGÉ
+# ==========================================================
+# Un seul httpx.AsyncClient (connexions persistantes, HTTP/2) pour toute
+# l'application : stockage, authentification Supabase, téléchargements.
+# Ouvert au démarrage, fermé à l'arrêt.
+import asyncio
+import os
+import random
+import time
+from typing import Optional, Callable, Any, Dict
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+    )
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Client partagé ; créé à la demande si le hook de démarrage n'a pas été appelé (scripts)."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def request_with_retries(
+    method: str,
+    url: str,
+    content_factory: Optional[Callable[[], Any]] = None,
+    retries: int = HTTP_RETRIES,
+    **kwargs
+) -> httpx.Response:
+    """
+    Requête avec nouvelles tentatives (erreurs réseau, 429 et 5xx) et attente
+    exponentielle. `content_factory` recrée le corps à chaque tentative, ce qui
+    permet de renvoyer un flux déjà consommé.
+    """
+    client = get_http_client()
+    for attempt in range(retries + 1):
+        if content_factory is not None:
+            kwargs["content"] = content_factory()
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS or attempt == retries:
+                return response
+            await response.aclose()
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+    raise RuntimeError("unreachable")
+
+
+# ==========================================================
+# TÉLÉCHARGEMENT EN FLUX AVEC MESURE PAR PHASE
+# ==========================================================
+class DownloadTooLargeError(ValueError):
+    pass
+
+
+_download_totals = {"count": 0, "bytes": 0, "connect_ms": 0.0, "ttfb_ms": 0.0, "transfer_ms": 0.0, "reused": 0}
+
+
+async def download_to_file(url: str, destination, max_bytes: int = DOWNLOAD_MAX_BYTES) -> Dict[str, Any]:
+    """
+    Télécharge `url` en flux dans le fichier binaire ouvert `destination`,
+    en refusant tout contenu plus gros que `max_bytes`.
+    Retourne les durées par phase (ms) : connexion (0 si connexion réutilisée),
+    premier octet (TTFB) et transfert.
+    """
+    marks: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]):
+        # Événements httpcore : connection.connect_tcp.*, connection.start_tls.*, http11/http2.*
+        if event_name.startswith("connection.") and event_name.endswith(".started"):
+            marks.setdefault("connect_start", time.perf_counter())
+        elif event_name.startswith("connection.") and event_name.endswith(".complete"):
+            marks["connect_end"] = time.perf_counter()
+
+    client = get_http_client()
+    size = 0
+    start = time.perf_counter()
+    async with client.stream("GET", url, extensions={"trace": trace}) as response:
+        headers_at = time.perf_counter()
+        response.raise_for_status()
+
+        declared = response.headers.get("content-length")
+        if declared and int(declared) > max_bytes:
+            raise DownloadTooLargeError(f"Fichier trop volumineux ({declared} octets)")
+
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise DownloadTooLargeError(f"Fichier trop volumineux (plus de {max_bytes} octets)")
+            destination.write(chunk)
+        http_version = response.http_version
+    end = time.perf_counter()
+
+    connect_ms = (marks["connect_end"] - marks["connect_start"]) * 1000 if "connect_end" in marks else 0.0
+    timings = {
+        "bytes": size,
+        "http_version": http_version,
+        "connection_reused": "connect_end" not in marks,
+        "connect_ms": round(connect_ms, 2),
+        "ttfb_ms": round((headers_at - start) * 1000, 2),
+        "transfer_ms": round((end - headers_at) * 1000, 2),
+        "total_ms": round((end - start) * 1000, 2),
+    }
+
+    _download_totals["count"] += 1
+    _download_totals["bytes"] += size
+    _download_totals["connect_ms"] += connect_ms
+    _download_totals["ttfb_ms"] += timings["ttfb_ms"]
+    _download_totals["transfer_ms"] += timings["transfer_ms"]
+    _download_totals["reused"] += 1 if timings["connection_reused"] else 0
+    return timings
+
+
+def download_stats() -> Dict[str, Any]:
+    count = _download_totals["count"]
+    if not count:
+        return {"count": 0}
+    return {
+        "count": count,
+        "bytes": _download_totals["bytes"],
+        "connections_reused": _download_totals["reused"],
+        "avg_connect_ms": round(_download_totals["connect_ms"] / count, 2),
+        "avg_ttfb_ms": round(_download_totals["ttfb_ms"] / count, 2),
+        "avg_transfer_ms": round(_download_totals["transfer_ms"] / count, 2),
+    }
@@ -0,0 +1,204 @@
+# ==========================================================
+# FILE D'ATTENTE DES ANALYSES (portée par la table submissions)
+# ==========================================================
+# Une soumission 'pending' est un job en attente. Les workers la réservent avec
+# SELECT ... FOR UPDATE SKIP LOCKED, ce qui permet à plusieurs processus
+# (web en mode in-process, ou `worker` séparé) de se partager la file sans doublons.
+# Un redémarrage ne perd plus rien : à l'arrêt, les analyses en cours se terminent
+# (dans la limite de ANALYSIS_DRAIN_SECONDS) ou sont remises en attente aussitôt ;
+# après un crash, les jobs 'processing' abandonnés sont repris au démarrage.
+import asyncio
+import os
+import uuid
+from typing import Optional, Set, Dict, Any, List
+
+from database import connection as db_connection
+from pipeline import process_submission_with_ai, JOB_MAX_ATTEMPTS
+from uploads import discard_spooled_file
+
+# --- Paramètres de la file ---
+ANALYSIS_WORKER_MODE = os.getenv("ANALYSIS_WORKER_MODE", "inprocess")   # "inprocess" ou "external"
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))              # pipelines simultanés max
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))          # secondes entre deux scrutations à vide
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "900"))              # un job 'processing' plus vieux est abandonné
+JOB_RECOVERY_INTERVAL = float(os.getenv("JOB_RECOVERY_INTERVAL", "300"))
+# À l'arrêt, les analyses en cours ont ce délai pour se terminer avant d'être remises en attente
+ANALYSIS_DRAIN_SECONDS = float(os.getenv("ANALYSIS_DRAIN_SECONDS", "20"))
+
+
+async def claim_next_job() -> Optional[str]:
+    """Réserve la plus ancienne soumission en attente et la passe en 'processing'."""
+    query = """
+        UPDATE submissions SET status = 'processing', processing_started_at = now(), attempts = attempts + 1
+        WHERE id = (
+            SELECT id FROM submissions
+            WHERE status = 'pending' AND (not_before IS NULL OR not_before <= now())
+            ORDER BY submission_date
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+    """
+    async with db_connection() as conn:
+        cursor = await conn.execute(query)
+        row = await cursor.fetchone()
+        await conn.commit()
+    return str(row[0]) if row else None
+
+
+async def recover_stale_jobs() -> Dict[str, int]:
+    """
+    Remet en attente les jobs 'processing' abandonnés (crash, redéploiement),
+    ou les passe en 'error' s'ils ont épuisé leurs tentatives.
+    """
+    stale_condition = """
+        status = 'processing'
+        AND (processing_started_at IS NULL OR processing_started_at < now() - make_interval(secs => %s))
+    """
+    async with db_connection() as conn:
+        cursor = await conn.execute(
+            f"UPDATE submissions SET status = 'error', last_error = 'Nombre maximum de tentatives atteint' "
+            f"WHERE {stale_condition} AND attempts >= %s RETURNING id",
+            (JOB_STALE_AFTER, JOB_MAX_ATTEMPTS)
+        )
+        failed_ids = [str(row[0]) for row in await cursor.fetchall()]
+        failed = len(failed_ids)
+        cursor = await conn.execute(
+            f"UPDATE submissions SET status = 'pending' WHERE {stale_condition}",
+            (JOB_STALE_AFTER,)
+        )
+        requeued = cursor.rowcount
+        await conn.commit()
+    for submission_id in failed_ids:
+        discard_spooled_file(submission_id)
+
+    if requeued or failed:
+        print(f"--- INFO: Reprise des jobs abandonnés : {requeued} remis en attente, {failed} en erreur. ---")
+    return {"requeued": requeued, "failed": failed}
+
+
+async def requeue_jobs(submission_ids: List[str]):
+    """Remet en attente des jobs interrompus par l'arrêt du processus (la tentative reste comptée)."""
+    async with db_connection() as conn:
+        await conn.execute(
+            "UPDATE submissions SET status = 'pending', partial_analysis = NULL "
+            "WHERE id = ANY(%s::uuid[]) AND status = 'processing'",
+            (submission_ids,)
+        )
+        await conn.commit()
+
+
+async def queue_depth() -> Dict[str, int]:
+    async with db_connection() as conn:
+        cursor = await conn.execute(
+            "SELECT status, count(*) FROM submissions WHERE status IN ('pending', 'processing') GROUP BY status"
+        )
+        rows = await cursor.fetchall()
+    depth = {"pending": 0, "processing": 0}
+    depth.update({row[0]: row[1] for row in rows})
+    return depth
+
+
+class AnalysisWorkerPool:
+    """
+    Pool de workers asynchrones qui consomment la file. Le nombre de workers
+    plafonne le nombre de pipelines téléchargement/extraction/IA simultanés.
+    """
+
+    def __init__(self, concurrency: int = ANALYSIS_WORKERS):
+        self.concurrency = concurrency
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._recovery_task: Optional[asyncio.Task] = None
+        self._running_jobs: Set[str] = set()
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        await recover_stale_jobs()
+        for i in range(self.concurrency):
+            self._tasks.add(asyncio.create_task(self._worker_loop(i), name=f"analysis-worker-{i}"))
+        self._recovery_task = asyncio.create_task(self._recovery_loop(), name="analysis-recovery")
+        print(f"--- INFO: {self.concurrency} workers d'analyse démarrés ({self.worker_id}). ---")
+
+    def notify(self):
+        """Réveille les workers (appelé juste après l'insertion d'une soumission)."""
+        self._wakeup.set()
+
+    async def stop(self, drain_timeout: float = ANALYSIS_DRAIN_SECONDS):
+        """
+        Arrêt progressif : plus aucun job n'est réservé, ceux en cours ont
+        `drain_timeout` secondes pour se terminer ; les autres sont interrompus
+        et remis en attente sans attendre JOB_STALE_AFTER.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            await asyncio.gather(self._recovery_task, return_exceptions=True)
+            self._recovery_task = None
+        if self._running_jobs:
+            print(f"--- INFO: Attente de {len(self._running_jobs)} analyse(s) en cours "
+                  f"(max {drain_timeout:.0f} s) ({self.worker_id}). ---")
+        pending = set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=drain_timeout)
+        interrupted = list(self._running_jobs)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks.clear()
+        if interrupted:
+            await requeue_jobs(interrupted)
+            print(f"--- ATTENTION: {len(interrupted)} analyse(s) interrompue(s) remise(s) en attente. ---")
+        print(f"--- INFO: Workers d'analyse arrêtés ({self.worker_id}). ---")
+
+    async def _worker_loop(self, index: int):
+        while not self._stopping:
+            try:
+                submission_id = await claim_next_job()
+            except Exception as e:
+                print(f"--- ERREUR: Worker {index} n'a pas pu réserver de job: {e} ---")
+                submission_id = None
+
+            if submission_id is None:
+                await self._wait_for_work()
+                continue
+
+            self._running_jobs.add(submission_id)
+            try:
+                await process_submission_with_ai(submission_id)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"--- ERREUR: Worker {index} a échoué sur {submission_id}: {e} ---")
+            finally:
+                self._running_jobs.discard(submission_id)
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        # À l'arrêt, l'événement reste levé pour libérer tous les workers
+        if not self._stopping:
+            self._wakeup.clear()
+
+    async def _recovery_loop(self):
+        while not self._stopping:
+            await asyncio.sleep(JOB_RECOVERY_INTERVAL)
+            try:
+                await recover_stale_jobs()
+            except Exception as e:
+                print(f"--- ERREUR: Reprise des jobs abandonnés impossible: {e} ---")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._running_jobs),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
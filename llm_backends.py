@@ -0,0 +1,438 @@
+# ==========================================================
+# BACKENDS LLM ET REQUÊTES DE COUVERTURE (hedging)
+# ==========================================================
+# LLM_BACKENDS liste les backends par ordre de préférence :
+#   - "openai" : API OpenAI (OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL) ;
+#   - "local"  : tout serveur compatible OpenAI (vLLM, Ollama, llama.cpp...),
+#                LOCAL_LLM_BASE_URL et LOCAL_LLM_MODEL ;
+#   - "stub"   : réponses déterministes calculées localement, pour travailler
+#                et tester hors ligne (aucun appel réseau).
+# Chaque backend a son limiteur (llm_limiter.py) et ses statistiques récentes :
+# latences par usage et taux de succès. Le routeur choisit le backend principal
+# (les backends en échec passent après les autres) et, si la réponse tarde au-delà
+# du percentile LLM_HEDGE_PERCENTILE des latences récentes du principal, envoie
+# la même requête au backend suivant : la première réponse gagne, l'autre appel
+# est annulé. Un échec bascule aussitôt sur le backend suivant.
+# Un backend rétrogradé n'est pas abandonné : ses issues expirent après
+# LLM_STATS_MAX_AGE secondes et, toutes les LLM_PROBE_INTERVAL secondes, un appel
+# lui est de nouveau confié en premier ; un succès le rétablit aussitôt.
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from llm_limiter import AdaptiveLLMLimiter, LLMUnavailableError, llm_limiter
+from metrics import LLM_BACKEND_SECONDS, LLM_HEDGES
+
+LLM_BACKENDS = [name.strip() for name in os.getenv("LLM_BACKENDS", "openai").split(",") if name.strip()]
+# "ordered" : ordre de LLM_BACKENDS ; "fastest" : latence médiane récente la plus basse d'abord
+LLM_ROUTING = os.getenv("LLM_ROUTING", "ordered")
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+# Délai de couverture tant que le principal n'a pas LLM_HEDGE_MIN_SAMPLES latences mesurées
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "200"))
+# En dessous de ce taux de succès récent, un backend passe après les autres
+LLM_MIN_SUCCESS_RATE = float(os.getenv("LLM_MIN_SUCCESS_RATE", "0.5"))
+# Âge maximal des issues prises en compte dans le taux de succès
+LLM_STATS_MAX_AGE = float(os.getenv("LLM_STATS_MAX_AGE", "600"))
+# Intervalle entre deux appels de sonde vers un backend rétrogradé
+LLM_PROBE_INTERVAL = float(os.getenv("LLM_PROBE_INTERVAL", "30"))
+
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://127.0.0.1:8000/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "llama3")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "local")
+# Certains serveurs locaux ignorent ou refusent response_format (mode JSON)
+LOCAL_LLM_JSON_MODE = os.getenv("LOCAL_LLM_JSON_MODE", "true").lower() == "true"
+LOCAL_LLM_RPM = float(os.getenv("LOCAL_LLM_RPM", "600"))
+LOCAL_LLM_TPM = float(os.getenv("LOCAL_LLM_TPM", "1000000"))
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+
+# Appel au modèle : reçoit le backend choisi, renvoie sa réponse brute
+BackendRequest = Callable[["LLMBackend"], Awaitable[Any]]
+
+
+# --- A. STATISTIQUES PAR BACKEND ---
+class BackendStats:
+    """
+    Latences des derniers succès (par usage : "analysis", "analysis_stream",
+    "summary") et issues horodatées des derniers appels.
+    """
+
+    def __init__(self, window: int = LLM_STATS_WINDOW):
+        self.window = window
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.outcomes: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.last_attempt = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+
+    def record(self, purpose: str, seconds: Optional[float], ok: bool):
+        self.calls += 1
+        if ok and not self.healthy():
+            # Sonde réussie : les échecs passés ne retiennent plus le backend
+            self.outcomes.clear()
+        self.outcomes.append((time.monotonic(), ok))
+        if ok:
+            self.latencies.setdefault(purpose, deque(maxlen=self.window)).append(seconds)
+        else:
+            self.failures += 1
+
+    def record_cancelled(self, purpose: str, seconds: float):
+        # Appel battu par la couverture : sa latence réelle est au moins `seconds`.
+        # Sans cette borne, un backend lent ne verrait jamais ses percentiles monter.
+        self.cancelled += 1
+        self.latencies.setdefault(purpose, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, purpose: str, q: float, min_samples: int = 1) -> Optional[float]:
+        samples = self.latencies.get(purpose)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def success_rate(self) -> Optional[float]:
+        cutoff = time.monotonic() - LLM_STATS_MAX_AGE
+        recent = [ok for at, ok in self.outcomes if at >= cutoff]
+        return sum(recent) / len(recent) if recent else None
+
+    def healthy(self) -> bool:
+        rate = self.success_rate()
+        return rate is None or rate >= LLM_MIN_SUCCESS_RATE
+
+    def probe_due(self) -> bool:
+        """Backend rétrogradé sans appel depuis LLM_PROBE_INTERVAL : le prochain appel lui revient."""
+        return not self.healthy() and time.monotonic() - self.last_attempt >= LLM_PROBE_INTERVAL
+
+    def as_dict(self) -> Dict[str, Any]:
+        rate = self.success_rate()
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "success_rate": round(rate, 3) if rate is not None else None,
+            "healthy": self.healthy(),
+            "probe_due": self.probe_due(),
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+            "latency_s": {
+                purpose: {
+                    "samples": len(samples),
+                    "p50": round(self.percentile(purpose, 50), 3),
+                    "p95": round(self.percentile(purpose, 95), 3),
+                }
+                for purpose, samples in self.latencies.items()
+            },
+        }
+
+
+# --- B. BACKENDS ---
+class LLMBackend:
+    """Backend de chat : `create` a la signature de chat.completions.with_raw_response.create (sans `model`)."""
+
+    def __init__(self, name: str, model: str, limiter: AdaptiveLLMLimiter):
+        self.name = name
+        self.model = model
+        self.limiter = limiter
+        self.stats = BackendStats()
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def create(self, **kwargs) -> Any:
+        """Réponse brute : `headers` (limites annoncées) et `parse()` (réponse ou flux de morceaux)."""
+        raise NotImplementedError
+
+    def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(self, name: str, model: str, api_key: Optional[str], base_url: Optional[str] = None,
+                 limiter: AdaptiveLLMLimiter = llm_limiter, json_mode: bool = True):
+        super().__init__(name, model, limiter)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.json_mode = json_mode
+        self._client = None
+
+    def client(self):
+        # Le SDK openai (le plus lourd des imports) n'est chargé qu'au premier usage
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # Les nouvelles tentatives sont gérées par le limiteur du backend, pas par le SDK
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    async def create(self, **kwargs) -> Any:
+        if not self.json_mode:
+            kwargs.pop("response_format", None)
+        return await self.client().chat.completions.with_raw_response.create(model=self.model, **kwargs)
+
+    def open(self):
+        self.client()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """Serveur local exposant /v1/chat/completions : même SDK, limiteur propre (pas de quota partagé avec OpenAI)."""
+
+    def __init__(self, name: str, model: str, base_url: str, api_key: str = LOCAL_LLM_API_KEY,
+                 json_mode: bool = LOCAL_LLM_JSON_MODE):
+        super().__init__(name, model, api_key, base_url,
+                         limiter=AdaptiveLLMLimiter(LOCAL_LLM_RPM, LOCAL_LLM_TPM), json_mode=json_mode)
+
+
+class _StubRawResponse:
+    def __init__(self, parsed: Any):
+        self.headers: Dict[str, str] = {}
+        self._parsed = parsed
+
+    def parse(self) -> Any:
+        return self._parsed
+
+
+class StubBackend(LLMBackend):
+    """
+    Réponses calculées à partir du texte de la requête : le même document
+    donne toujours la même analyse. Aucune valeur pédagogique, uniquement
+    pour les tests et le développement hors ligne.
+    """
+
+    def __init__(self, name: str = "stub", latency_ms: float = LLM_STUB_LATENCY_MS):
+        super().__init__(name, "stub-1", AdaptiveLLMLimiter(1_000_000, 1_000_000_000))
+        self.latency = latency_ms / 1000
+
+    @staticmethod
+    def _analysis(prompt: str) -> Dict[str, Any]:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        keys = ("viabilite_concept", "etude_marche", "modele_economique", "strategie_marketing",
+                "projections_financieres")
+        scores = {key: 6 + digest[i] % 13 for i, key in enumerate(keys)}
+        return {
+            "document_valide": True,
+            "resume_executif": f"Analyse hors ligne (backend stub) d'un document de {len(prompt.split())} mots.",
+            "score_global": sum(scores.values()),
+            "scores": scores,
+            "completude": f"{60 + digest[5] % 41}%",
+            "points_forts": ["Évaluation déterministe produite sans modèle"],
+            "axes_amelioration": ["Relancer l'analyse avec un modèle réel"],
+            "recommandations": ["Configurer LLM_BACKENDS pour la production"],
+        }
+
+    async def _stream(self, content: str):
+        for start in range(0, len(content), 40):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + 40]))])
+
+    async def create(self, messages, max_tokens: int, stream: bool = False, response_format=None, **kwargs) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if response_format is not None:
+            content = json.dumps(self._analysis(prompt), ensure_ascii=False)
+        else:
+            # Résumé de section : le début de la section, tel quel
+            content = " ".join(prompt.split()[:200])
+        if stream:
+            return _StubRawResponse(self._stream(content))
+        return _StubRawResponse(SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+                                  total_tokens=(len(prompt) + len(content)) // 4),
+        ))
+
+
+def build_backend(name: str) -> LLMBackend:
+    if name == "openai":
+        # OPENAI_BASE_URL : le SDK le lit aussi lui-même, passé ici pour être explicite
+        return OpenAIBackend("openai", os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"), os.getenv("OPENAI_API_KEY"),
+                             os.getenv("OPENAI_BASE_URL"))
+    if name == "local":
+        return OpenAICompatibleBackend("local", LOCAL_LLM_MODEL, LOCAL_LLM_BASE_URL)
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Backend LLM inconnu dans LLM_BACKENDS : {name}")
+
+
+# --- C. ROUTAGE ET COUVERTURE ---
+class LLMRouter:
+
+    def __init__(self, backends: List[LLMBackend]):
+        if not backends:
+            raise ValueError("LLM_BACKENDS ne contient aucun backend")
+        self.backends = backends
+        self.hedges = 0
+        self.failovers = 0
+
+    @property
+    def primary_model(self) -> str:
+        return self.backends[0].model
+
+    def signature(self) -> str:
+        """Backends configurés, dans l'ordre : fait partie de la clé du cache d'analyse."""
+        return ",".join(backend.label for backend in self.backends)
+
+    def ranked(self, purpose: str) -> List[LLMBackend]:
+        """
+        Backends en bonne santé d'abord, puis ordre configuré (ou latence médiane
+        avec LLM_ROUTING=fastest). Un backend rétrogradé dont la sonde est due
+        passe en tête : il reçoit cet appel et un seul.
+        """
+        probe = next((backend for backend in self.backends if backend.stats.probe_due()), None)
+
+        def key(item: Tuple[int, LLMBackend]):
+            index, backend = item
+            latency = 0.0
+            if LLM_ROUTING == "fastest":
+                # Un backend encore jamais mesuré est essayé : c'est ainsi qu'il obtient des mesures
+                latency = backend.stats.percentile(purpose, 50) or 0.0
+            return (backend is not probe, not backend.stats.healthy(), latency, index)
+        return [backend for _, backend in sorted(enumerate(self.backends), key=key)]
+
+    def hedge_delay(self, backend: LLMBackend, purpose: str) -> float:
+        observed = backend.stats.percentile(purpose, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES)
+        if observed is None:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, observed)
+
+    async def _attempt(self, backend: LLMBackend, purpose: str, request: BackendRequest,
+                       estimated_tokens: int) -> Any:
+        started = time.perf_counter()
+        try:
+            raw = await backend.limiter.call(lambda: request(backend), estimated_tokens)
+        except asyncio.CancelledError:
+            backend.stats.record_cancelled(purpose, time.perf_counter() - started)
+            LLM_BACKEND_SECONDS.labels(backend=backend.name, outcome="cancelled").observe(time.perf_counter() - started)
+            raise
+        except Exception:
+            backend.stats.record(purpose, None, ok=False)
+            LLM_BACKEND_SECONDS.labels(backend=backend.name, outcome="error").observe(time.perf_counter() - started)
+            raise
+        seconds = time.perf_counter() - started
+        backend.stats.record(purpose, seconds, ok=True)
+        LLM_BACKEND_SECONDS.labels(backend=backend.name, outcome="success").observe(seconds)
+        return raw
+
+    async def call(self, purpose: str, request: BackendRequest, estimated_tokens: int,
+                   hedge: bool = True) -> Tuple[Any, LLMBackend]:
+        """
+        Envoie la requête au backend principal ; sans réponse après le délai de
+        couverture, la même requête part vers le backend suivant (si `hedge`).
+        Retourne la première réponse obtenue et le backend qui l'a produite.
+        """
+        candidates = self.ranked(purpose)
+        primary, alternates = candidates[0], candidates[1:]
+        loop = asyncio.get_running_loop()
+        tasks: Dict[asyncio.Task, LLMBackend] = {}
+        errors: List[Exception] = []
+
+        def launch(backend: LLMBackend):
+            backend.stats.last_attempt = time.monotonic()
+            tasks[asyncio.create_task(self._attempt(backend, purpose, request, estimated_tokens))] = backend
+
+        launch(primary)
+        hedge_at = loop.time() + self.hedge_delay(primary, purpose) if hedge and LLM_HEDGING and alternates else None
+        try:
+            while tasks:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Délai de couverture dépassé : seconde requête, la première continue
+                    hedge_at = None
+                    backend = alternates.pop(0)
+                    self.hedges += 1
+                    backend.stats.hedges_launched += 1
+                    LLM_HEDGES.labels(outcome="launched").inc()
+                    launch(backend)
+                    continue
+                winner = None
+                for task in done:
+                    backend = tasks.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = (task.result(), backend)
+                if winner is not None:
+                    if winner[1] is not primary:
+                        winner[1].stats.hedges_won += 1
+                        LLM_HEDGES.labels(outcome="won").inc()
+                    return winner
+                if not tasks and alternates:
+                    # Échec sans autre requête en cours : bascule immédiate sur le backend suivant
+                    hedge_at = None
+                    self.failovers += 1
+                    LLM_HEDGES.labels(outcome="failover").inc()
+                    launch(alternates.pop(0))
+        finally:
+            for task in tasks:
+                task.cancel()
+        # Un backend seulement indisponible pour l'instant : la soumission sera rejouée plus tard
+        unavailable = [e for e in errors if isinstance(e, LLMUnavailableError)]
+        raise unavailable[0] if unavailable else errors[0]
+
+    def open(self):
+        for backend in self.backends:
+            try:
+                backend.open()
+            except Exception as e:
+                print(f"⚠️ Erreur initialisation du backend LLM {backend.label}: {e}")
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routing": LLM_ROUTING,
+            "hedging": LLM_HEDGING and len(self.backends) > 1,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "backends": {
+                backend.label: {
+                    **backend.stats.as_dict(),
+                    "hedge_delay_s": {purpose: round(self.hedge_delay(backend, purpose), 3)
+                                      for purpose in backend.stats.latencies},
+                }
+                for backend in self.backends
+            },
+        }
+
+
+# Construit à la première utilisation (démarrage du web ou du worker), pas à l'import :
+# une erreur dans LLM_BACKENDS apparaît au démarrage et dans /health/ready
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter([build_backend(name) for name in LLM_BACKENDS])
+    return _llm_router
+
+
+async def close_llm_router():
+    if _llm_router is not None:
+        await _llm_router.close()
+
+
+def llm_router_stats() -> Dict[str, Any]:
+    if _llm_router is None:
+        return {"status": "not_started"}
+    return _llm_router.stats()
@@ -0,0 +1,278 @@
+# ==========================================================
+# LIMITEUR ADAPTATIF DES APPELS AU MODÈLE
+# ==========================================================
+# Partagé par tous les appels (file d'attente, réanalyse, analyse par morceaux) :
+#   - double seau à jetons : requêtes/minute et tokens/minute ;
+#   - ajusté en continu d'après les en-têtes x-ratelimit-* du fournisseur ;
+#   - nouvelles tentatives avec attente exponentielle « full jitter » ;
+#   - disjoncteur : après une série d'échecs, les appels échouent tout de
+#     suite pendant un délai de refroidissement au lieu d'empiler les erreurs ;
+#   - regroupement des requêtes concurrentes portant sur le même texte.
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+
+LLM_RPM = float(os.getenv("LLM_RPM", "3500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "90000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """Le modèle n'a pas pu répondre (limites, délais, disjoncteur ouvert) : l'analyse doit être rejouée plus tard."""
+
+    def __init__(self, message: str, retry_after: float = LLM_BREAKER_COOLDOWN, breaker: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        # Refus immédiat du disjoncteur : aucun appel n'a été tenté pour cette analyse
+        self.breaker = breaker
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Durées des en-têtes OpenAI : '1s', '6m0s', '250ms', ou un nombre de secondes."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+
+class TokenBucket:
+    """Seau à jetons rechargé en continu (capacité par minute)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float]):
+        """Aligne le seau sur ce que le fournisseur annonce réellement."""
+        self._refill()
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    # Coupure réseau pendant la lecture d'une réponse en flux : le SDK laisse passer l'erreur httpx
+    if isinstance(exc, httpx.TransportError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                        openai.InternalServerError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code in (409, 429, 500, 502, 503, 504)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    if response.headers.get("retry-after-ms"):
+        try:
+            return float(response.headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return _parse_duration(response.headers.get("retry-after"))
+
+
+class AdaptiveLLMLimiter:
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # Disjoncteur
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+        # Statistiques
+        self.waiting = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # --- A. Réservation de capacité ---
+    async def _acquire(self, estimated_tokens: int):
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:  # file FIFO : un seul appelant attend sa place à la fois
+                while True:
+                    pause = self._paused_until - time.monotonic()
+                    delay = max(pause, self.requests.delay_for(1), self.tokens.delay_for(estimated_tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(estimated_tokens)
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - start
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def observe_headers(self, headers):
+        """Adapte les seaux aux en-têtes x-ratelimit-* renvoyés par le fournisseur."""
+        if not headers:
+            return
+
+        def number(name):
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        self.requests.sync(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"))
+        self.tokens.sync(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+
+    # --- B. Disjoncteur ---
+    def _check_breaker(self):
+        remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            raise LLMUnavailableError("Disjoncteur ouvert : le modèle est temporairement indisponible", remaining,
+                                      breaker=True)
+
+    def _record_success(self):
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+    def _record_failure(self):
+        """Un appel dont toutes les tentatives ont échoué (et non chaque tentative)."""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= LLM_BREAKER_THRESHOLD:
+            self._open_until = time.monotonic() + LLM_BREAKER_COOLDOWN
+            print(f"--- ERREUR: Disjoncteur LLM ouvert pour {LLM_BREAKER_COOLDOWN:.0f} s. ---")
+
+    # --- C. Appel protégé ---
+    async def call(self, request: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        """
+        Exécute `request` (qui renvoie une réponse brute `with_raw_response`) sous
+        le contrôle du limiteur, avec nouvelles tentatives. Retourne la réponse brute.
+        """
+        self.calls += 1
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self._check_breaker()
+            await self._acquire(estimated_tokens)
+            try:
+                raw = await request()
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                retry_after = _retry_after(e)
+                rate_limited = getattr(e, "status_code", None) == 429
+                if rate_limited:
+                    self.rate_limited += 1
+                    # Tout le monde attend : inutile que les autres appelants reçoivent aussi un 429
+                    self._paused_until = time.monotonic() + (retry_after or LLM_BACKOFF_BASE)
+                if attempt == LLM_MAX_RETRIES:
+                    self.failures += 1
+                    # Un 429 avec Retry-After est une limite de débit annoncée, pas une panne :
+                    # il n'ouvre pas le disjoncteur pour tous les appelants
+                    if not (rate_limited and retry_after):
+                        self._record_failure()
+                    raise LLMUnavailableError(f"Modèle indisponible après {attempt + 1} tentatives: {e}",
+                                              retry_after or LLM_BREAKER_COOLDOWN)
+                self.retries += 1
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+                await asyncio.sleep(max(backoff, retry_after or 0))
+                continue
+
+            self._record_success()
+            self.observe_headers(getattr(raw, "headers", None))
+            return raw
+
+    async def coalesce(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Les appels concurrents avec la même clé partagent un seul appel au modèle."""
+        existing = self._inflight.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                # Appel de tête annulé (tâche arrêtée ailleurs) : ce n'est pas notre annulation,
+                # l'appel est relancé, par le premier des appelants en attente
+                if not existing.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.coalesce(key, factory)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # évite l'avertissement « exception never retrieved » sans attente
+            raise
+        except BaseException:
+            # Annulation de l'appel de tête : les autres appelants relancent l'appel eux-mêmes
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "queue_depth": self.waiting,
+            "inflight_coalesced_keys": len(self._inflight),
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "coalesced": self.coalesced,
+            "avg_wait_s": round(self.wait_total / self.calls, 3) if self.calls else 0.0,
+            "max_wait_s": round(self.wait_max, 3),
+            "requests_available": round(self.requests.level, 1),
+            "requests_per_minute": self.requests.capacity,
+            "tokens_available": round(self.tokens.level),
+            "tokens_per_minute": self.tokens.capacity,
+            "breaker_open": self._open_until > now,
+            "paused_for_s": round(max(0.0, self._paused_until - now), 3),
+        }
+
+
+llm_limiter = AdaptiveLLMLimiter()
@@ -1,47 +1,148 @@
 # ==========================================================
 # 1. IMPORTS
 # ==========================================================
-import httpx
 import os
 import jwt
 import uuid
 import json
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, date
+from typing import Optional, List
 
 # --- Imports FastAPI ---
-from fastapi import FastAPI, Request, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, File, UploadFile, Form, Query
 from fastapi.templating import Jinja2Templates
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-# --- Imports Base de Données & Supabase ---
-import psycopg
+# --- Imports Base de Données, Stockage & Authentification ---
 from psycopg import AsyncConnection
-from supabase import create_client, Client
+from database import (
+    open_pool, close_pool, pool_stats, connection as db_connection, read_connection, is_replica, current_wal_lsn,
+    DATABASE_REPLICA_URL
+)
+from http_client import open_http_client, close_http_client, download_stats
+from storage import get_storage, get_auth
+from extraction import shutdown_executor
+from reanalysis import create_run, execute_run, get_run
+from analytics import fetch_professor_analytics
+from export import stream_grades_csv, stream_reports_zip
+from dashboard import (
+    fetch_dashboard_page, dashboard_version, dashboard_etag, etag_matches, InvalidCursorError, DASHBOARD_PAGE_SIZE
+)
 
 # --- Imports Sécurité & Utilitaires ---
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
 
-# --- Import du module d'analyse IA ---
-from ai_analyzer import extract_text_from_file, analyze_business_plan, generate_formatted_report
+# --- Import de la file d'attente des analyses ---
+from job_queue import AnalysisWorkerPool, ANALYSIS_WORKER_MODE, ANALYSIS_WORKERS, queue_depth
+from ai_analyzer import open_llm_client, close_llm_client, normalize_partial_analysis
+from analysis_cache import cache_stats
+from llm_limiter import llm_limiter
+from llm_backends import get_llm_router, llm_router_stats
+from events import submission_events, sse_stream, submission_key, professor_key
+from report import render_report, report_body, report_etag, report_cache, TEMPLATE_VERSION
+from compression import negotiate_encoding, encoded_etag, PrecompressedBody
+from directory import professor_directory, PROFESSOR_DIRECTORY_CHANNEL
+from metrics import stage, render_metrics, METRICS_CONTENT_TYPE, HTTP_REQUEST_SECONDS, QUEUE_DEPTH
+from uploads import (
+    spool_upload, attach_spooled_file, discard_upload, discard_spooled_file, UploadTooLargeError, MAX_UPLOAD_BYTES,
+    validate_upload, create_upload_session, load_upload_session, receive_chunk, assemble_upload,
+    restore_upload_session, close_upload_session, discard_upload_session, UploadSessionNotFoundError,
+    UnsupportedFileError, IncompleteUploadError
+)
 
 # ==========================================================
 # 2. CONFIGURATION ET INITIALISATION DE FastAPI
 # ==========================================================
 print("--- INFO: Démarrage de l'application FastAPI ---")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Le pool Postgres et le client HTTP partagé vivent aussi longtemps que l'application
+    app.state.ready = False
+    await open_pool()
+    await open_http_client()
+    # En mode "external", les analyses sont traitées par le processus `worker` du Procfile
+    # (le client du modèle n'est alors créé qu'en cas de réanalyse lancée depuis le web)
+    if ANALYSIS_WORKER_MODE == "inprocess":
+        open_llm_client()
+        app.state.analysis_workers = AnalysisWorkerPool(ANALYSIS_WORKERS)
+        await app.state.analysis_workers.start()
+    else:
+        app.state.analysis_workers = None
+    app.state.reanalysis_tasks = set()
+    # Les changements de statut arrivent par LISTEN/NOTIFY, quel que soit le processus qui les écrit
+    await submission_events.start()
+    app.state.ready = True
+    yield
+    # Arrêt : le processus ne se déclare plus prêt, puis les analyses en cours se terminent
+    # (ou sont remises en attente) avant la fermeture des connexions
+    app.state.ready = False
+    await submission_events.stop()
+    for task in list(app.state.reanalysis_tasks):
+        task.cancel()
+    if app.state.analysis_workers:
+        await app.state.analysis_workers.stop()
+    shutdown_executor()
+    await close_llm_client()
+    await close_http_client()
+    await close_pool()
 
 app = FastAPI(
     title="Plans d'Affaires API",
     description="API pour soumission et analyse de plans d'affaires avec IA",
-    version="3.1.0" # Version finale avec dashboard
+    version="3.1.0", # Version finale avec dashboard
+    lifespan=lifespan
 )
 
 templates = Jinja2Templates(directory="templates")
 
+# Pages sans contenu dynamique : rendues une seule fois au démarrage, compressées
+# d'avance et servies avec un ETag fort (304 quand le navigateur a déjà la page)
+STATIC_PAGE_CACHE_CONTROL = "public, no-cache"
+static_pages = {
+    name: PrecompressedBody(
+        templates.get_template(name).render().encode("utf-8"), "text/html; charset=utf-8", STATIC_PAGE_CACHE_CONTROL
+    )
+    for name in ("student.html", "professor.html")
+}
+
+# La liste des professeurs en mémoire est vidée à chaque modification de la table
+submission_events.add_channel_listener(PROFESSOR_DIRECTORY_CHANNEL, professor_directory.invalidate)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Le gabarit de la route (ex. /api/analysis/{submission_id}) et non l'URL : cardinalité bornée
+    route = request.scope.get("route")
+    # Les flux SSE restent ouverts : leur durée n'est pas une latence
+    if route is not None and not response.headers.get("content-type", "").startswith("text/event-stream"):
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method, route=route.path, status=str(response.status_code)
+        ).observe(time.perf_counter() - start)
+    return response
+
+# Marge pour l'enveloppe multipart (champs du formulaire, séparateurs)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_submissions(request: Request, call_next):
+    # FastAPI lit tout le formulaire avant d'appeler la route : un dépôt annoncé
+    # trop gros est refusé sur son Content-Length, avant la lecture du corps
+    if request.method == "POST" and request.url.path == "/submissions":
+        try:
+            declared = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            declared = 0
+        if declared > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": "Fichier trop volumineux (max 15MB)"})
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -53,15 +154,10 @@ app.add_middleware(
 security = HTTPBearer()
 SECRET_KEY = os.getenv("JWT_SECRET", "une-cle-secrete-tres-forte-a-changer")
 ALGORITHM = "HS256"
-DATABASE_URL = os.getenv("DATABASE_URL")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("--- INFO: Client Supabase initialisé avec succès. ---")
-except Exception as e:
-    print(f"--- ERREUR CRITIQUE: Impossible d'initialiser Supabase. {e} ---")
+# Jetons de lien (téléchargements, EventSource) : ils passent dans l'URL et finissent
+# donc dans les journaux d'accès ; courte durée et un seul usage permis chacun
+LINK_TOKEN_TTL = int(os.getenv("LINK_TOKEN_TTL", "60"))
+LINK_TOKEN_SCOPES = ("export", "events")
 
 
 # ==========================================================
@@ -89,16 +185,54 @@ class SubmissionResponse(BaseModel):
 # Ajoutez simplement ceci à la fin de votre section de modèles
 class AnalysisReportResponse(BaseModel):
     report_html: str
+    partial: bool = False
+
+class LinkTokenRequest(BaseModel):
+    scope: str
+
+class ReanalysisRequest(BaseModel):
+    status: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
 # ==========================================================
 # 4. FONCTIONS UTILITAIRES
 # ==========================================================
 async def get_db_connection():
-    try:
-        conn = await AsyncConnection.connect(DATABASE_URL)
+    # Connexion empruntée au pool partagé, rendue automatiquement après la requête
+    async with db_connection() as conn:
+        yield conn
+
+# Lecture de ses propres écritures : après une écriture, le client garde quelques
+# secondes la position WAL du primaire ; tant que la réplique ne l'a pas rejointe,
+# ses lectures vont au primaire
+READ_AFTER_COOKIE = "lancement_read_after"
+READ_AFTER_MAX_AGE = 60
+
+async def get_read_connection(request: Request):
+    # Routes en lecture seule : réplique si elle est configurée et à jour, primaire sinon
+    async with read_connection(request.cookies.get(READ_AFTER_COOKIE)) as conn:
         yield conn
-    finally:
-        if 'conn' in locals() and conn and not conn.closed:
-            await conn.close()
+
+async def remember_write(conn: AsyncConnection, response: Response):
+    """À appeler après le COMMIT d'une écriture que le client va relire."""
+    if DATABASE_REPLICA_URL:
+        response.set_cookie(READ_AFTER_COOKIE, await current_wal_lsn(conn), max_age=READ_AFTER_MAX_AGE,
+                            httponly=True, samesite="lax")
+
+REPORT_QUERY = """
+    SELECT s.student_name, s.project_title, s.status, s.partial_analysis,
+           a.id, a.analysis_json, a.report_content, a.generated_at, a.processing_time_seconds, a.model
+    FROM submissions s
+    LEFT JOIN LATERAL (
+        SELECT id, analysis_json, report_content, generated_at, processing_time_seconds, model
+        FROM analyses WHERE submission_id = s.id ORDER BY generated_at DESC LIMIT 1
+    ) a ON true
+    WHERE s.id = %s AND s.professor_id = %s
+"""
+
+async def fetch_report_row(conn: AsyncConnection, submission_id: str, professor_id: str):
+    cursor = await conn.execute(REPORT_QUERY, (submission_id, professor_id))
+    return await cursor.fetchone()
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -107,50 +241,25 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 async def get_current_professor(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_professor_token(credentials.credentials)
+
+def decode_professor_token(token: str, scope: Optional[str] = None) -> str:
+    """
+    Professeur désigné par le jeton. Sans `scope`, seul le jeton de session est
+    accepté ; avec `scope`, seul un jeton de lien émis pour cet usage.
+    """
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         professor_id: str = payload.get("sub")
-        if professor_id is None:
+        if professor_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Token invalide ou expiré")
         return professor_id
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Token invalide ou expiré")
 
-async def process_submission_with_ai(submission_id: str):
-    start_time = datetime.now()
-    async with await AsyncConnection.connect(DATABASE_URL) as conn:
-        try:
-            query = "SELECT file_url, student_name, project_title FROM submissions WHERE id = %s"
-            cursor = await conn.execute(query, (submission_id,))
-            submission = await cursor.fetchone()
-            if not submission: return
-
-            file_url, student_name, project_title = submission
-            text = await extract_text_from_file(file_url)
-            analysis_results = await analyze_business_plan(text, student_name, project_title)
-
-            processing_time = (datetime.now() - start_time).seconds
-            report_content = generate_formatted_report(analysis_results, student_name, project_title, processing_time)
-            
-            score = analysis_results.get('score_global', 0)
-            analysis_id = str(uuid.uuid4())
-
-            insert_query = """
-                INSERT INTO analyses (id, submission_id, report_content, score_global, generated_at, processing_time_seconds)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            await conn.execute(insert_query, (analysis_id, submission_id, report_content, score, datetime.now(), processing_time))
-            
-            update_query = "UPDATE submissions SET status = 'completed', score = %s WHERE id = %s"
-            await conn.execute(update_query, (score, submission_id))
-            await conn.commit()
-            print(f"--- INFO: Analyse pour {submission_id} terminée avec succès. ---")
-
-        except Exception as e:
-            print(f"--- ERREUR CRITIQUE dans la tâche de fond pour {submission_id}: {e} ---")
-            update_query = "UPDATE submissions SET status = 'error' WHERE id = %s"
-            await conn.execute(update_query, (submission_id,))
-            await conn.commit()
+def create_link_token(professor_id: str, scope: str) -> str:
+    expire = datetime.utcnow() + timedelta(seconds=LINK_TOKEN_TTL)
+    return jwt.encode({"sub": professor_id, "scope": scope, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
 
 # ==========================================================
 # 5. ROUTES API
@@ -159,29 +268,64 @@ async def process_submission_with_ai(submission_id: str):
 @app.get("/api/analysis/{submission_id}", response_model=AnalysisReportResponse, tags=["Rapport d'Analyse"])
 async def get_analysis_report(
     submission_id: str,
-    conn: AsyncConnection = Depends(get_db_connection),
+    request: Request,
+    conn: AsyncConnection = Depends(get_read_connection),
     professor_id: str = Depends(get_current_professor) # Route protégée
 ):
     """
     Récupère le rapport d'analyse HTML pour une soumission spécifique.
     Vérifie que la soumission appartient bien au professeur connecté.
+    Le rapport est rendu à la demande depuis l'analyse structurée, compressé
+    (brotli/gzip) et revalidé par ETag. Pendant une analyse reçue en flux, le
+    rapport partiel (champs déjà reçus) est renvoyé avec `partial: true`.
     """
     try:
-        # 1. Sécurité : On vérifie que le professeur connecté a bien le droit de voir ce rapport
-        check_query = "SELECT id FROM submissions WHERE id = %s AND professor_id = %s"
-        cursor = await conn.execute(check_query, (submission_id, professor_id))
-        if not await cursor.fetchone():
+        # Une seule requête : la condition sur professor_id vérifie l'accès, la jointure
+        # latérale ramène la dernière analyse (NULL si aucune)
+        report = await fetch_report_row(conn, submission_id, professor_id)
+        # Réplique pas encore à jour d'une soumission ou d'une analyse toute récente : relecture sur le primaire
+        if is_replica(conn) and (report is None or (report[4] is None and report[3] is None)):
+            async with db_connection() as primary:
+                report = await fetch_report_row(primary, submission_id, professor_id)
+        if not report:
             raise HTTPException(status_code=404, detail="Rapport non trouvé ou accès non autorisé.")
 
-        # 2. On récupère le contenu du rapport depuis la table 'analyses'
-        report_query = "SELECT report_content FROM analyses WHERE submission_id = %s"
-        cursor = await conn.execute(report_query, (submission_id,))
-        report = await cursor.fetchone()
-        
-        if not report or not report[0]:
+        student_name, project_title, status, partial_analysis, analysis_id, analysis_json, report_content, \
+            generated_at, processing_time, model = report
+
+        # Analyse en cours : rendu du partiel, jamais mis en cache (il change à chaque champ reçu)
+        if status == "processing" and partial_analysis is not None:
+            with stage("report_render"):
+                html = render_report(normalize_partial_analysis(partial_analysis), student_name, project_title,
+                                     None, None, partial=True)
+            return Response(
+                content=json.dumps({"report_html": html, "partial": True}, ensure_ascii=False),
+                media_type="application/json", headers={"Cache-Control": "no-store"}
+            )
+
+        if analysis_id is None or (analysis_json is None and not report_content):
             raise HTTPException(status_code=404, detail="Le rapport d'analyse n'est pas encore disponible.")
-            
-        return {"report_html": report[0]}
+
+        analysis_id = str(analysis_id)
+        # Les analyses antérieures à la migration 008 n'ont que leur HTML figé
+        version = TEMPLATE_VERSION if analysis_json is not None else "legacy"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        etag = encoded_etag(report_etag(analysis_id, version), encoding)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        def render():
+            if analysis_json is None:
+                return report_content
+            with stage("report_render"):
+                return render_report(analysis_json, student_name, project_title, generated_at, processing_time,
+                                     model=model)
+
+        body = report_body(analysis_id, version, render, encoding)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
 
     except HTTPException:
         raise
@@ -191,23 +335,79 @@ async def get_analysis_report(
 # --- A. ROUTES POUR SERVIR LES PAGES HTML ---
 @app.get("/", tags=["Pages HTML"])
 async def serve_student_page_at_root(request: Request):
-    return templates.TemplateResponse("student.html", {"request": request})
+    return static_pages["student.html"].response(request)
 
 @app.get("/student", tags=["Pages HTML"])
 async def serve_student_page(request: Request):
-    return templates.TemplateResponse("student.html", {"request": request})
+    return static_pages["student.html"].response(request)
 
 @app.get("/professor", tags=["Pages HTML"])
 async def serve_professor_page(request: Request):
-    return templates.TemplateResponse("professor.html", {"request": request})
+    return static_pages["professor.html"].response(request)
 
 # --- B. ROUTES POUR LES DONNÉES ET ACTIONS ---
+@app.get("/api/stats", tags=["Supervision"])
+async def get_service_stats():
+    """Statistiques internes du service (pool Postgres, file d'analyses)."""
+    workers = app.state.analysis_workers
+    return {
+        "db_pool": pool_stats(),
+        "analysis_queue": await queue_depth(),
+        "analysis_workers": workers.stats() if workers else {"mode": ANALYSIS_WORKER_MODE},
+        "analysis_cache": {**cache_stats(), "report": report_cache.stats()},
+        "llm": llm_limiter.stats(),
+        "llm_backends": llm_router_stats(),
+        "events": submission_events.stats(),
+        "downloads": download_stats(),
+        "professor_directory": professor_directory.stats(),
+    }
+
+@app.get("/health/live", tags=["Supervision"])
+async def liveness():
+    """Le processus répond : ne dépend pas de la base (une panne de Postgres ne doit pas le faire redémarrer)."""
+    return {"status": "alive", "pid": os.getpid()}
+
+@app.get("/health/ready", tags=["Supervision"])
+async def readiness():
+    """Prêt à recevoir du trafic : démarrage terminé, pas en cours d'arrêt, base joignable."""
+    checks = {"started": getattr(app.state, "ready", False), "database": False,
+              "events": submission_events.connected, "llm_backends": False}
+    if checks["started"]:
+        try:
+            async with db_connection() as conn:
+                await asyncio.wait_for(conn.execute("SELECT 1"), timeout=2)
+            checks["database"] = True
+        except Exception as e:
+            print(f"❌ Vérification de disponibilité: base injoignable ({e})")
+    try:
+        # Configuration des backends (LLM_BACKENDS) : construite ici si aucun appel ne l'a encore fait
+        get_llm_router()
+        checks["llm_backends"] = True
+    except ValueError as e:
+        print(f"❌ Vérification de disponibilité: {e}")
+    ready = checks["started"] and checks["database"] and checks["llm_backends"]
+    return Response(
+        content=json.dumps({"status": "ready" if ready else "unavailable", "checks": checks}),
+        status_code=200 if ready else 503, media_type="application/json", headers={"Cache-Control": "no-store"}
+    )
+
+@app.get("/metrics", tags=["Supervision"], include_in_schema=False)
+async def get_metrics():
+    """Métriques au format Prometheus."""
+    try:
+        depth = await queue_depth()
+        for status, count in depth.items():
+            QUEUE_DEPTH.labels(status=status).set(count)
+    except Exception as e:
+        print(f"❌ Erreur lecture de la file pour /metrics: {e}")
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/professors", response_model=List[ProfessorResponse], tags=["Données"])
-async def get_all_professors(conn: AsyncConnection = Depends(get_db_connection)):
+async def get_all_professors(request: Request):
+    """Liste des professeurs, servie depuis l'annuaire en mémoire (directory.py) sans emprunter de connexion."""
     try:
-        cursor = await conn.execute("SELECT id, email, name, course FROM professors")
-        professors = await cursor.fetchall()
-        return [{"id": str(row[0]), "email": row[1], "name": row[2], "course": row[3]} for row in professors]
+        directory = await professor_directory.get()
+        return directory.response(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
@@ -216,14 +416,12 @@ async def login_professor(professor_data: ProfessorLogin, conn: AsyncConnection
     """Authentifie le professeur et renvoie un token JWT."""
     try:
         print(f"🔍 Tentative de login pour: {professor_data.email}")
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": professor_data.email, "password": professor_data.password
-        })
+        auth_user = await get_auth().sign_in_with_password(professor_data.email, professor_data.password)
 
-        if not auth_response or not auth_response.user:
+        if not auth_user:
             raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect via Supabase Auth")
 
-        print(f"✅ User authentifié via Supabase: {auth_response.user.email}")
+        print(f"✅ User authentifié via Supabase: {auth_user.get('email')}")
         
         query = "SELECT id, name, course FROM professors WHERE email = %s"
         cursor = await conn.execute(query, (professor_data.email,))
@@ -254,60 +452,198 @@ async def login_professor(professor_data: ProfessorLogin, conn: AsyncConnection
 # --- LA ROUTE POUR LE TABLEAU DE BORD ---
 @app.get("/api/professor/dashboard", tags=["Tableau de Bord Professeur"])
 async def get_professor_dashboard(
-    conn: AsyncConnection = Depends(get_db_connection),
+    request: Request,
+    response: Response,
+    limit: int = Query(DASHBOARD_PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    conn: AsyncConnection = Depends(get_read_connection),
     professor_id: str = Depends(get_current_professor)
 ):
-    """Récupère toutes les soumissions associées au professeur connecté."""
+    """
+    Récupère une page des soumissions du professeur connecté (les plus récentes d'abord).
+    Passer `next_cursor` dans `cursor` pour la page suivante. Répond 304 si rien n'a changé.
+    """
     try:
-        query = """
-            SELECT s.id, s.student_name, s.student_email, s.project_title, s.submission_date, s.status, s.score
-            FROM submissions s
-            WHERE s.professor_id = %s
-            ORDER BY s.submission_date DESC;
-        """
-        cursor = await conn.execute(query, (professor_id,))
-        submissions = await cursor.fetchall()
-        return [{"id": str(row[0]), "student_name": row[1], "student_email": row[2], "project_title": row[3], "submission_date": row[4], "status": row[5], "score": row[6]} for row in submissions]
+        # 1. Version des données du professeur : une seule ligne lue
+        version = await dashboard_version(conn, professor_id)
+        etag = dashboard_etag(professor_id, version, {
+            "limit": limit, "cursor": cursor, "status": status, "date_from": date_from, "date_to": date_to
+        })
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        # 2. La page elle-même, par l'index (professor_id, submission_date, id)
+        page = await fetch_dashboard_page(conn, professor_id, limit, cursor, status, date_from, date_to)
+        response.headers.update(headers)
+        return page
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ Erreur récupération tableau de bord: {e}")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
-@app.post("/submissions", response_model=SubmissionResponse, tags=["Soumissions"])
-async def create_submission(
-    background_tasks: BackgroundTasks,
-    student_name: str = Form(...),
-    student_email: str = Form(...),
-    professor_id: str = Form(...),
-    project_title: str = Form(...),
-    file: UploadFile = File(...),
-    conn: AsyncConnection = Depends(get_db_connection)
+# --- STATISTIQUES DE LA CLASSE ---
+@app.get("/api/professor/analytics", tags=["Tableau de Bord Professeur"])
+async def get_professor_analytics(
+    request: Request,
+    response: Response,
+    conn: AsyncConnection = Depends(get_read_connection),
+    professor_id: str = Depends(get_current_professor)
 ):
-    if not file.filename.endswith(('.pdf', '.doc', '.docx')):
-        raise HTTPException(status_code=400, detail="Format de fichier non supporté.")
-    if file.size > 15 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 15MB)")
-    
-    file_content = await file.read()
-    file_extension = file.filename.split('.')[-1]
-    unique_filename_in_bucket = f"{uuid.uuid4()}.{file_extension}"
-    
-    public_url = ""
+    """
+    Moyenne de la classe, distribution et percentiles par critère, et soumissions
+    aux notes atypiques. Calculé depuis le résumé tenu à jour à chaque analyse.
+    """
     try:
-        supabase.storage.from_("lancement").upload(
-            path=unique_filename_in_bucket, file=file_content, file_options={"content-type": file.content_type}
-        )
-        public_url = supabase.storage.from_("lancement").get_public_url(unique_filename_in_bucket)
+        version = await dashboard_version(conn, professor_id)
+        etag = dashboard_etag(professor_id, version, {"view": "analytics"})
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        analytics = await fetch_professor_analytics(conn, professor_id)
+        response.headers.update(headers)
+        return analytics
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur Supabase: {str(e)}")
+        print(f"❌ Erreur calcul des statistiques: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+# --- JETONS DE LIEN ---
+@app.post("/api/professor/link-token", tags=["Tableau de Bord Professeur"])
+async def issue_link_token(link: LinkTokenRequest, professor_id: str = Depends(get_current_professor)):
+    """
+    Jeton court (LINK_TOKEN_TTL secondes) pour les URL qui ne peuvent pas porter
+    d'en-tête Authorization : liens de téléchargement et EventSource.
+    """
+    if link.scope not in LINK_TOKEN_SCOPES:
+        raise HTTPException(status_code=400, detail="Usage de jeton inconnu.")
+    return {"token": create_link_token(professor_id, link.scope), "expires_in": LINK_TOKEN_TTL}
+
+# --- EXPORT DES NOTES ET DES RAPPORTS ---
+# Téléchargements déclenchés par un simple lien : le jeton de lien "export" passe en paramètre
+@app.get("/api/professor/export/grades.csv", tags=["Tableau de Bord Professeur"])
+async def export_grades(
+    token: str,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """CSV des notes (globale et par critère) de toutes les soumissions du professeur, pour l'import dans le LMS."""
+    professor_id = decode_professor_token(token, scope="export")
+    filename = f"notes_{date.today().isoformat()}.csv"
+    return StreamingResponse(
+        stream_grades_csv(professor_id, status, date_from, date_to),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+@app.get("/api/professor/export/reports.zip", tags=["Tableau de Bord Professeur"])
+async def export_reports(
+    token: str,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Archive ZIP des rapports HTML des soumissions analysées, construite et envoyée au fil de la lecture."""
+    professor_id = decode_professor_token(token, scope="export")
+    filename = f"rapports_{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        stream_reports_zip(professor_id, status, date_from, date_to),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+# --- FLUX D'ÉVÉNEMENTS (Server-Sent Events) ---
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/api/submissions/{submission_id}/events", tags=["Événements"])
+async def stream_submission_events(submission_id: str, request: Request):
+    """Statut d'une soumission en direct (page étudiant). Le flux se ferme à la fin de l'analyse."""
+    # Le cookie posé au dépôt garantit que la réplique connaît déjà la soumission
+    read_after = request.cookies.get(READ_AFTER_COOKIE)
+
+    async def snapshot():
+        async with read_connection(read_after) as conn:
+            cursor = await conn.execute("SELECT status FROM submissions WHERE id = %s", (submission_id,))
+            row = await cursor.fetchone()
+        return [{"type": "status", "submission_id": submission_id, "status": row[0]}] if row else []
 
+    try:
+        uuid.UUID(submission_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Soumission introuvable.")
+    if not await snapshot():
+        raise HTTPException(status_code=404, detail="Soumission introuvable.")
+
+    return StreamingResponse(
+        sse_stream(request, submission_events, submission_key(submission_id), snapshot,
+                   public=True, stop_on_terminal=True),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+@app.get("/api/professor/events", tags=["Événements"])
+async def stream_professor_events(request: Request, token: str):
+    """
+    Transitions de statut de toutes les soumissions du professeur.
+    EventSource ne permet pas d'en-tête Authorization : un jeton de lien "events"
+    passe en paramètre. Il n'est vérifié qu'à l'ouverture du flux.
+    """
+    professor_id = decode_professor_token(token, scope="events")
+
+    async def snapshot():
+        return []
+
+    return StreamingResponse(
+        sse_stream(request, submission_events, professor_key(professor_id), snapshot),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+async def register_submission(
+    request: Request, response: Response, conn: AsyncConnection, upload, file_name: str,
+    content_type: Optional[str], student_name: str, student_email: str, professor_id: str, project_title: str
+) -> SubmissionResponse:
+    """
+    Envoie le fichier de transit vers le stockage (sauf fichier identique déjà
+    déposé), crée la soumission 'pending' et réveille les workers. Commun au
+    dépôt en une fois et à la finalisation d'un dépôt par morceaux.
+    """
+    content_hash = upload.content_hash
+    file_extension = upload.extension
+    unique_filename_in_bucket = f"{uuid.uuid4()}.{file_extension}"
+
+    # Un fichier identique déjà déposé est réutilisé tel quel : pas de nouvel envoi vers Supabase
+    cursor = await conn.execute(
+        "SELECT file_url FROM submissions WHERE content_hash = %s AND file_url <> '' LIMIT 1", (content_hash,)
+    )
+    existing = await cursor.fetchone()
+
+    public_url = existing[0] if existing else ""
+    if not public_url:
+        storage = get_storage()
+        try:
+            # Envoi asynchrone en flux depuis le fichier local : la boucle d'événements n'est jamais bloquée
+            await storage.upload(unique_filename_in_bucket, upload.path, content_type)
+            public_url = storage.public_url(unique_filename_in_bucket)
+        except Exception as e:
+            discard_upload(upload)
+            raise HTTPException(status_code=500, detail=f"Erreur Supabase: {str(e)}")
+
+    # Le fichier de transit prend le nom de la soumission avant l'INSERT : le worker
+    # le trouve dès que la ligne 'pending' est visible
+    submission_id = str(uuid.uuid4())
+    attach_spooled_file(upload, submission_id)
     try:
         query = """
-        INSERT INTO submissions (student_name, student_email, professor_id, project_title, file_url, file_name, file_size, status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO submissions (id, student_name, student_email, professor_id, project_title, file_url, file_name, file_size, status, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id, student_name, student_email, project_title, status, submission_date, file_name, score
         """
         cursor = await conn.execute(
-            query, (student_name, student_email, professor_id, project_title, public_url, file.filename, len(file_content), 'pending')
+            query, (submission_id, student_name, student_email, professor_id, project_title, public_url, file_name, upload.size, 'pending', content_hash)
         )
         submission = await cursor.fetchone()
         await conn.commit()
@@ -319,11 +655,181 @@ async def create_submission(
         }
         
     except Exception as e:
+        discard_spooled_file(submission_id)
         raise HTTPException(status_code=500, detail=f"Erreur base de données: {str(e)}")
+    await remember_write(conn, response)
 
-    background_tasks.add_task(process_submission_with_ai, submission_dict['id'])
+    # La ligne 'pending' est le job : on réveille simplement les workers locaux
+    if request.app.state.analysis_workers:
+        request.app.state.analysis_workers.notify()
     return SubmissionResponse(**submission_dict)
 
+@app.post("/submissions", response_model=SubmissionResponse, tags=["Soumissions"])
+async def create_submission(
+    request: Request,
+    response: Response,
+    student_name: str = Form(...),
+    student_email: str = Form(...),
+    professor_id: str = Form(...),
+    project_title: str = Form(...),
+    file: UploadFile = File(...),
+    conn: AsyncConnection = Depends(get_db_connection)
+):
+    if not file.filename.endswith(('.pdf', '.doc', '.docx')):
+        raise HTTPException(status_code=400, detail="Format de fichier non supporté.")
+    if file.size and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 15MB)")
+    
+    file_extension = file.filename.split('.')[-1]
+
+    # Lecture par morceaux : empreinte et taille calculées au fil de l'eau, sans tout charger en mémoire
+    try:
+        upload = await spool_upload(file, file_extension)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 15MB)")
+
+    return await register_submission(
+        request, response, conn, upload, file.filename, file.content_type,
+        student_name, student_email, professor_id, project_title
+    )
+
+# --- DÉPÔT REPRENABLE PAR MORCEAUX ---
+class UploadCreateRequest(BaseModel):
+    student_name: str
+    student_email: str
+    professor_id: str
+    project_title: str
+    file_name: str
+    file_size: int
+    content_type: Optional[str] = None
+
+def _upload_error(e: Exception) -> HTTPException:
+    if isinstance(e, UploadSessionNotFoundError):
+        return HTTPException(status_code=404, detail="Dépôt introuvable ou expiré.")
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, UnsupportedFileError):
+        return HTTPException(status_code=415, detail=str(e))
+    if isinstance(e, IncompleteUploadError):
+        return HTTPException(status_code=409, detail={"message": str(e), "missing": e.missing})
+    return HTTPException(status_code=400, detail=str(e))
+
+@app.post("/uploads", status_code=201, tags=["Soumissions"])
+async def create_upload(upload: UploadCreateRequest, response: Response):
+    """
+    Annonce un dépôt reprenable : nom, taille et professeur sont vérifiés avant
+    l'envoi du premier octet. Le fichier est ensuite envoyé par morceaux de
+    `chunk_size` octets (PATCH /uploads/{upload_id}), en parallèle.
+    """
+    try:
+        validate_upload(upload.file_name, upload.file_size)
+    except ValueError as e:
+        raise _upload_error(e)
+    try:
+        uuid.UUID(upload.professor_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Professeur inconnu.")
+    async with db_connection() as conn:
+        cursor = await conn.execute("SELECT 1 FROM professors WHERE id = %s", (upload.professor_id,))
+        if not await cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Professeur inconnu.")
+    fields = upload.model_dump(include={"student_name", "student_email", "professor_id", "project_title"})
+    session = await create_upload_session(upload.file_name, upload.file_size, upload.content_type, fields)
+    response.headers["Location"] = f"/uploads/{session.upload_id}"
+    return session.describe()
+
+@app.get("/uploads/{upload_id}", tags=["Soumissions"])
+async def get_upload(upload_id: str):
+    """État d'un dépôt : morceaux encore absents (à renvoyer après une coupure)."""
+    try:
+        session = await load_upload_session(upload_id)
+        return session.describe()
+    except UploadSessionNotFoundError as e:
+        raise _upload_error(e)
+
+@app.patch("/uploads/{upload_id}", status_code=204, tags=["Soumissions"])
+async def upload_chunk(upload_id: str, request: Request):
+    """Un morceau, à la position donnée par l'en-tête Upload-Offset (corps brut, lu en flux)."""
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="En-tête Upload-Offset manquant ou invalide.")
+    try:
+        session = await load_upload_session(upload_id)
+        end = await receive_chunk(session, offset, request.stream())
+    except (UploadSessionNotFoundError, ValueError) as e:
+        raise _upload_error(e)
+    return Response(status_code=204, headers={"Upload-Offset": str(end)})
+
+@app.post("/uploads/{upload_id}/complete", response_model=SubmissionResponse, tags=["Soumissions"])
+async def complete_upload(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    conn: AsyncConnection = Depends(get_db_connection)
+):
+    """Assemble les morceaux, crée la soumission et met l'analyse en file (comme POST /submissions)."""
+    try:
+        session = await load_upload_session(upload_id)
+        upload = await assemble_upload(session)
+    except (UploadSessionNotFoundError, ValueError) as e:
+        raise _upload_error(e)
+    fields = session.fields
+    try:
+        submission = await register_submission(
+            request, response, conn, upload, session.file_name, session.content_type,
+            fields["student_name"], fields["student_email"], fields["professor_id"], fields["project_title"]
+        )
+    except BaseException:
+        # Soumission non créée : les morceaux sont conservés pour une nouvelle finalisation
+        restore_upload_session(session)
+        raise
+    close_upload_session(session)
+    return submission
+
+@app.delete("/uploads/{upload_id}", status_code=204, tags=["Soumissions"])
+async def abort_upload(upload_id: str):
+    try:
+        discard_upload_session(upload_id)
+    except UploadSessionNotFoundError as e:
+        raise _upload_error(e)
+    return Response(status_code=204)
+
+# --- C. RÉANALYSE EN LOT ---
+def _start_reanalysis_task(run_id: str):
+    task = asyncio.create_task(execute_run(run_id), name=f"reanalysis-{run_id}")
+    app.state.reanalysis_tasks.add(task)
+    task.add_done_callback(app.state.reanalysis_tasks.discard)
+
+@app.post("/api/professor/reanalysis", status_code=202, tags=["Réanalyse"])
+async def start_reanalysis(
+    reanalysis: ReanalysisRequest,
+    professor_id: str = Depends(get_current_professor)
+):
+    """Relance l'analyse des soumissions du professeur connecté (après un changement de prompt ou de modèle)."""
+    filters = {"professor_id": professor_id, **reanalysis.model_dump()}
+    run_id = await create_run(filters)
+    _start_reanalysis_task(run_id)
+    return await get_run(run_id)
+
+@app.get("/api/professor/reanalysis/{run_id}", tags=["Réanalyse"])
+async def get_reanalysis_progress(run_id: str, professor_id: str = Depends(get_current_professor)):
+    run = await get_run(run_id)
+    if not run or run["professor_id"] != professor_id:
+        raise HTTPException(status_code=404, detail="Réanalyse introuvable.")
+    return run
+
+@app.post("/api/professor/reanalysis/{run_id}/resume", status_code=202, tags=["Réanalyse"])
+async def resume_reanalysis(run_id: str, professor_id: str = Depends(get_current_professor)):
+    """Reprend une réanalyse interrompue après la dernière soumission traitée."""
+    run = await get_run(run_id)
+    if not run or run["professor_id"] != professor_id:
+        raise HTTPException(status_code=404, detail="Réanalyse introuvable.")
+    if run["status"] == "running" and any(t.get_name() == f"reanalysis-{run_id}" for t in app.state.reanalysis_tasks):
+        raise HTTPException(status_code=409, detail="Cette réanalyse est déjà en cours.")
+    _start_reanalysis_task(run_id)
+    return run
+
 # ==========================================================
 # 6. POINT D'ENTRÉE POUR LE LANCEMENT
 # ==========================================================
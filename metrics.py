@@ -0,0 +1,178 @@
+# ==========================================================
+# INSTRUMENTATION : DURÉES PAR ÉTAPE ET MÉTRIQUES PROMETHEUS
+# ==========================================================
+# - Chaque étape du pipeline (téléchargement, extraction, appel au modèle,
+#   rapport, écritures) est chronométrée avec time.perf_counter (monotone,
+#   haute résolution). Les durées d'une analyse sont conservées avec elle
+#   (colonne analyses.stage_timings) et exportées en histogrammes.
+# - /metrics expose aussi la latence par route, la profondeur de la file,
+#   les tokens consommés et les compteurs d'erreurs.
+# - Avec plusieurs processus (uvicorn --workers), définir PROMETHEUS_MULTIPROC_DIR
+#   pour agréger les métriques de tous les processus.
+# - Profilage ponctuel d'un job : PIPELINE_PROFILE=next (le prochain job de
+#   chaque processus) ou PIPELINE_PROFILE=<uuid de soumission>.
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "")
+PIPELINE_PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR", "/tmp/lancement-profiles")
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# --- A. MÉTRIQUES ---
+PIPELINE_STAGE_SECONDS = Histogram(
+    "lancement_pipeline_stage_seconds", "Durée de chaque étape du pipeline d'analyse", ["stage"],
+    buckets=STAGE_BUCKETS
+)
+ANALYSIS_JOBS = Counter("lancement_analysis_jobs_total", "Analyses traitées, par issue", ["outcome"])
+PIPELINE_ERRORS = Counter(
+    "lancement_pipeline_errors_total", "Erreurs du pipeline, par étape et type d'exception", ["stage", "error"]
+)
+LLM_TOKENS = Counter("lancement_llm_tokens_total", "Tokens consommés par les appels au modèle", ["kind"])
+LLM_REQUESTS = Counter("lancement_llm_requests_total", "Appels au modèle, par issue", ["outcome"])
+LLM_BACKEND_SECONDS = Histogram(
+    "lancement_llm_backend_seconds", "Durée des appels au modèle par backend (attente du limiteur comprise)",
+    ["backend", "outcome"], buckets=STAGE_BUCKETS
+)
+LLM_HEDGES = Counter(
+    "lancement_llm_hedges_total", "Requêtes de couverture : lancées, gagnées, bascules après échec", ["outcome"]
+)
+PRESCREEN_VERDICTS = Counter(
+    "lancement_prescreen_verdicts_total", "Verdicts du pré-filtrage local avant l'appel au modèle", ["verdict"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "lancement_http_request_duration_seconds", "Latence des requêtes HTTP par route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+QUEUE_DEPTH = Gauge(
+    "lancement_analysis_queue_depth", "Soumissions en attente ou en cours d'analyse", ["status"],
+    multiprocess_mode="liveall"
+)
+
+
+# --- B. CHRONOMÉTRAGE DES ÉTAPES ---
+class StageTimings:
+    """Durées (en secondes) des étapes d'une exécution du pipeline."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> Dict[str, float]:
+        return {stage: round(seconds, 4) for stage, seconds in self.stages.items()}
+
+
+# Les étapes profondes (extract_text_from_file, appels au modèle) retrouvent
+# le chronométrage du job en cours sans qu'on le passe en paramètre partout.
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar("current_timings", default=None)
+
+
+def start_timings() -> StageTimings:
+    timings = StageTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre une étape : histogramme + durées du job courant ; compte les erreurs."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        PIPELINE_ERRORS.labels(stage=name, error=type(e).__name__).inc()
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        PIPELINE_STAGE_SECONDS.labels(stage=name).observe(seconds)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(name, seconds)
+
+
+def record_llm_usage(usage):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(kind="prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(kind="completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+# --- C. EXPORT ---
+def render_metrics() -> bytes:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+# --- D. PROFILAGE PONCTUEL D'UN JOB ---
+_profile_pending = PIPELINE_PROFILE == "next"
+
+
+def _should_profile(submission_id: str) -> bool:
+    global _profile_pending
+    if PIPELINE_PROFILE == submission_id:
+        return True
+    if _profile_pending:
+        _profile_pending = False
+        return True
+    return False
+
+
+@contextmanager
+def maybe_profile(submission_id: str):
+    """
+    Profileur à échantillonnage (pyinstrument, compatible asyncio) sur un seul
+    job quand PIPELINE_PROFILE le demande ; cProfile si pyinstrument est absent.
+    """
+    if not _should_profile(submission_id):
+        yield
+        return
+
+    os.makedirs(PIPELINE_PROFILE_DIR, exist_ok=True)
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(PIPELINE_PROFILE_DIR, f"{submission_id}.html")
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+            print(f"--- INFO: Profil du job {submission_id} écrit dans {path} ---")
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(PIPELINE_PROFILE_DIR, f"{submission_id}.prof")
+            profiler.dump_stats(path)
+            print(f"--- INFO: Profil du job {submission_id} écrit dans {path} ---")
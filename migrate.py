@@ -0,0 +1,44 @@
+# ==========================================================
+# APPLICATION DES MIGRATIONS SQL
+# ==========================================================
+# Usage : python migrate.py
+# Applique dans l'ordre les fichiers migrations/*.sql pas encore appliqués.
+import os
+import sys
+from pathlib import Path
+
+import psycopg
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+
+def apply_migrations(database_url: str) -> int:
+    applied_count = 0
+    with psycopg.connect(database_url) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        conn.commit()
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations").fetchall()}
+
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            if path.stem in applied:
+                continue
+            print(f"--- INFO: Application de la migration {path.name} ---")
+            with conn.transaction():
+                conn.execute(path.read_text(encoding="utf-8"))
+                conn.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (path.stem,))
+            applied_count += 1
+    return applied_count
+
+
+if __name__ == "__main__":
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("--- ERREUR: DATABASE_URL n'est pas défini. ---")
+        sys.exit(1)
+    count = apply_migrations(database_url)
+    print(f"--- INFO: {count} migration(s) appliquée(s). ---")
@@ -0,0 +1,13 @@
+-- File d'attente des analyses portée par la table submissions.
+-- Les workers réservent les lignes 'pending' avec SELECT ... FOR UPDATE SKIP LOCKED.
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMPTZ;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS last_error TEXT;
+
+-- Index partiels : seules les lignes en attente / en cours sont parcourues par les workers
+CREATE INDEX IF NOT EXISTS idx_submissions_pending
+    ON submissions (submission_date)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_submissions_processing
+    ON submissions (processing_started_at)
+    WHERE status = 'processing';
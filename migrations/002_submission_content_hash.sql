@@ -0,0 +1,7 @@
+-- Empreinte SHA-256 du fichier déposé : clé du cache d'analyse et
+-- dédoublonnage des envois vers le stockage.
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_submissions_content_hash
+    ON submissions (content_hash)
+    WHERE content_hash IS NOT NULL;
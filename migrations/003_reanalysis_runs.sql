@@ -0,0 +1,18 @@
+-- Suivi des réanalyses en lot : la progression (dernière soumission traitée)
+-- permet de reprendre une exécution interrompue.
+CREATE TABLE IF NOT EXISTS reanalysis_runs (
+    id UUID PRIMARY KEY,
+    professor_id UUID,
+    filters JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'pending',
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    last_submission_id UUID,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Plusieurs analyses par soumission désormais : le rapport servi est le plus récent
+CREATE INDEX IF NOT EXISTS idx_analyses_submission_generated
+    ON analyses (submission_id, generated_at DESC);
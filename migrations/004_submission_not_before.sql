@@ -0,0 +1,2 @@
+-- Une soumission reportée (modèle indisponible) n'est pas réservée avant cette date
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS not_before TIMESTAMPTZ;
@@ -0,0 +1,51 @@
+-- Pagination par curseur du tableau de bord : (submission_date, id) par professeur
+CREATE INDEX IF NOT EXISTS idx_submissions_professor_date_id
+    ON submissions (professor_id, submission_date DESC, id DESC);
+
+-- Compteur de modifications par professeur : sert d'ETag au tableau de bord.
+-- Incrémenté une fois par professeur et par instruction (déclencheurs FOR EACH STATEMENT).
+CREATE TABLE IF NOT EXISTS professor_change_counters (
+    professor_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_professor_change_counters() RETURNS trigger AS $$
+BEGIN
+    -- Ordre fixe des verrous : pas d'interblocage entre deux instructions concurrentes
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_new WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        -- Soumission réattribuée : l'ancien professeur voit aussi son tableau changer
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT o.professor_id FROM changed_old o
+        WHERE o.professor_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM changed_new n WHERE n.professor_id = o.professor_id)
+        ORDER BY o.professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_old WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_submissions_counter_insert ON submissions;
+CREATE TRIGGER trg_submissions_counter_insert
+    AFTER INSERT ON submissions REFERENCING NEW TABLE AS changed_new
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_professor_change_counters();
+
+DROP TRIGGER IF EXISTS trg_submissions_counter_update ON submissions;
+CREATE TRIGGER trg_submissions_counter_update
+    AFTER UPDATE ON submissions REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_professor_change_counters();
+
+DROP TRIGGER IF EXISTS trg_submissions_counter_delete ON submissions;
+CREATE TRIGGER trg_submissions_counter_delete
+    AFTER DELETE ON submissions REFERENCING OLD TABLE AS changed_old
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_professor_change_counters();
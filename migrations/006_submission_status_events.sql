@@ -0,0 +1,27 @@
+-- Publie chaque changement de statut ou de score d'une soumission sur le canal
+-- `submission_events` (livré aux processus qui écoutent au moment du COMMIT).
+CREATE OR REPLACE FUNCTION notify_submission_event() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status
+                        AND OLD.score IS NOT DISTINCT FROM NEW.score THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('submission_events', json_build_object(
+        'submission_id', NEW.id,
+        'professor_id', NEW.professor_id,
+        'status', NEW.status,
+        'previous_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+        'score', NEW.score,
+        'student_name', NEW.student_name,
+        'student_email', NEW.student_email,
+        'project_title', NEW.project_title,
+        'submission_date', NEW.submission_date
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_submissions_notify ON submissions;
+CREATE TRIGGER trg_submissions_notify
+    AFTER INSERT OR UPDATE OF status, score ON submissions
+    FOR EACH ROW EXECUTE FUNCTION notify_submission_event();
@@ -0,0 +1,3 @@
+-- Durées par étape du pipeline (secondes) et durée totale en fractions de seconde
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+ALTER TABLE analyses ALTER COLUMN processing_time_seconds TYPE DOUBLE PRECISION;
@@ -0,0 +1,4 @@
+-- Analyse structurée conservée telle quelle : le rapport HTML est rendu à la lecture.
+-- report_content ne sert plus qu'aux analyses antérieures à cette migration.
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS analysis_json JSONB;
+ALTER TABLE analyses ALTER COLUMN report_content DROP NOT NULL;
@@ -0,0 +1,176 @@
+-- Statistiques de notes par professeur, tenues à jour de façon incrémentale.
+--
+-- submission_scores : notes courantes de chaque soumission (dernière analyse),
+--   alimentée par un déclencheur sur analyses (fin d'analyse ou réanalyse).
+-- professor_score_summary : par professeur et par critère, effectif, somme,
+--   somme des carrés et histogramme exact (une case par point, 0..100).
+--   Chaque changement de submission_scores retire l'ancienne contribution et
+--   ajoute la nouvelle : la lecture des statistiques ne dépend pas du nombre de soumissions.
+-- professor_status_counts : nombre de soumissions par statut, pour les totaux du tableau de bord.
+
+CREATE TABLE IF NOT EXISTS submission_scores (
+    submission_id UUID PRIMARY KEY REFERENCES submissions(id) ON DELETE CASCADE,
+    professor_id UUID NOT NULL,
+    score_global INTEGER,
+    viabilite_concept INTEGER,
+    etude_marche INTEGER,
+    modele_economique INTEGER,
+    strategie_marketing INTEGER,
+    projections_financieres INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_submission_scores_professor ON submission_scores (professor_id, score_global);
+
+CREATE TABLE IF NOT EXISTS professor_score_summary (
+    professor_id UUID NOT NULL,
+    criterion TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    total BIGINT NOT NULL DEFAULT 0,
+    total_sq BIGINT NOT NULL DEFAULT 0,
+    histogram INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[101]),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (professor_id, criterion)
+);
+
+CREATE TABLE IF NOT EXISTS professor_status_counts (
+    professor_id UUID NOT NULL,
+    status TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (professor_id, status)
+);
+
+-- --- Contribution d'une ligne de submission_scores au résumé (delta = +1 ou -1) ---
+CREATE OR REPLACE FUNCTION apply_score_contribution(row_data submission_scores, delta INTEGER) RETURNS void AS $$
+DECLARE
+    crit TEXT;
+    points INTEGER;
+BEGIN
+    FOREACH crit IN ARRAY ARRAY['score_global', 'viabilite_concept', 'etude_marche', 'modele_economique',
+                                'strategie_marketing', 'projections_financieres'] LOOP
+        points := (to_jsonb(row_data) ->> crit)::INTEGER;
+        CONTINUE WHEN points IS NULL;
+        points := least(greatest(points, 0), 100);
+        INSERT INTO professor_score_summary (professor_id, criterion) VALUES (row_data.professor_id, crit)
+        ON CONFLICT (professor_id, criterion) DO NOTHING;
+        UPDATE professor_score_summary s
+        SET n = s.n + delta,
+            total = s.total + delta * points,
+            total_sq = s.total_sq + delta * points * points,
+            histogram[points + 1] = s.histogram[points + 1] + delta,
+            updated_at = now()
+        WHERE s.professor_id = row_data.professor_id AND s.criterion = crit;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_professor_score_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_score_contribution(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_score_contribution(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_submission_scores_summary ON submission_scores;
+CREATE TRIGGER trg_submission_scores_summary
+    AFTER INSERT OR UPDATE OR DELETE ON submission_scores
+    FOR EACH ROW EXECUTE FUNCTION maintain_professor_score_summary();
+
+-- --- Une analyse terminée remplace les notes courantes de sa soumission ---
+CREATE OR REPLACE FUNCTION record_submission_scores() RETURNS trigger AS $$
+DECLARE
+    scores JSONB := COALESCE(NEW.analysis_json -> 'scores', '{}'::jsonb);
+BEGIN
+    -- Un document rejeté (0/100) n'entre pas dans les statistiques
+    IF NEW.analysis_json IS NOT NULL AND (NEW.analysis_json ->> 'document_valide') = 'false' THEN
+        DELETE FROM submission_scores WHERE submission_id = NEW.submission_id;
+        RETURN NULL;
+    END IF;
+    INSERT INTO submission_scores AS s (submission_id, professor_id, score_global, viabilite_concept, etude_marche,
+                                        modele_economique, strategie_marketing, projections_financieres)
+    SELECT NEW.submission_id, sub.professor_id, NEW.score_global,
+           (scores ->> 'viabilite_concept')::numeric::int, (scores ->> 'etude_marche')::numeric::int,
+           (scores ->> 'modele_economique')::numeric::int, (scores ->> 'strategie_marketing')::numeric::int,
+           (scores ->> 'projections_financieres')::numeric::int
+    FROM submissions sub WHERE sub.id = NEW.submission_id AND sub.professor_id IS NOT NULL
+    ON CONFLICT (submission_id) DO UPDATE SET
+        professor_id = EXCLUDED.professor_id, score_global = EXCLUDED.score_global,
+        viabilite_concept = EXCLUDED.viabilite_concept, etude_marche = EXCLUDED.etude_marche,
+        modele_economique = EXCLUDED.modele_economique, strategie_marketing = EXCLUDED.strategie_marketing,
+        projections_financieres = EXCLUDED.projections_financieres, updated_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_analyses_scores ON analyses;
+CREATE TRIGGER trg_analyses_scores
+    AFTER INSERT ON analyses
+    FOR EACH ROW EXECUTE FUNCTION record_submission_scores();
+
+-- --- Compteurs par statut : ajoutés au déclencheur par instruction de la migration 005 ---
+CREATE OR REPLACE FUNCTION bump_professor_change_counters() RETURNS trigger AS $$
+BEGIN
+    -- Ordre fixe des verrous : pas d'interblocage entre deux instructions concurrentes
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_new WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO professor_status_counts AS c (professor_id, status, n)
+        SELECT professor_id, status, count(*) FROM changed_new WHERE professor_id IS NOT NULL
+        GROUP BY professor_id, status ORDER BY professor_id, status
+        ON CONFLICT (professor_id, status) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Soumission réattribuée : l'ancien professeur voit aussi son tableau changer
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT o.professor_id FROM changed_old o
+        WHERE o.professor_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM changed_new n WHERE n.professor_id = o.professor_id)
+        ORDER BY o.professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+        INSERT INTO professor_status_counts AS c (professor_id, status, n)
+        SELECT professor_id, status, sum(delta) FROM (
+            SELECT professor_id, status, 1 AS delta FROM changed_new
+            UNION ALL
+            SELECT professor_id, status, -1 AS delta FROM changed_old
+        ) AS d
+        WHERE professor_id IS NOT NULL
+        GROUP BY professor_id, status HAVING sum(delta) <> 0 ORDER BY professor_id, status
+        ON CONFLICT (professor_id, status) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_old WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+        INSERT INTO professor_status_counts AS c (professor_id, status, n)
+        SELECT professor_id, status, -count(*) FROM changed_old WHERE professor_id IS NOT NULL
+        GROUP BY professor_id, status ORDER BY professor_id, status
+        ON CONFLICT (professor_id, status) DO UPDATE SET n = c.n + EXCLUDED.n;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- --- Reprise de l'existant ---
+INSERT INTO professor_status_counts (professor_id, status, n)
+SELECT professor_id, status, count(*) FROM submissions WHERE professor_id IS NOT NULL GROUP BY professor_id, status
+ON CONFLICT (professor_id, status) DO UPDATE SET n = EXCLUDED.n;
+
+INSERT INTO submission_scores (submission_id, professor_id, score_global, viabilite_concept, etude_marche,
+                               modele_economique, strategie_marketing, projections_financieres)
+SELECT DISTINCT ON (a.submission_id)
+       a.submission_id, s.professor_id, a.score_global,
+       (a.analysis_json -> 'scores' ->> 'viabilite_concept')::numeric::int,
+       (a.analysis_json -> 'scores' ->> 'etude_marche')::numeric::int,
+       (a.analysis_json -> 'scores' ->> 'modele_economique')::numeric::int,
+       (a.analysis_json -> 'scores' ->> 'strategie_marketing')::numeric::int,
+       (a.analysis_json -> 'scores' ->> 'projections_financieres')::numeric::int
+FROM analyses a JOIN submissions s ON s.id = a.submission_id
+WHERE s.professor_id IS NOT NULL AND s.status = 'completed'
+  AND COALESCE(a.analysis_json ->> 'document_valide', 'true') <> 'false'
+ORDER BY a.submission_id, a.generated_at DESC
+ON CONFLICT (submission_id) DO NOTHING;
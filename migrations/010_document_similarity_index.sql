@@ -0,0 +1,20 @@
+-- Index de quasi-doublons (MinHash + LSH, voir similarity.py).
+-- document_signatures : signature MinHash (128 valeurs) du texte extrait de chaque soumission.
+-- document_lsh_bands : une ligne par bande de la signature ; deux documents qui
+--   partagent une (band, bucket) sont candidats. La recherche passe par la clé
+--   primaire : son coût dépend du nombre de candidats, pas de la taille du corpus.
+-- Les soumissions antérieures sont indexées à leur prochaine analyse (une réanalyse en lot suffit).
+CREATE TABLE IF NOT EXISTS document_signatures (
+    submission_id UUID PRIMARY KEY REFERENCES submissions(id) ON DELETE CASCADE,
+    signature BIGINT[] NOT NULL,
+    shingle_count INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS document_lsh_bands (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    submission_id UUID NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, submission_id)
+);
+CREATE INDEX IF NOT EXISTS idx_document_lsh_bands_submission ON document_lsh_bands (submission_id);
@@ -0,0 +1,4 @@
+-- Analyse partielle d'une soumission en cours (réponse du modèle reçue en flux,
+-- ANALYSIS_STREAMING=true). Remise à NULL quand l'analyse se termine.
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS partial_analysis JSONB;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS partial_updated_at TIMESTAMPTZ;
@@ -0,0 +1,14 @@
+-- Signale toute modification de la table professors sur le canal `professor_directory` :
+-- les processus web vident alors leur copie en mémoire de la liste des professeurs (directory.py).
+-- Déclencheur par instruction : un import massif ne produit qu'une notification.
+CREATE OR REPLACE FUNCTION notify_professor_directory() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('professor_directory', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_professors_notify ON professors;
+CREATE TRIGGER trg_professors_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON professors
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_professor_directory();
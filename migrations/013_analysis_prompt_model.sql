@@ -0,0 +1,4 @@
+-- Version du prompt et backend:modèle qui ont produit chaque analyse
+-- ("prescreen" pour un rejet du pré-filtrage local). NULL pour les analyses antérieures.
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS prompt_version TEXT;
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS model TEXT;
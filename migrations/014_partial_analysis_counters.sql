@@ -0,0 +1,32 @@
+-- Une analyse partielle (réponse en flux) met à jour la soumission à chaque champ
+-- reçu : ces écritures ne doivent pas invalider l'ETag du tableau de bord.
+-- Une colonne ne peut pas filtrer un déclencheur à tables de transition : seules
+-- les lignes dont une autre colonne que partial_analysis/partial_updated_at a
+-- changé incrémentent le compteur de leur professeur.
+CREATE OR REPLACE FUNCTION bump_professor_change_counters() RETURNS trigger AS $$
+BEGIN
+    -- Ordre fixe des verrous : pas d'interblocage entre deux instructions concurrentes
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_new WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Ancien et nouveau professeur : une soumission réattribuée change les deux tableaux
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT p.professor_id
+        FROM changed_new n
+        JOIN changed_old o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (n.professor_id), (o.professor_id)) AS p(professor_id)
+        WHERE p.professor_id IS NOT NULL
+          AND (to_jsonb(n) - 'partial_analysis' - 'partial_updated_at')
+              IS DISTINCT FROM (to_jsonb(o) - 'partial_analysis' - 'partial_updated_at')
+        ORDER BY p.professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO professor_change_counters AS c (professor_id)
+        SELECT DISTINCT professor_id FROM changed_old WHERE professor_id IS NOT NULL ORDER BY professor_id
+        ON CONFLICT (professor_id) DO UPDATE SET version = c.version + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
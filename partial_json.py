@@ -0,0 +1,101 @@
+# ==========================================================
+# ANALYSE INCRÉMENTALE D'UN OBJET JSON REÇU EN FLUX
+# ==========================================================
+# Le modèle renvoie l'analyse morceau par morceau. Ce lecteur suit la
+# structure du texte déjà reçu (chaînes, objets, tableaux) et signale chaque
+# membre d'objet dès qu'il est complet : "resume_executif" dès la fin de sa
+# chaîne, chaque note de "scores" dès sa virgule, "points_forts" à la fin du
+# tableau. Chaque caractère n'est examiné qu'une fois.
+import json
+from typing import Any, Dict, List, Tuple
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "key", "key_start", "value_start", "expect_key", "index")
+
+    def __init__(self, kind: str, path: Tuple):
+        self.kind = kind          # "{" ou "["
+        self.path = path
+        self.key = None
+        self.key_start = -1
+        self.value_start = -1
+        self.expect_key = kind == "{"
+        self.index = 0            # position courante dans un tableau
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self.partial: Dict[str, Any] = {}
+
+    def feed(self, text: str) -> List[Tuple[Tuple, Any]]:
+        """Ajoute du texte ; retourne les membres complétés [(chemin, valeur), ...] dans l'ordre."""
+        self.buffer += text
+        completed: List[Tuple[Tuple, Any]] = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+            frame = self._stack[-1] if self._stack else None
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if frame is not None and frame.kind == "{" and frame.expect_key and frame.key_start >= 0:
+                        frame.key = json.loads(buffer[frame.key_start:i + 1])
+                        frame.key_start = -1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if frame is not None and frame.kind == "{" and frame.expect_key:
+                    frame.key_start = i
+            elif c in "{[":
+                if frame is not None and frame.kind == "{":
+                    path = frame.path + (frame.key,)
+                elif frame is not None:
+                    path = frame.path + (frame.index,)
+                else:
+                    path = ()
+                self._stack.append(_Frame(c, path))
+            elif c == ":" and frame is not None and frame.kind == "{":
+                frame.expect_key = False
+                frame.value_start = i + 1
+            elif c == "," and frame is not None:
+                if frame.kind == "{":
+                    self._complete_member(frame, i, completed)
+                    frame.expect_key = True
+                else:
+                    frame.index += 1
+            elif c in "}]" and frame is not None:
+                if frame.kind == "{":
+                    self._complete_member(frame, i, completed)
+                self._stack.pop()
+        self._pos = len(buffer)
+        return completed
+
+    def _complete_member(self, frame: _Frame, end: int, completed: List[Tuple[Tuple, Any]]):
+        key, start = frame.key, frame.value_start
+        frame.key, frame.value_start = None, -1
+        if key is None or start < 0:
+            return
+        # Les membres d'objets contenus dans des tableaux arrivent avec leur tableau
+        path = frame.path + (key,)
+        if any(isinstance(part, int) for part in path):
+            return
+        try:
+            value = json.loads(self.buffer[start:end])
+        except ValueError:
+            return
+        target = self.partial
+        for part in path[:-1]:
+            target = target.setdefault(part, {})
+        target[path[-1]] = value
+        completed.append((path, value))
@@ -0,0 +1,219 @@
+# ==========================================================
+# PIPELINE D'ANALYSE D'UNE SOUMISSION
+# ==========================================================
+# Téléchargement -> extraction du texte -> pré-filtrage -> analyse IA -> écriture en base (le rapport est rendu à la lecture).
+# Appelé par les workers de la file d'attente (job_queue.py), que ce soit
+# dans le processus web ou dans le processus `worker` séparé.
+import asyncio
+import copy
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from database import connection as db_connection
+from ai_analyzer import (
+    extract_text_from_file, analyze_business_plan, rejected_analysis, model_signature, PROMPT_VERSION
+)
+from analysis_cache import text_cache, analysis_cache, analysis_cache_key, sha256_hex
+from uploads import find_spooled_file, discard_spooled_file
+from llm_limiter import llm_limiter, LLMUnavailableError
+from metrics import start_timings, stage, maybe_profile, ANALYSIS_JOBS, PRESCREEN_VERDICTS
+from prescreen import prescreen_document, PRESCREEN_MODE
+from similarity import document_signature, find_similar, store_signature, SIMILARITY_ENABLED
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+INSERT_ANALYSIS_QUERY = """
+    INSERT INTO analyses (id, submission_id, analysis_json, score_global, generated_at, processing_time_seconds,
+                          stage_timings, prompt_version, model)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+# Analyse partielle publiée pendant la réponse en flux : colonne lue par le rapport,
+# notification `partial` relayée aux flux SSE des professeurs (events.py)
+PUBLISH_PARTIAL_QUERY = """
+    WITH updated AS (
+        UPDATE submissions SET partial_analysis = %s, partial_updated_at = now()
+        WHERE id = %s AND status = 'processing'
+        RETURNING id, professor_id
+    )
+    SELECT pg_notify('submission_events', json_build_object(
+        'type', 'partial', 'submission_id', id, 'professor_id', professor_id, 'fields', %s::json
+    )::text)
+    FROM updated
+"""
+
+
+async def publish_partial_analysis(submission_id: str, partial: Dict[str, Any]):
+    # Simple aperçu : un échec d'écriture n'interrompt pas l'analyse
+    try:
+        async with db_connection() as conn:
+            await conn.execute(
+                PUBLISH_PARTIAL_QUERY,
+                (json.dumps(partial, ensure_ascii=False), submission_id, json.dumps(sorted(partial)))
+            )
+            await conn.commit()
+    except Exception as e:
+        print(f"--- ATTENTION: Analyse partielle de {submission_id} non publiée: {e} ---")
+
+
+async def run_analysis_pipeline(
+    submission_id: str, file_url: str, student_name: str, project_title: str, content_hash: Optional[str],
+    on_partial=None
+) -> Dict[str, Any]:
+    """
+    Exécute extraction + analyse pour une soumission, sans rien écrire
+    en base. Partagé par la file d'attente et par la réanalyse en lot.
+    `on_partial` reçoit l'analyse partielle quand la réponse arrive en flux.
+    """
+    timings = start_timings()
+
+    # Niveau 1 du cache : le texte extrait d'un fichier identique
+    text = text_cache.get(content_hash) if content_hash else None
+    if text is None:
+        # Le fichier local du dépôt est lu directement quand il est encore disponible
+        # (étapes "download" et "extraction" chronométrées dans extract_text_from_file)
+        text = await extract_text_from_file(file_url, local_path=find_spooled_file(submission_id))
+        if content_hash:
+            text_cache.put(content_hash, text)
+
+    # Pré-filtrage local : un document manifestement hors sujet n'atteint pas le modèle
+    # (en mode "shadow", le verdict est seulement journalisé et compté)
+    rejected = False
+    if PRESCREEN_MODE != "off":
+        with stage("prescreen"):
+            screening = prescreen_document(text)
+        PRESCREEN_VERDICTS.labels(verdict=screening.verdict).inc()
+        if screening.verdict == "reject":
+            print(f"--- INFO: Pré-filtrage de {submission_id} : rejet (p={screening.probability:.2f}, "
+                  f"mode {PRESCREEN_MODE}). ---")
+            rejected = PRESCREEN_MODE == "on"
+
+    # Quasi-doublons : signature MinHash du texte, comparée aux soumissions déjà indexées
+    signature, similar = None, []
+    if SIMILARITY_ENABLED and not rejected:
+        with stage("similarity"):
+            signature = await asyncio.to_thread(document_signature, text)
+            if signature is not None:
+                async with db_connection() as conn:
+                    similar = await find_similar(conn, signature["signature"], submission_id)
+
+    # Niveau 2 du cache : l'analyse d'un texte identique avec le même prompt et les mêmes backends.
+    # Une entrée est le couple (analyse, backend:modèle qui l'a produite).
+    cache_key = analysis_cache_key(sha256_hex(text), PROMPT_VERSION, model_signature())
+    cached = None if rejected else analysis_cache.get(cache_key)
+    if rejected:
+        analysis_results = rejected_analysis(screening.reason)
+        analysis_results["rejet_automatique"] = True
+        model = "prescreen"
+    elif cached is not None:
+        analysis_results, model = copy.deepcopy(cached)
+        print(f"--- INFO: Analyse réutilisée depuis le cache pour {submission_id}. ---")
+    else:
+        # Les soumissions concurrentes d'un même texte partagent un seul appel au modèle
+        with stage("analysis"):
+            analysis_results, model = copy.deepcopy(await llm_limiter.coalesce(
+                cache_key, lambda: analyze_business_plan(text, student_name, project_title, on_partial)
+            ))
+        analysis_cache.put(cache_key, copy.deepcopy((analysis_results, model)))
+
+    # Ajouté après la mise en cache : les correspondances propres à cette soumission n'y entrent pas
+    if similar:
+        analysis_results["similarites"] = similar
+        print(f"--- ATTENTION: {len(similar)} soumission(s) similaire(s) à {submission_id} "
+              f"(max {similar[0]['similarity']:.0%}). ---")
+
+    # Le rapport HTML n'est plus produit ici : il est rendu à la lecture (report.py)
+    processing_time = timings.elapsed()
+
+    return {
+        "analysis_id": str(uuid.uuid4()),
+        "submission_id": submission_id,
+        "analysis": analysis_results,
+        "score": analysis_results.get('score_global', 0),
+        "processing_time": round(processing_time, 3),
+        "stage_timings": timings.as_dict(),
+        "generated_at": datetime.now(),
+        "signature": signature,
+        "prompt_version": PROMPT_VERSION,
+        "model": model,
+    }
+
+
+def analysis_row(result: Dict[str, Any]) -> tuple:
+    """Paramètres de INSERT_ANALYSIS_QUERY pour un résultat de run_analysis_pipeline."""
+    return (
+        result["analysis_id"], result["submission_id"], json.dumps(result["analysis"], ensure_ascii=False),
+        result["score"], result["generated_at"], result["processing_time"], json.dumps(result["stage_timings"]),
+        result["prompt_version"], result["model"]
+    )
+
+
+async def process_submission_with_ai(submission_id: str):
+    try:
+        # La connexion n'est empruntée au pool que le temps des requêtes SQL,
+        # pas pendant le téléchargement et l'appel à l'IA.
+        async with db_connection() as conn:
+            query = "SELECT file_url, student_name, project_title, content_hash FROM submissions WHERE id = %s"
+            cursor = await conn.execute(query, (submission_id,))
+            submission = await cursor.fetchone()
+        if not submission: return
+
+        file_url, student_name, project_title, content_hash = submission
+        with maybe_profile(submission_id):
+            result = await run_analysis_pipeline(
+                submission_id, file_url, student_name, project_title, content_hash,
+                on_partial=lambda partial: publish_partial_analysis(submission_id, partial)
+            )
+
+            with stage("db_write"):
+                async with db_connection() as conn:
+                    await conn.execute(INSERT_ANALYSIS_QUERY, analysis_row(result))
+                    if result["signature"] is not None:
+                        await store_signature(conn, submission_id, result["signature"])
+
+                    update_query = """
+                        UPDATE submissions SET status = 'completed', score = %s, last_error = NULL, partial_analysis = NULL
+                        WHERE id = %s
+                    """
+                    await conn.execute(update_query, (result["score"], submission_id))
+                    await conn.commit()
+        discard_spooled_file(submission_id)
+        ANALYSIS_JOBS.labels(outcome="completed").inc()
+        print(f"--- INFO: Analyse pour {submission_id} terminée avec succès ({result['stage_timings']}). ---")
+
+    except LLMUnavailableError as e:
+        # Modèle indisponible : la soumission retourne dans la file et sera rejouée plus tard
+        ANALYSIS_JOBS.labels(outcome="deferred").inc()
+        print(f"--- ATTENTION: Analyse de {submission_id} reportée de {e.retry_after:.0f} s: {e} ---")
+        # Refus du disjoncteur (aucun appel tenté) : la tentative est rendue, une panne
+        # passagère du fournisseur ne doit pas épuiser les essais de la soumission
+        refund = 1 if e.breaker else 0
+        async with db_connection() as conn:
+            cursor = await conn.execute(
+                """
+                UPDATE submissions
+                SET status = CASE WHEN attempts - %s >= %s THEN 'error' ELSE 'pending' END,
+                    attempts = attempts - %s,
+                    not_before = now() + make_interval(secs => %s), last_error = %s, partial_analysis = NULL
+                WHERE id = %s
+                RETURNING status
+                """,
+                (refund, JOB_MAX_ATTEMPTS, refund, e.retry_after, str(e)[:1000], submission_id)
+            )
+            row = await cursor.fetchone()
+            await conn.commit()
+        if row and row[0] == 'error':
+            discard_spooled_file(submission_id)
+
+    except Exception as e:
+        ANALYSIS_JOBS.labels(outcome="error").inc()
+        print(f"--- ERREUR CRITIQUE dans la tâche de fond pour {submission_id}: {e} ---")
+        async with db_connection() as conn:
+            update_query = "UPDATE submissions SET status = 'error', last_error = %s, partial_analysis = NULL WHERE id = %s"
+            await conn.execute(update_query, (str(e)[:1000], submission_id))
+            await conn.commit()
+        discard_spooled_file(submission_id)
@@ -0,0 +1,159 @@
+# ==========================================================
+# PRÉ-FILTRAGE LOCAL AVANT L'APPEL AU MODÈLE
+# ==========================================================
+# Les documents manifestement hors sujet (fichier vide, PDF numérisé sans
+# texte, recette, récit...) sont rejetés ici, sans appel payant au modèle.
+# Le filtre ne fait que rejeter : tout document plausible, ou douteux, part
+# vers le modèle comme avant. Il combine des règles strictes (texte absent
+# ou trop court) et un petit classifieur logistique hors ligne sur des
+# caractéristiques du texte : longueur, langue, sections d'un plan d'affaires
+# (produit, marché, modèle de revenus...) et vocabulaire hors sujet.
+#
+# PRESCREEN_MODE : "on" (défaut), "shadow" (verdict journalisé seulement) ou "off".
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List
+
+PRESCREEN_MODE = os.getenv("PRESCREEN_MODE", "on").lower()
+PRESCREEN_MIN_WORDS = int(os.getenv("PRESCREEN_MIN_WORDS", "120"))
+# Probabilité « plan d'affaires » sous laquelle le document est rejeté sans appel au modèle
+PRESCREEN_REJECT_BELOW = float(os.getenv("PRESCREEN_REJECT_BELOW", "0.15"))
+# Au-delà, seul le début du document est examiné : les indices apparaissent tôt
+PRESCREEN_MAX_WORDS = 20000
+
+# Radicaux (minuscules, sans accents) : un mot compte s'il commence par l'un d'eux
+SECTION_STEMS: Dict[str, tuple] = {
+    "produit": ("produit", "service", "offre", "solution", "concept", "proposition", "innovation",
+                "product", "offering"),
+    "marche": ("marche", "clientele", "client", "concurren", "segment", "cible", "consommat",
+               "market", "customer", "competit"),
+    "revenus": ("revenu", "chiffre", "prix", "tarif", "marge", "rentab", "vente", "abonnement",
+                "revenue", "pricing", "sales", "profit"),
+    "finances": ("financ", "budget", "investiss", "tresorerie", "cout", "prevision", "bilan", "seuil",
+                 "capital", "cash", "cost", "forecast"),
+    "marketing": ("marketing", "promotion", "publicit", "communication", "distribution", "canal",
+                  "strateg", "advertis"),
+}
+# Sections exigées par le prompt du modèle (voir SYSTEM_PROMPT dans ai_analyzer.py)
+REQUIRED_SECTIONS = ("produit", "marche", "revenus")
+SECTION_NAMES = {
+    "produit": "description du produit ou service",
+    "marche": "analyse de marché ou de clientèle",
+    "revenus": "modèle de revenus",
+    "finances": "volet financier",
+    "marketing": "stratégie marketing",
+}
+OFF_TOPIC_STEMS = (
+    "recette", "ingredient", "cuillere", "farine", "prechauff", "cuisson", "gramme", "poeme", "strophe",
+    "chapitre", "personnage", "heroine", "dissertation", "recipe", "tablespoon", "chapter",
+)
+STOPWORDS = frozenset(
+    "le la les de des du un une et en est que qui dans pour par sur au aux avec ce cette nous vous "
+    "il elle ils sont pas plus ou the of and to in is for on that with are this be by as".split()
+)
+
+# Coefficients du classifieur (régression logistique fixée à la main, volontairement
+# prudente : un vrai plan d'affaires même faible doit rester au-dessus du seuil)
+WEIGHTS = {
+    "bias": -4.0,
+    "section": 1.3,          # par section détectée (5 au maximum)
+    "business_density": 0.5,  # mots d'affaires pour 100 mots, plafonné à 6
+    "length": 1.0,           # log10(mots) - 2, plafonné à 2
+    "digits": 0.8,           # présence de chiffres (prix, volumes, projections)
+    "off_topic_density": -1.2,  # mots hors sujet pour 100 mots
+    "foreign": -1.5,         # ni français ni anglais
+}
+
+_WORD_RE = re.compile(r"[a-z]+|\d+")
+
+
+@dataclass
+class PrescreenResult:
+    verdict: str  # "reject" ou "pass"
+    probability: float
+    reason: Optional[str] = None
+    features: Dict[str, float] = field(default_factory=dict)
+    sections: List[str] = field(default_factory=list)
+
+
+def normalize_text(text: str) -> str:
+    stripped = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in stripped if not unicodedata.combining(c))
+
+
+def extract_features(text: str) -> Dict[str, float]:
+    tokens = _WORD_RE.findall(normalize_text(text))
+    words = [t for t in tokens if not t.isdigit()][:PRESCREEN_MAX_WORDS]
+    word_count = len(words)
+    features: Dict[str, float] = {"words": word_count, "digits": float(len(tokens) > word_count)}
+
+    section_hits = {name: 0 for name in SECTION_STEMS}
+    off_topic = stopwords = 0
+    for word in words:
+        if word in STOPWORDS:
+            stopwords += 1
+            continue
+        if len(word) < 3:
+            continue
+        for name, stems in SECTION_STEMS.items():
+            if word.startswith(stems):
+                section_hits[name] += 1
+        if word.startswith(OFF_TOPIC_STEMS):
+            off_topic += 1
+
+    per_hundred = 100 / word_count if word_count else 0.0
+    for name, hits in section_hits.items():
+        features[f"section_{name}"] = float(hits)
+    features["business_density"] = sum(section_hits.values()) * per_hundred
+    features["off_topic_density"] = off_topic * per_hundred
+    features["stopword_ratio"] = stopwords / word_count if word_count else 0.0
+    return features
+
+
+def _detected_sections(features: Dict[str, float]) -> List[str]:
+    # Deux occurrences au moins : un mot isolé ne fait pas une section
+    return [name for name in SECTION_STEMS if features[f"section_{name}"] >= 2]
+
+
+def plan_probability(features: Dict[str, float]) -> float:
+    """Probabilité que le texte soit un plan d'affaires (texte non vide)."""
+    z = WEIGHTS["bias"]
+    z += WEIGHTS["section"] * len(_detected_sections(features))
+    z += WEIGHTS["business_density"] * min(features["business_density"], 6.0)
+    z += WEIGHTS["length"] * min(max(math.log10(max(features["words"], 1)) - 2, 0.0), 2.0)
+    z += WEIGHTS["digits"] * features["digits"]
+    z += WEIGHTS["off_topic_density"] * features["off_topic_density"]
+    if features["stopword_ratio"] < 0.08:
+        z += WEIGHTS["foreign"]
+    return 1 / (1 + math.exp(-z))
+
+
+def prescreen_document(text: str) -> PrescreenResult:
+    features = extract_features(text or "")
+    words = int(features["words"])
+
+    # Règles strictes : rien à évaluer
+    if words == 0:
+        return PrescreenResult(
+            "reject", 0.0, features=features,
+            reason="Aucun texte lisible n'a pu être extrait du document (fichier vide ou PDF numérisé sans texte)."
+        )
+    if words < PRESCREEN_MIN_WORDS:
+        return PrescreenResult(
+            "reject", 0.0, features=features,
+            reason=f"Le document ne contient que {words} mots : trop court pour constituer un plan d'affaires."
+        )
+
+    probability = plan_probability(features)
+    sections = _detected_sections(features)
+    missing = [SECTION_NAMES[name] for name in REQUIRED_SECTIONS if name not in sections]
+    if probability < PRESCREEN_REJECT_BELOW and missing:
+        return PrescreenResult(
+            "reject", probability, features=features, sections=sections,
+            reason="Ce document ne semble pas être un plan d'affaires : aucune trace de "
+                   + ", ".join(missing) + "."
+        )
+    return PrescreenResult("pass", probability, features=features, sections=sections)
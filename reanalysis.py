@@ -0,0 +1,256 @@
+# ==========================================================
+# RÉANALYSE EN LOT DES SOUMISSIONS
+# ==========================================================
+# Après un changement de prompt ou de modèle, relance le pipeline sur une
+# sélection de soumissions (professeur / statut / période).
+#   - concurrence bornée et cadence limitée vers l'API du modèle ;
+#   - progression enregistrée dans `reanalysis_runs` : une exécution
+#     interrompue reprend après la dernière soumission traitée ;
+#   - écritures groupées par lot (executemany + UPDATE ... FROM unnest).
+#
+# Ligne de commande :
+#   python reanalysis.py --professor <uuid> [--status completed] [--since 2024-01-01] [--until 2024-06-30]
+#   python reanalysis.py --resume <run_id>
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import date
+from typing import Optional, Dict, Any, List
+
+from database import connection as db_connection
+from pipeline import run_analysis_pipeline, analysis_row, INSERT_ANALYSIS_QUERY
+from similarity import store_signature
+from metrics import stage
+
+REANALYSIS_CONCURRENCY = int(os.getenv("REANALYSIS_CONCURRENCY", "4"))
+REANALYSIS_RATE_PER_MINUTE = float(os.getenv("REANALYSIS_RATE_PER_MINUTE", "60"))
+REANALYSIS_BATCH_SIZE = int(os.getenv("REANALYSIS_BATCH_SIZE", "25"))
+
+
+class RatePacer:
+    """Espace les démarrages d'appels pour ne pas dépasser `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _parse_date(value: Optional[Any]) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+async def create_run(filters: Dict[str, Any]) -> str:
+    """Enregistre une nouvelle exécution et compte les soumissions sélectionnées."""
+    where, params = _selection_clause(filters)
+    run_id = str(uuid.uuid4())
+    async with db_connection() as conn:
+        cursor = await conn.execute(f"SELECT count(*) FROM submissions WHERE {where}", params)
+        total = (await cursor.fetchone())[0]
+        await conn.execute(
+            "INSERT INTO reanalysis_runs (id, professor_id, filters, status, total) VALUES (%s, %s, %s, 'pending', %s)",
+            (run_id, filters.get("professor_id"), json.dumps(filters, default=str), total)
+        )
+        await conn.commit()
+    return run_id
+
+
+def _selection_clause(filters: Dict[str, Any]):
+    # Une soumission encore dans la file appartient aux workers d'analyse, quel que soit le filtre
+    clauses, params = ["file_url <> ''", "status NOT IN ('pending', 'processing')"], []
+    if filters.get("professor_id"):
+        clauses.append("professor_id = %s")
+        params.append(filters["professor_id"])
+    if filters.get("status"):
+        clauses.append("status = %s")
+        params.append(filters["status"])
+    if filters.get("date_from"):
+        clauses.append("submission_date >= %s")
+        params.append(_parse_date(filters["date_from"]))
+    if filters.get("date_to"):
+        # Borne incluse : toute la journée de date_to
+        clauses.append("submission_date < %s::date + 1")
+        params.append(_parse_date(filters["date_to"]))
+    return " AND ".join(clauses), params
+
+
+async def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    # Identifiant venu de l'URL ou de la ligne de commande : sinon erreur SQL sur la colonne UUID
+    try:
+        uuid.UUID(str(run_id))
+    except ValueError:
+        return None
+    async with db_connection() as conn:
+        cursor = await conn.execute(
+            "SELECT id, professor_id, filters, status, total, processed, failed, last_submission_id, created_at, updated_at "
+            "FROM reanalysis_runs WHERE id = %s", (run_id,)
+        )
+        row = await cursor.fetchone()
+    if not row:
+        return None
+    return {
+        "id": str(row[0]), "professor_id": str(row[1]) if row[1] else None, "filters": row[2],
+        "status": row[3], "total": row[4], "processed": row[5], "failed": row[6],
+        "last_submission_id": str(row[7]) if row[7] else None, "created_at": row[8], "updated_at": row[9],
+    }
+
+
+async def _fetch_batch(filters: Dict[str, Any], after_id: Optional[str]) -> List[tuple]:
+    where, params = _selection_clause(filters)
+    if after_id:
+        where += " AND id > %s"
+        params.append(after_id)
+    query = f"""
+        SELECT id, file_url, student_name, project_title, content_hash
+        FROM submissions WHERE {where}
+        ORDER BY id LIMIT %s
+    """
+    async with db_connection() as conn:
+        cursor = await conn.execute(query, params + [REANALYSIS_BATCH_SIZE])
+        return await cursor.fetchall()
+
+
+async def _analyze_one(row: tuple, semaphore: asyncio.Semaphore, pacer: RatePacer) -> Optional[Dict[str, Any]]:
+    submission_id, file_url, student_name, project_title, content_hash = row
+    async with semaphore:
+        await pacer.wait()
+        try:
+            result = await run_analysis_pipeline(str(submission_id), file_url, student_name, project_title, content_hash)
+        except Exception as e:
+            # La note existante est conservée : la soumission est comptée en échec
+            print(f"--- ERREUR: Réanalyse de {submission_id} impossible: {e} ---")
+            return None
+    return result
+
+
+async def _write_batch(conn, run_id: str, results: List[Dict[str, Any]], failed: int, last_id: str):
+    """Écrit un lot entier et la progression de l'exécution dans une même transaction."""
+    if results:
+        async with conn.cursor() as cursor:
+            await cursor.executemany(INSERT_ANALYSIS_QUERY, [analysis_row(r) for r in results])
+        for r in results:
+            if r["signature"] is not None:
+                await store_signature(conn, r["submission_id"], r["signature"])
+        await conn.execute(
+            """
+            UPDATE submissions AS s SET score = v.score, status = 'completed', last_error = NULL
+            FROM (SELECT unnest(%s::uuid[]) AS id, unnest(%s::int[]) AS score) AS v
+            WHERE s.id = v.id AND s.status NOT IN ('pending', 'processing')
+            """,
+            ([r["submission_id"] for r in results], [r["score"] for r in results])
+        )
+    await conn.execute(
+        """
+        UPDATE reanalysis_runs
+        SET processed = processed + %s, failed = failed + %s, last_submission_id = %s, updated_at = now()
+        WHERE id = %s
+        """,
+        (len(results) + failed, failed, last_id, run_id)
+    )
+
+
+async def execute_run(run_id: str, concurrency: int = REANALYSIS_CONCURRENCY,
+                      rate_per_minute: float = REANALYSIS_RATE_PER_MINUTE) -> Dict[str, Any]:
+    """Traite (ou reprend) une exécution jusqu'à épuisement de la sélection."""
+    run = await get_run(run_id)
+    if run is None:
+        raise ValueError(f"Exécution de réanalyse inconnue: {run_id}")
+
+    filters = run["filters"]
+    after_id = run["last_submission_id"]
+    semaphore = asyncio.Semaphore(concurrency)
+    pacer = RatePacer(rate_per_minute)
+
+    async with db_connection() as conn:
+        await conn.execute("UPDATE reanalysis_runs SET status = 'running', updated_at = now() WHERE id = %s", (run_id,))
+        await conn.commit()
+
+    try:
+        while True:
+            batch = await _fetch_batch(filters, after_id)
+            if not batch:
+                break
+            outcomes = await asyncio.gather(*[_analyze_one(row, semaphore, pacer) for row in batch])
+            results = [r for r in outcomes if r is not None]
+            after_id = str(batch[-1][0])
+
+            with stage("db_write_batch"):
+                async with db_connection() as conn:
+                    await _write_batch(conn, run_id, results, len(batch) - len(results), after_id)
+                    await conn.commit()
+            print(f"--- INFO: Réanalyse {run_id} : lot de {len(batch)} traité ({len(results)} réussies). ---")
+
+        final_status = "completed"
+    except asyncio.CancelledError:
+        final_status = "interrupted"
+        raise
+    except Exception as e:
+        final_status = "interrupted"
+        print(f"--- ERREUR: Réanalyse {run_id} interrompue: {e} ---")
+    finally:
+        async with db_connection() as conn:
+            await conn.execute(
+                "UPDATE reanalysis_runs SET status = %s, updated_at = now() WHERE id = %s", (final_status, run_id)
+            )
+            await conn.commit()
+
+    return await get_run(run_id)
+
+
+# ==========================================================
+# POINT D'ENTRÉE EN LIGNE DE COMMANDE
+# ==========================================================
+async def _cli(args):
+    from database import open_pool, close_pool
+    from http_client import open_http_client, close_http_client
+    from extraction import shutdown_executor
+
+    await open_pool()
+    await open_http_client()
+    try:
+        if args.resume:
+            run_id = args.resume
+        else:
+            filters = {
+                "professor_id": args.professor, "status": args.status,
+                "date_from": args.since, "date_to": args.until,
+            }
+            run_id = await create_run(filters)
+        print(f"--- INFO: Réanalyse {run_id} (reprendre avec --resume {run_id}) ---")
+        run = await execute_run(run_id, args.concurrency, args.rate)
+        print(json.dumps(run, default=str, indent=2, ensure_ascii=False))
+    finally:
+        shutdown_executor()
+        await close_http_client()
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réanalyse en lot des soumissions")
+    parser.add_argument("--professor", help="UUID du professeur")
+    parser.add_argument("--status", help="Statut des soumissions (ex: completed, error)")
+    parser.add_argument("--since", help="Date de soumission minimale (AAAA-MM-JJ)")
+    parser.add_argument("--until", help="Date de soumission maximale incluse (AAAA-MM-JJ)")
+    parser.add_argument("--resume", help="Reprendre une exécution interrompue")
+    parser.add_argument("--concurrency", type=int, default=REANALYSIS_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=REANALYSIS_RATE_PER_MINUTE, help="Appels max par minute")
+    asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# ==========================================================
+# RAPPORTS D'ANALYSE RENDUS À LA DEMANDE
+# ==========================================================
+# La base ne conserve que l'analyse structurée (analyses.analysis_json) ; le
+# HTML est produit à la lecture par un gabarit Jinja compilé une seule fois,
+# avec une feuille de style partagée (templates/report/report.css) au lieu de
+# styles en ligne. La version du gabarit est l'empreinte de ses sources :
+# modifier le gabarit change la version, donc les ETag et les entrées du
+# cache, sans régénérer aucune ligne.
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import escape
+
+from analysis_cache import ByteLRUCache
+from compression import compress
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+REPORT_TEMPLATE = "report/analysis_report.html"
+REPORT_STYLESHEET = "report/report.css"
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+SCORE_LABELS = [
+    ("viabilite_concept", "Viabilité du Concept"),
+    ("etude_marche", "Étude de Marché"),
+    ("modele_economique", "Modèle Économique"),
+    ("strategie_marketing", "Stratégie Marketing"),
+    ("projections_financieres", "Projections Financières"),
+]
+
+# auto_reload=False : le gabarit est compilé au premier chargement puis réutilisé tel quel
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+_template = _environment.get_template(REPORT_TEMPLATE)
+
+
+def _template_version() -> str:
+    digest = hashlib.sha256()
+    for name in (REPORT_TEMPLATE, REPORT_STYLESHEET):
+        with open(os.path.join(TEMPLATES_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATE_VERSION = _template_version()
+
+with open(os.path.join(TEMPLATES_DIR, REPORT_STYLESHEET), encoding="utf-8") as f:
+    _stylesheet = f.read()
+
+# HTML rendu par (analysis_id, TEMPLATE_VERSION), et les corps de réponse compressés
+report_cache = ByteLRUCache("report", REPORT_CACHE_MAX_BYTES)
+
+
+def render_report(analysis: Dict[str, Any], student_name: str, project_title: str,
+                  generated_at: Optional[datetime], processing_time: Optional[float], partial: bool = False,
+                  model: Optional[str] = None) -> str:
+    """
+    `partial` : analyse encore en cours, seuls les champs déjà reçus sont affichés.
+    `model` : "backend:modèle" enregistré avec l'analyse (NULL avant la migration 013).
+    """
+    return _template.render(
+        model=model.split(":", 1)[-1] if model else None,
+        analysis=analysis,
+        partial=partial,
+        student_name=student_name,
+        project_title=project_title,
+        generated_at=(generated_at or datetime.now()).strftime('%d/%m/%Y à %H:%M'),
+        processing_time=processing_time or 0.0,
+        score_labels=SCORE_LABELS,
+    )
+
+
+def report_document(html: str, title: str) -> str:
+    """Page HTML autonome (feuille de style incluse) pour un rapport hors de l'application, ex. l'export ZIP."""
+    return (
+        f'<!DOCTYPE html>\n<html lang="fr"><head><meta charset="utf-8"><title>{escape(title)}</title>'
+        f"<style>{_stylesheet}</style></head>\n<body>{html}</body></html>\n"
+    )
+
+
+def report_etag(analysis_id: str, version: str = TEMPLATE_VERSION) -> str:
+    return f'"{analysis_id}-{version}"'
+
+
+def report_body(analysis_id: str, version: str, render: Callable[[], str],
+                encoding: Optional[str]) -> bytes:
+    """
+    Corps JSON {"report_html": ...} de l'API, déjà compressé selon `encoding`.
+    Le HTML et chaque variante compressée sont gardés dans le cache LRU.
+    """
+    key = (analysis_id, version, encoding or "identity")
+    body = report_cache.get(key)
+    if body is not None:
+        return body
+
+    html = report_cache.get((analysis_id, version))
+    if html is None:
+        html = render()
+        report_cache.put((analysis_id, version), html)
+
+    body = json.dumps({"report_html": html}, ensure_ascii=False).encode("utf-8")
+    body = compress(body, encoding)
+    report_cache.put(key, body)
+    return body
@@ -0,0 +1,165 @@
+# ==========================================================
+# DÉTECTION DE QUASI-DOUBLONS ENTRE SOUMISSIONS (MinHash + LSH)
+# ==========================================================
+# Chaque texte extrait est découpé en fragments de SHINGLE_WORDS mots
+# consécutifs ; la signature MinHash (128 valeurs, calculée en une passe par
+# « one permutation hashing ») estime la similarité de Jaccard entre deux
+# documents. La signature est coupée en 32 bandes de 4 valeurs : deux
+# documents qui partagent une bande deviennent candidats, et seuls les
+# candidats sont comparés. La recherche suit l'index (band, bucket) de la
+# migration 010 au lieu de parcourir tout le corpus.
+#
+# Seuil de détection : (1/32)^(1/4) ≈ 0,42 de similarité ; un document copié
+# avec quelques retouches (similarité > 0,6) est retrouvé presque à coup sûr.
+import hashlib
+import os
+from typing import Optional, Dict, Any, List
+
+from prescreen import normalize_text
+
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() == "true"
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.5"))
+SIMILARITY_MAX_MATCHES = int(os.getenv("SIMILARITY_MAX_MATCHES", "5"))
+# Un texte partagé par des centaines de soumissions (gabarit de cours) ne doit pas exploser la recherche
+SIMILARITY_MAX_CANDIDATES = 500
+
+SHINGLE_WORDS = 5
+NUM_HASHES = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_HASHES // BANDS
+# En dessous, le texte est trop court pour une comparaison fiable
+MIN_SHINGLES = 20
+
+# Hachage 64 bits : 7 bits de poids fort choisissent la case (128 cases), 56 bits servent de valeur
+_BIN_SHIFT = 64 - 7
+_VALUE_MASK = (1 << 56) - 1
+_EMPTY = 1 << 63
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def shingle_hashes(text: str) -> set:
+    words = normalize_text(text).split()
+    return {
+        _hash64(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(max(len(words) - SHINGLE_WORDS + 1, 0))
+    }
+
+
+def minhash_signature(hashes: set) -> Optional[List[int]]:
+    """
+    Signature par « one permutation hashing » : un seul hachage par fragment,
+    le minimum est gardé dans chacune des 128 cases. Une case vide emprunte la
+    valeur de la case pleine suivante, décalée de la distance (densification),
+    pour que deux documents proches gardent des valeurs égales aux mêmes positions.
+    """
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    mins = [_EMPTY] * NUM_HASHES
+    for h in hashes:
+        b = h >> _BIN_SHIFT
+        v = h & _VALUE_MASK
+        if v < mins[b]:
+            mins[b] = v
+    signature = []
+    for i in range(NUM_HASHES):
+        distance = 0
+        while mins[(i + distance) % NUM_HASHES] == _EMPTY:
+            distance += 1
+        signature.append(mins[(i + distance) % NUM_HASHES] + (distance << 56))
+    return signature
+
+
+def document_signature(text: str) -> Optional[Dict[str, Any]]:
+    hashes = shingle_hashes(text)
+    signature = minhash_signature(hashes)
+    if signature is None:
+        return None
+    return {"signature": signature, "shingle_count": len(hashes)}
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(b"".join(v.to_bytes(8, "big") for v in rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+
+async def find_similar(conn, signature: List[int], submission_id: Optional[str] = None,
+                       threshold: float = SIMILARITY_THRESHOLD,
+                       limit: int = SIMILARITY_MAX_MATCHES) -> List[Dict[str, Any]]:
+    """
+    Soumissions indexées dont la similarité estimée atteint `threshold`, les plus
+    proches d'abord. Les dépôts du même étudiant (même courriel) sont ignorés, et
+    une soumission d'un autre cours est anonymisée : le professeur apprend qu'un
+    texte proche existe ailleurs, sans l'identité de l'étudiant ni le projet.
+    """
+    cursor = await conn.execute(
+        """
+        WITH me AS (
+            SELECT professor_id, lower(student_email) AS email FROM submissions WHERE id = %s::uuid
+        ), candidates AS (
+            -- Les candidats qui partagent le plus de bandes sont les plus proches :
+            -- ils passent en premier quand la limite coupe la liste
+            SELECT b.submission_id, count(*) AS shared_bands
+            FROM unnest(%s::smallint[], %s::bigint[]) AS q(band, bucket)
+            JOIN document_lsh_bands b ON b.band = q.band AND b.bucket = q.bucket
+            WHERE b.submission_id IS DISTINCT FROM %s::uuid
+            GROUP BY b.submission_id
+            ORDER BY shared_bands DESC
+            LIMIT %s
+        )
+        SELECT d.submission_id, d.signature, s.student_name, s.project_title, s.submission_date,
+               s.professor_id IS NOT DISTINCT FROM me.professor_id AS same_course
+        FROM candidates c
+        JOIN document_signatures d ON d.submission_id = c.submission_id
+        JOIN submissions s ON s.id = c.submission_id
+        LEFT JOIN me ON true
+        WHERE me.email IS NULL OR lower(s.student_email) <> me.email
+        """,
+        (submission_id, list(range(BANDS)), band_buckets(signature), submission_id, SIMILARITY_MAX_CANDIDATES)
+    )
+    matches = []
+    for other_id, other, student_name, project_title, submission_date, same_course in await cursor.fetchall():
+        similarity = estimate_similarity(signature, other)
+        if similarity < threshold:
+            continue
+        match = {
+            "same_course": same_course,
+            "submission_date": submission_date.isoformat() if submission_date else None,
+            "similarity": round(similarity, 3),
+        }
+        if same_course:
+            match.update(submission_id=str(other_id), student_name=student_name, project_title=project_title)
+        matches.append(match)
+    matches.sort(key=lambda m: m["similarity"], reverse=True)
+    return matches[:limit]
+
+
+async def store_signature(conn, submission_id: str, signature: Dict[str, Any]):
+    """Ajoute ou remplace la signature d'une soumission (à appeler dans la transaction d'écriture)."""
+    await conn.execute(
+        """
+        INSERT INTO document_signatures (submission_id, signature, shingle_count) VALUES (%s, %s, %s)
+        ON CONFLICT (submission_id) DO UPDATE
+        SET signature = EXCLUDED.signature, shingle_count = EXCLUDED.shingle_count, updated_at = now()
+        """,
+        (submission_id, signature["signature"], signature["shingle_count"])
+    )
+    await conn.execute("DELETE FROM document_lsh_bands WHERE submission_id = %s", (submission_id,))
+    await conn.execute(
+        """
+        INSERT INTO document_lsh_bands (band, bucket, submission_id)
+        SELECT q.band, q.bucket, %s FROM unnest(%s::smallint[], %s::bigint[]) AS q(band, bucket)
+        ON CONFLICT DO NOTHING
+        """,
+        (submission_id, list(range(BANDS)), band_buckets(signature["signature"]))
+    )
@@ -0,0 +1,117 @@
+# ==========================================================
+# ADAPTATEURS ASYNCHRONES STOCKAGE / AUTHENTIFICATION
+# ==========================================================
+# Remplacent les appels synchrones du SDK supabase (qui bloquaient la boucle
+# d'événements) par des requêtes sur le client HTTP partagé.
+# STORAGE_BACKEND=local permet de tout faire tourner hors ligne (tests, benchmarks).
+import os
+import shutil
+import asyncio
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+import aiofiles
+
+from http_client import request_with_retries
+
+SUPABASE_URL = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")   # "supabase" ou "local"
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "lancement")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./local_storage")
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+class AuthError(Exception):
+    pass
+
+
+async def _iter_file(path: str):
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _supabase_headers(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    headers = {"apikey": SUPABASE_KEY or "", "Authorization": f"Bearer {SUPABASE_KEY}"}
+    if extra:
+        headers.update(extra)
+    return headers
+
+
+# --- A. STOCKAGE DES FICHIERS ---
+class SupabaseStorage:
+    """Bucket Supabase Storage via son API REST."""
+
+    def __init__(self, bucket: str = STORAGE_BUCKET):
+        self.bucket = bucket
+
+    async def upload(self, object_path: str, local_path: str, content_type: Optional[str] = None):
+        url = f"{SUPABASE_URL}/storage/v1/object/{self.bucket}/{object_path}"
+        headers = _supabase_headers({"Content-Type": content_type or "application/octet-stream", "x-upsert": "false"})
+        response = await request_with_retries(
+            "POST", url, content_factory=lambda: _iter_file(local_path), headers=headers
+        )
+        if response.status_code >= 400:
+            raise StorageError(f"Envoi refusé ({response.status_code}): {response.text[:200]}")
+
+    def public_url(self, object_path: str) -> str:
+        return f"{SUPABASE_URL}/storage/v1/object/public/{self.bucket}/{object_path}"
+
+
+class LocalStorage:
+    """Stockage sur le système de fichiers local ; les URLs publiques sont en file://."""
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, bucket: str = STORAGE_BUCKET):
+        self.root = Path(root).resolve() / bucket
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def upload(self, object_path: str, local_path: str, content_type: Optional[str] = None):
+        destination = self.root / object_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, local_path, destination)
+
+    def public_url(self, object_path: str) -> str:
+        return (self.root / object_path).as_uri()
+
+
+# --- B. AUTHENTIFICATION ---
+class SupabaseAuth:
+    """Connexion par mot de passe via l'API GoTrue de Supabase."""
+
+    async def sign_in_with_password(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'utilisateur Supabase, ou None si les identifiants sont refusés."""
+        url = f"{SUPABASE_URL}/auth/v1/token?grant_type=password"
+        response = await request_with_retries(
+            "POST", url, headers=_supabase_headers(), json={"email": email, "password": password}
+        )
+        if response.status_code in (400, 401, 403):
+            return None
+        if response.status_code >= 400:
+            raise AuthError(f"Supabase Auth indisponible ({response.status_code})")
+        return response.json().get("user")
+
+
+_storage = None
+_auth = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = LocalStorage() if STORAGE_BACKEND == "local" else SupabaseStorage()
+    return _storage
+
+
+def get_auth() -> SupabaseAuth:
+    global _auth
+    if _auth is None:
+        _auth = SupabaseAuth()
+    return _auth
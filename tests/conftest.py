@@ -0,0 +1,6 @@
+# Les modules de l'application sont à la racine du dépôt (pas de paquet) :
+# les tests les importent comme le font main.py et worker.py.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+import math
+import statistics
+
+import pytest
+
+from analytics import ANALYTICS_PERCENTILES, criterion_stats, histogram_percentile
+
+
+def histogram(scores):
+    # Même forme que professor_score_summary.histogram : une case par point, 0..100
+    counts = [0] * 101
+    for score in scores:
+        counts[score] += 1
+    return counts
+
+
+def percentile_cont(scores, percentile):
+    ordered = sorted(scores)
+    position = (len(ordered) - 1) * percentile / 100
+    lower, upper = ordered[math.floor(position)], ordered[math.ceil(position)]
+    return lower + (upper - lower) * (position - math.floor(position))
+
+
+def summary(name, scores):
+    return criterion_stats(name, name, len(scores), sum(scores), sum(s * s for s in scores), histogram(scores))
+
+
+@pytest.mark.parametrize("scores", [[12], [3, 7, 7, 10, 15, 18, 20], [0, 20] * 4, list(range(0, 101, 3))])
+@pytest.mark.parametrize("percentile", [0, 10, 25, 50, 75, 90, 100])
+def test_histogram_percentile_matches_percentile_cont(scores, percentile):
+    assert histogram_percentile(histogram(scores), len(scores), percentile) == pytest.approx(
+        percentile_cont(scores, percentile))
+
+
+def test_criterion_stats():
+    scores = [3, 7, 7, 10, 15, 18, 20]
+    stats = summary("etude_marche", scores)
+
+    assert stats["max"] == 20
+    assert stats["count"] == 7
+    assert stats["mean"] == round(statistics.fmean(scores), 2)
+    assert stats["std"] == round(statistics.pstdev(scores), 2)
+    assert (stats["min_score"], stats["max_score"]) == (3, 20)
+    assert list(stats["percentiles"]) == [f"p{p}" for p in ANALYTICS_PERCENTILES]
+    assert stats["percentiles"]["p50"] == 10
+    iqr = stats["percentiles"]["p75"] - stats["percentiles"]["p25"]
+    assert stats["fences"] == {"low": round(stats["percentiles"]["p25"] - 1.5 * iqr, 2),
+                               "high": round(stats["percentiles"]["p75"] + 1.5 * iqr, 2)}
+
+
+def test_distribution_of_a_criterion_out_of_20():
+    distribution = summary("etude_marche", [3, 7, 7, 20])["distribution"]
+
+    assert len(distribution) == 21
+    assert distribution[7] == {"min": 7, "max": 7, "count": 2}
+    assert sum(bucket["count"] for bucket in distribution) == 4
+
+
+def test_distribution_of_the_global_score():
+    distribution = summary("score_global", [0, 9, 10, 55, 89, 90, 100])["distribution"]
+
+    assert [(bucket["min"], bucket["max"]) for bucket in distribution] == \
+        [(start, start + 9) for start in range(0, 90, 10)] + [(90, 100)]
+    assert [bucket["count"] for bucket in distribution] == [2, 1, 0, 0, 0, 1, 0, 0, 1, 2]
+
+
+def test_small_samples_have_no_fences():
+    assert summary("score_global", [40, 60, 80])["fences"] is None
+
+
+def test_empty_criterion():
+    stats = criterion_stats("score_global", "Score Global", 0, 0, 0, [0] * 101)
+
+    assert stats["mean"] is None and stats["std"] is None and stats["fences"] is None
+    assert stats["percentiles"] == {}
+    assert sum(bucket["count"] for bucket in stats["distribution"]) == 0
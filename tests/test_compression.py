@@ -0,0 +1,97 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+import compression
+from compression import PrecompressedBody, compress, encoded_etag, negotiate_encoding
+
+BODY = ("<html><body>" + "Annuaire des professeurs. " * 200 + "</body></html>").encode()
+
+
+def request(**headers):
+    return Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("deflate", None),
+    ("gzip", "gzip"),
+    ("GZip, deflate", "gzip"),
+    ("gzip;q=1.0, identity; q=0.5", "gzip"),
+])
+def test_negotiate_gzip(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_negotiate_prefers_brotli():
+    pytest.importorskip("brotli")
+
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("br;q=1.0") == "br"
+
+
+def test_negotiate_without_brotli(without_brotli):
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("br") is None
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', None) == '"abc"'
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', "br") == 'W/"abc-br"'
+
+
+def test_compress_round_trip():
+    assert compress(BODY, None) is BODY
+    assert gzip.decompress(compress(BODY, "gzip")) == BODY
+
+
+def test_compress_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+
+    assert brotli.decompress(compress(BODY, "br")) == BODY
+
+
+def test_precompressed_body_serves_the_negotiated_variant():
+    page = PrecompressedBody(BODY, "text/html", "public, max-age=300")
+    response = page.response(request(accept_encoding="gzip"))
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == encoded_etag(page.etag, "gzip")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.body) == BODY
+
+    identity = page.response(request())
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == page.etag
+    assert identity.body == BODY
+
+
+def test_precompressed_body_revalidation():
+    page = PrecompressedBody(BODY, "text/html", "no-cache")
+    gzip_etag = encoded_etag(page.etag, "gzip")
+
+    assert page.response(request(accept_encoding="gzip", if_none_match=gzip_etag)).status_code == 304
+    assert page.response(request(if_none_match=page.etag)).status_code == 304
+    # La copie non compressée d'un cache ne revalide pas la variante gzip, et inversement
+    assert page.response(request(accept_encoding="gzip", if_none_match=page.etag)).status_code == 200
+    assert page.response(request(if_none_match=gzip_etag)).status_code == 200
+
+
+def test_precompressed_body_without_brotli(without_brotli):
+    page = PrecompressedBody(BODY, "text/html", "no-cache")
+
+    assert set(page.sizes()) == {"identity", "gzip"}
+    assert page.response(request(accept_encoding="br, gzip")).headers["content-encoding"] == "gzip"
@@ -0,0 +1,68 @@
+import base64
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from dashboard import InvalidCursorError, dashboard_etag, decode_cursor, encode_cursor, etag_matches
+
+SUBMITTED = datetime(2024, 3, 14, 9, 26, 53, 589793, tzinfo=timezone.utc)
+SUBMISSION_ID = "6f1c2b8e-3d4a-4e5f-9a0b-1c2d3e4f5a6b"
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(SUBMITTED, SUBMISSION_ID)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (SUBMITTED, SUBMISSION_ID)
+
+
+def test_cursor_normalizes_the_submission_id():
+    cursor = encode_cursor(SUBMITTED, SUBMISSION_ID.upper().replace("-", ""))
+
+    assert decode_cursor(cursor)[1] == SUBMISSION_ID
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"2024-03-14T09:26:53").decode(),
+    base64.urlsafe_b64encode(b"hier|" + SUBMISSION_ID.encode()).decode(),
+    base64.urlsafe_b64encode(b"2024-03-14T09:26:53|1; DROP TABLE submissions").decode(),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_a_value_error():
+    assert issubclass(InvalidCursorError, ValueError)
+
+
+@pytest.mark.parametrize("if_none_match, etag, expected", [
+    (None, 'W/"3-abc"', False),
+    ("", 'W/"3-abc"', False),
+    ("*", 'W/"3-abc"', True),
+    ('W/"3-abc"', 'W/"3-abc"', True),
+    ('"3-abc"', 'W/"3-abc"', True),
+    ('W/"3-abc"', '"3-abc"', True),
+    ('W/"2-def", W/"3-abc"', 'W/"3-abc"', True),
+    ('W/"2-def"', 'W/"3-abc"', False),
+    ('"3-abc-gzip"', '"3-abc"', False),
+])
+def test_etag_matches(if_none_match, etag, expected):
+    assert etag_matches(if_none_match, etag) is expected
+
+
+def test_dashboard_etag_depends_on_version_and_parameters():
+    professor_id = str(uuid.uuid4())
+    params = {"limit": 50, "cursor": None, "status": "completed"}
+    etag = dashboard_etag(professor_id, 7, params)
+
+    assert etag.startswith('W/"7-')
+    assert dashboard_etag(professor_id, 7, dict(reversed(list(params.items())))) == etag
+    assert dashboard_etag(professor_id, 7, {"limit": 50, "status": "completed"}) == etag
+    assert dashboard_etag(professor_id, 8, params) != etag
+    assert dashboard_etag(professor_id, 7, {**params, "status": "pending"}) != etag
+    assert dashboard_etag(str(uuid.uuid4()), 7, params) != etag
@@ -0,0 +1,189 @@
+import asyncio
+
+import httpx
+import pytest
+
+import llm_limiter
+from llm_limiter import AdaptiveLLMLimiter, LLMUnavailableError, TokenBucket, _parse_duration
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Nouvelles tentatives immédiates : random.uniform(0, 0)
+    monkeypatch.setattr(llm_limiter, "LLM_BACKOFF_BASE", 0)
+
+
+class Request:
+    """Appel simulé : lève les erreurs données dans l'ordre, puis réussit."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "réponse"
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None), ("", None), ("2.5", 2.5), ("1s", 1), ("250ms", 0.25), ("6m0s", 360), ("1h2m", 3720),
+])
+def test_parse_duration(value, expected):
+    assert _parse_duration(value) == expected
+
+
+def test_token_bucket():
+    bucket = TokenBucket(60)
+
+    assert bucket.delay_for(60) == 0
+    bucket.take(60)
+    assert bucket.delay_for(1) == pytest.approx(1, abs=0.05)
+    # Une demande plus grande que la capacité attend au plus un seau plein
+    assert bucket.delay_for(600) == pytest.approx(60, abs=0.05)
+
+
+def test_token_bucket_sync():
+    bucket = TokenBucket(60)
+    bucket.sync(limit=120, remaining=30)
+
+    assert bucket.capacity == 120
+    assert bucket.level == pytest.approx(30, abs=0.1)
+    bucket.sync(limit=None, remaining=None)
+    assert bucket.capacity == 120
+
+
+def test_call_retries_transient_errors():
+    limiter = AdaptiveLLMLimiter(rpm=1000, tpm=100000)
+    request = Request(httpx.ConnectError("coupure"), httpx.ReadTimeout("délai"))
+
+    assert asyncio.run(limiter.call(request, 10)) == "réponse"
+    assert request.calls == 3
+    assert limiter.stats()["retries"] == 2
+
+
+def test_call_does_not_retry_other_errors():
+    limiter = AdaptiveLLMLimiter(rpm=1000, tpm=100000)
+    request = Request(KeyError("réponse mal formée"))
+
+    with pytest.raises(KeyError):
+        asyncio.run(limiter.call(request, 10))
+    assert request.calls == 1
+
+
+def test_breaker_opens_after_repeated_failures(monkeypatch):
+    monkeypatch.setattr(llm_limiter, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(llm_limiter, "LLM_BREAKER_THRESHOLD", 2)
+    limiter = AdaptiveLLMLimiter(rpm=1000, tpm=100000)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError) as failure:
+            asyncio.run(limiter.call(Request(*[httpx.ConnectError("coupure")] * 2), 10))
+        assert not failure.value.breaker
+
+    request = Request()
+    with pytest.raises(LLMUnavailableError) as refused:
+        asyncio.run(limiter.call(request, 10))
+    assert refused.value.breaker
+    assert request.calls == 0
+    assert limiter.stats()["breaker_open"]
+
+
+def test_success_resets_the_failure_count(monkeypatch):
+    monkeypatch.setattr(llm_limiter, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(llm_limiter, "LLM_BREAKER_THRESHOLD", 2)
+    limiter = AdaptiveLLMLimiter(rpm=1000, tpm=100000)
+
+    for request in (Request(httpx.ConnectError("coupure")), Request(), Request(httpx.ConnectError("coupure"))):
+        try:
+            asyncio.run(limiter.call(request, 10))
+        except LLMUnavailableError:
+            pass
+    assert not limiter.stats()["breaker_open"]
+
+
+def test_coalesce_shares_one_call():
+    limiter = AdaptiveLLMLimiter()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"score": calls}
+
+    async def scenario():
+        return await asyncio.gather(*[limiter.coalesce("texte", factory) for _ in range(5)])
+
+    assert asyncio.run(scenario()) == [{"score": 1}] * 5
+    assert calls == 1
+    assert limiter.stats()["coalesced"] == 4
+    assert limiter.stats()["inflight_coalesced_keys"] == 0
+
+
+def test_coalesce_shares_the_error():
+    limiter = AdaptiveLLMLimiter()
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise LLMUnavailableError("indisponible")
+
+    async def scenario():
+        return await asyncio.gather(*[limiter.coalesce("texte", factory) for _ in range(3)],
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, LLMUnavailableError) for result in asyncio.run(scenario()))
+
+
+def test_coalesce_relaunches_when_the_leader_is_cancelled():
+    limiter = AdaptiveLLMLimiter()
+    calls = 0
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        leader = asyncio.create_task(limiter.coalesce("texte", factory))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(limiter.coalesce("texte", factory))
+        await asyncio.sleep(0)
+        leader.cancel()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 2
+    assert calls == 2
+
+
+def test_coalesce_follower_cancellation_does_not_cancel_the_call():
+    limiter = AdaptiveLLMLimiter()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def factory():
+            await release.wait()
+            return "analyse"
+
+        leader = asyncio.create_task(limiter.coalesce("texte", factory))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(limiter.coalesce("texte", factory))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == "analyse"
@@ -0,0 +1,76 @@
+import json
+
+from partial_json import IncrementalJSONParser
+
+ANALYSIS = {
+    "resume_executif": "Projet solide, \"bien\" structuré : {marché} [local], prix fixés.",
+    "scores": {"score_global": 72, "marche": 15, "finance": 12},
+    "points_forts": ["Étude de marché", "Équipe"],
+    "recommandations": [{"titre": "Trésorerie", "priorite": 1}],
+}
+
+
+def feed_by_chunks(text, size):
+    parser = IncrementalJSONParser()
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend((path, value, i + size) for path, value in parser.feed(text[i:i + size]))
+    return parser, completed
+
+
+def test_members_reported_in_order_once_complete():
+    text = json.dumps(ANALYSIS, ensure_ascii=False)
+    parser, completed = feed_by_chunks(text, 1)
+
+    assert [path for path, _, _ in completed] == [
+        ("resume_executif",),
+        ("scores", "score_global"),
+        ("scores", "marche"),
+        ("scores", "finance"),
+        ("scores",),
+        ("points_forts",),
+        ("recommandations",),
+    ]
+    assert parser.partial == ANALYSIS
+    assert parser.buffer == text
+
+
+def test_member_is_published_before_the_end_of_the_stream():
+    text = json.dumps(ANALYSIS, ensure_ascii=False)
+    _, completed = feed_by_chunks(text, 7)
+
+    summary_end = next(end for path, _, end in completed if path == ("resume_executif",))
+    assert summary_end < len(text) // 2
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    text = json.dumps(ANALYSIS, ensure_ascii=False, indent=2)
+    expected = feed_by_chunks(text, len(text))[1]
+    for size in (1, 2, 3, 5, 64):
+        parser, completed = feed_by_chunks(text, size)
+        assert [(path, value) for path, value, _ in completed] == [(path, value) for path, value, _ in expected]
+        assert parser.partial == json.loads(text)
+
+
+def test_objects_inside_arrays_arrive_with_their_array():
+    parser = IncrementalJSONParser()
+    completed = parser.feed('{"liste": [{"a": 1}, {"b": [2, 3]}], "fin": true}')
+
+    assert completed == [(("liste",), [{"a": 1}, {"b": [2, 3]}]), (("fin",), True)]
+
+
+def test_escaped_quotes_in_keys_and_values():
+    parser = IncrementalJSONParser()
+    parser.feed('{"cl\\"e": "va')
+    assert parser.partial == {}
+    completed = parser.feed('l\\\\eur\\"", "n": null}')
+
+    assert completed == [(('cl"e',), 'val\\eur"'), (("n",), None)]
+
+
+def test_incomplete_member_is_not_reported():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"score": 1') == []
+    assert parser.feed('2') == []
+    assert parser.feed('}') == [(("score",), 12)]
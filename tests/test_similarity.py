@@ -0,0 +1,79 @@
+import random
+
+from similarity import (
+    BANDS, MIN_SHINGLES, NUM_HASHES, SHINGLE_WORDS,
+    band_buckets, document_signature, estimate_similarity, minhash_signature, shingle_hashes,
+)
+
+
+def business_plan(seed, words=400):
+    vocabulary = [f"mot{i}" for i in range(2000)]
+    rng = random.Random(seed)
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def retouch(text, changes, seed=0):
+    words = text.split()
+    rng = random.Random(seed)
+    for i in rng.sample(range(len(words)), changes):
+        words[i] = "retouche"
+    return " ".join(words)
+
+
+def test_shingles_ignore_case_and_accents():
+    text = "Le marché cible est composé de PME québécoises du secteur agroalimentaire"
+
+    assert shingle_hashes(text) == shingle_hashes(text.upper())
+    assert shingle_hashes(text) == shingle_hashes(text.replace("é", "e"))
+    assert len(shingle_hashes(text)) == len(text.split()) - SHINGLE_WORDS + 1
+    assert shingle_hashes("trop court") == set()
+
+
+def test_short_text_has_no_signature():
+    assert document_signature(business_plan(1, words=MIN_SHINGLES + SHINGLE_WORDS - 2)) is None
+    assert minhash_signature(set(range(MIN_SHINGLES - 1))) is None
+
+
+def test_signature_shape():
+    signature = document_signature(business_plan(1))
+
+    assert signature["shingle_count"] == 400 - SHINGLE_WORDS + 1
+    assert len(signature["signature"]) == NUM_HASHES
+    buckets = band_buckets(signature["signature"])
+    assert len(buckets) == BANDS
+    # Stockés dans une colonne bigint
+    assert all(-2 ** 63 <= bucket < 2 ** 63 for bucket in buckets)
+
+
+def test_identical_texts():
+    a = document_signature(business_plan(1))["signature"]
+    b = document_signature(business_plan(1))["signature"]
+
+    assert estimate_similarity(a, b) == 1.0
+    assert band_buckets(a) == band_buckets(b)
+
+
+def test_retouched_copy_is_a_candidate():
+    original = business_plan(1)
+    a = document_signature(original)["signature"]
+    b = document_signature(retouch(original, 8))["signature"]
+
+    assert estimate_similarity(a, b) > 0.6
+    assert set(band_buckets(a)) & set(band_buckets(b))
+
+
+def test_unrelated_texts():
+    a = document_signature(business_plan(1))["signature"]
+    b = document_signature(business_plan(2))["signature"]
+
+    assert estimate_similarity(a, b) < 0.1
+    assert not set(band_buckets(a)) & set(band_buckets(b))
+
+
+def test_estimate_tracks_jaccard_similarity():
+    original = business_plan(3, words=2000)
+    copy = retouch(original, 100, seed=3)
+    a, b = shingle_hashes(original), shingle_hashes(copy)
+    jaccard = len(a & b) / len(a | b)
+
+    assert abs(estimate_similarity(minhash_signature(a), minhash_signature(b)) - jaccard) < 0.15
@@ -0,0 +1,404 @@
+# ==========================================================
+# RÉCEPTION DES FICHIERS DÉPOSÉS (PAR MORCEAUX)
+# ==========================================================
+# Le corps multipart est lu par morceaux : le SHA-256 et la taille sont calculés
+# au fil de l'eau et le contenu est écrit dans un fichier local du répertoire
+# de transit. Ce fichier sert ensuite à l'envoi vers le stockage et est lu
+# directement par le worker d'analyse (plus de second téléchargement).
+# Chaque dépôt a son propre fichier (nommé d'après la soumission une fois
+# celle-ci créée) : deux dépôts d'un même contenu ne se le partagent jamais.
+# Le worker le supprime dès que la soumission atteint un état final ; les
+# fichiers qu'aucun worker local ne reprendra (mode external sur une autre
+# machine, arrêt brutal) sont purgés après UPLOAD_SPOOL_TTL secondes.
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+import aiofiles
+from fastapi import UploadFile
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "lancement-uploads"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+UPLOAD_SPOOL_TTL = int(os.getenv("UPLOAD_SPOOL_TTL", str(6 * 3600)))
+
+os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+class UnsupportedFileError(ValueError):
+    pass
+
+
+class UploadSessionNotFoundError(LookupError):
+    pass
+
+
+class InvalidChunkError(ValueError):
+    pass
+
+
+class IncompleteUploadError(ValueError):
+    def __init__(self, missing: List[int]):
+        super().__init__(f"{len(missing)} morceau(x) manquant(s)")
+        self.missing = missing
+
+
+class SpooledUpload:
+    """Fichier déposé, écrit dans le répertoire de transit sous un nom propre à ce dépôt."""
+
+    def __init__(self, path: str, content_hash: str, size: int, extension: str):
+        self.path = path
+        self.content_hash = content_hash
+        self.size = size
+        self.extension = extension
+
+
+def spool_path(name: str, extension: str) -> str:
+    return os.path.join(UPLOAD_SPOOL_DIR, f"{name}.{extension.lower()}")
+
+
+def _new_spool_path(extension: str) -> str:
+    return spool_path(f"upload-{uuid.uuid4().hex}", extension)
+
+
+def attach_spooled_file(upload: SpooledUpload, submission_id: str):
+    """Renomme le fichier de transit d'après la soumission qui va le référencer."""
+    path = spool_path(submission_id, upload.extension)
+    os.replace(upload.path, path)
+    upload.path = path
+
+
+def discard_upload(upload: SpooledUpload):
+    try:
+        os.remove(upload.path)
+    except OSError:
+        pass
+
+
+def find_spooled_file(submission_id: Optional[str]) -> Optional[str]:
+    """Retourne le fichier local de la soumission, s'il est encore présent."""
+    if not submission_id:
+        return None
+    matches = glob.glob(os.path.join(UPLOAD_SPOOL_DIR, f"{submission_id}.*"))
+    return matches[0] if matches else None
+
+
+def discard_spooled_file(submission_id: Optional[str]):
+    path = find_spooled_file(submission_id)
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def purge_stale_spool(ttl: int = UPLOAD_SPOOL_TTL) -> int:
+    """
+    Supprime les fichiers de transit plus vieux que `ttl` (y compris les écritures
+    interrompues). Le worker se rabat alors sur le téléchargement depuis le stockage.
+    """
+    purged = 0
+    cutoff = time.time() - ttl
+    for entry in os.scandir(UPLOAD_SPOOL_DIR):
+        try:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                purged += 1
+        except FileNotFoundError:
+            pass
+    return purged
+
+
+async def spool_upload(file: UploadFile, extension: str, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Copie le fichier déposé par morceaux dans le répertoire de transit,
+    en calculant son empreinte et en refusant tout dépassement de taille.
+    """
+    await asyncio.to_thread(purge_stale_spool)
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(UPLOAD_SPOOL_DIR, f".partial-{uuid.uuid4().hex}")
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Fichier trop volumineux (max {max_bytes // (1024 * 1024)}MB)")
+                hasher.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    content_hash = hasher.hexdigest()
+    final_path = _new_spool_path(extension)
+    os.replace(tmp_path, final_path)
+    return SpooledUpload(final_path, content_hash, size, extension)
+
+
+# ==========================================================
+# DÉPÔTS REPRENABLES (protocole inspiré de tus)
+# ==========================================================
+# Le client annonce d'abord le fichier (nom et taille) : format et taille sont
+# refusés avant tout envoi. Il envoie ensuite des morceaux de
+# RESUMABLE_CHUNK_BYTES (PATCH avec Upload-Offset), en parallèle et dans
+# n'importe quel ordre. Chaque morceau reçu devient un fichier du répertoire de
+# la session : après une coupure, seuls les morceaux absents sont renvoyés.
+# La finalisation les assemble en un fichier de transit ordinaire (même nommage
+# et même empreinte que spool_upload). Les sessions vivent dans le répertoire
+# de transit, qui doit donc être partagé par tous les processus web.
+RESUMABLE_CHUNK_BYTES = int(os.getenv("RESUMABLE_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+UPLOAD_SESSIONS_DIR = os.path.join(UPLOAD_SPOOL_DIR, "sessions")
+ALLOWED_EXTENSIONS = ("pdf", "doc", "docx")
+
+# Signature en tête de fichier de chaque format, vérifiée dès le premier morceau
+FILE_SIGNATURES = {"pdf": b"%PDF", "docx": b"PK\x03\x04", "doc": b"\xd0\xcf\x11\xe0"}
+
+os.makedirs(UPLOAD_SESSIONS_DIR, exist_ok=True)
+
+
+def validate_upload(file_name: str, file_size: int, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Retourne l'extension du fichier annoncé, ou lève une erreur avant tout envoi."""
+    extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+    if extension not in ALLOWED_EXTENSIONS:
+        raise UnsupportedFileError("Format de fichier non supporté.")
+    if file_size <= 0:
+        raise UnsupportedFileError("Fichier vide.")
+    if file_size > max_bytes:
+        raise UploadTooLargeError(f"Fichier trop volumineux (max {max_bytes // (1024 * 1024)}MB)")
+    return extension
+
+
+class UploadSession:
+    """Dépôt en cours : métadonnées figées à la création, un fichier par morceau reçu."""
+
+    def __init__(self, upload_id: str, file_name: str, file_size: int, content_type: Optional[str],
+                 chunk_size: int, created_at: float, fields: Dict[str, str]):
+        self.upload_id = upload_id
+        self.file_name = file_name
+        self.file_size = file_size
+        self.content_type = content_type
+        self.chunk_size = chunk_size
+        self.created_at = created_at
+        # Champs du formulaire, repris tels quels à la création de la soumission
+        self.fields = fields
+
+    @property
+    def path(self) -> str:
+        return os.path.join(UPLOAD_SESSIONS_DIR, self.upload_id)
+
+    @property
+    def extension(self) -> str:
+        return self.file_name.rsplit(".", 1)[-1].lower()
+
+    @property
+    def chunk_count(self) -> int:
+        return -(-self.file_size // self.chunk_size)
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.file_size - index * self.chunk_size)
+
+    def chunk_path(self, index: int) -> str:
+        return os.path.join(self.path, f"{index:05d}.part")
+
+    def received_chunks(self) -> List[int]:
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            raise UploadSessionNotFoundError(self.upload_id)
+        return sorted(int(name[:-5]) for name in names if name.endswith(".part"))
+
+    def missing_chunks(self) -> List[int]:
+        received = set(self.received_chunks())
+        return [index for index in range(self.chunk_count) if index not in received]
+
+    def describe(self) -> Dict[str, Any]:
+        missing = self.missing_chunks()
+        received_bytes = sum(self.chunk_length(index) for index in range(self.chunk_count) if index not in missing)
+        return {
+            "upload_id": self.upload_id,
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "chunk_size": self.chunk_size,
+            "chunk_count": self.chunk_count,
+            "missing": missing,
+            "received_bytes": received_bytes,
+            "expires_at": self.created_at + UPLOAD_SESSION_TTL,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "file_name": self.file_name, "file_size": self.file_size, "content_type": self.content_type,
+            "chunk_size": self.chunk_size, "created_at": self.created_at, "fields": self.fields,
+        }, ensure_ascii=False)
+
+
+def _session_dir(upload_id: str) -> str:
+    # L'identifiant vient de l'URL : seul un UUID peut désigner un répertoire de session
+    try:
+        return os.path.join(UPLOAD_SESSIONS_DIR, uuid.UUID(upload_id).hex)
+    except ValueError:
+        raise UploadSessionNotFoundError(upload_id)
+
+
+def purge_expired_sessions(ttl: int = UPLOAD_SESSION_TTL) -> int:
+    """Supprime les dépôts abandonnés ; appelé à chaque création de session."""
+    purged = 0
+    cutoff = time.time() - ttl
+    for entry in os.scandir(UPLOAD_SESSIONS_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                purged += 1
+        except FileNotFoundError:
+            pass
+    return purged
+
+
+async def create_upload_session(file_name: str, file_size: int, content_type: Optional[str],
+                                fields: Dict[str, str]) -> UploadSession:
+    validate_upload(file_name, file_size)
+    await asyncio.to_thread(purge_expired_sessions)
+    await asyncio.to_thread(purge_stale_spool)
+    session = UploadSession(uuid.uuid4().hex, file_name, file_size, content_type, RESUMABLE_CHUNK_BYTES,
+                            time.time(), fields)
+    os.makedirs(session.path)
+    async with aiofiles.open(os.path.join(session.path, "session.json"), "w", encoding="utf-8") as out:
+        await out.write(session.to_json())
+    return session
+
+
+async def load_upload_session(upload_id: str) -> UploadSession:
+    path = _session_dir(upload_id)
+    try:
+        async with aiofiles.open(os.path.join(path, "session.json"), encoding="utf-8") as f:
+            data = json.loads(await f.read())
+    except FileNotFoundError:
+        raise UploadSessionNotFoundError(upload_id)
+    if time.time() - data["created_at"] > UPLOAD_SESSION_TTL:
+        discard_upload_session(upload_id)
+        raise UploadSessionNotFoundError(upload_id)
+    return UploadSession(os.path.basename(path), data["file_name"], data["file_size"], data["content_type"],
+                         data["chunk_size"], data["created_at"], data["fields"])
+
+
+async def receive_chunk(session: UploadSession, offset: int, body: AsyncIterator[bytes]) -> int:
+    """
+    Écrit un morceau lu en flux depuis le corps de la requête. Le morceau n'est
+    visible (compté comme reçu) qu'une fois complet. Retourne l'offset atteint.
+    """
+    if offset < 0 or offset % session.chunk_size or offset >= session.file_size:
+        raise InvalidChunkError(f"Upload-Offset invalide : multiple de {session.chunk_size} attendu.")
+    index = offset // session.chunk_size
+    expected = session.chunk_length(index)
+    tmp_path = os.path.join(session.path, f".{index:05d}-{uuid.uuid4().hex}.tmp")
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            async for data in body:
+                if index == 0 and size == 0 and data:
+                    signature = FILE_SIGNATURES[session.extension]
+                    if not data.startswith(signature[:len(data)]):
+                        raise UnsupportedFileError("Le contenu ne correspond pas au format annoncé.")
+                size += len(data)
+                if size > expected:
+                    raise InvalidChunkError(f"Morceau trop long ({expected} octets attendus).")
+                await out.write(data)
+        if size != expected:
+            raise InvalidChunkError(f"Morceau incomplet : {size} octets reçus sur {expected}.")
+        # Un morceau renvoyé après une coupure remplace simplement le précédent
+        os.replace(tmp_path, session.chunk_path(index))
+    except FileNotFoundError:
+        # Session finalisée ou abandonnée pendant l'envoi
+        raise UploadSessionNotFoundError(session.upload_id)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return offset + size
+
+
+def _assemble(session: UploadSession, path: str) -> SpooledUpload:
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(UPLOAD_SPOOL_DIR, f".partial-{uuid.uuid4().hex}")
+    try:
+        with open(tmp_path, "wb") as out:
+            for index in range(session.chunk_count):
+                with open(os.path.join(path, f"{index:05d}.part"), "rb") as part:
+                    while True:
+                        chunk = part.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        hasher.update(chunk)
+                        out.write(chunk)
+        if size != session.file_size:
+            raise InvalidChunkError(f"Taille assemblée {size} différente de la taille annoncée {session.file_size}.")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    content_hash = hasher.hexdigest()
+    final_path = _new_spool_path(session.extension)
+    os.replace(tmp_path, final_path)
+    return SpooledUpload(final_path, content_hash, size, session.extension)
+
+
+def _assembling_dir(session: UploadSession) -> str:
+    return os.path.join(UPLOAD_SESSIONS_DIR, f".{session.upload_id}.assembling")
+
+
+async def assemble_upload(session: UploadSession) -> SpooledUpload:
+    """
+    Assemble les morceaux en un fichier de transit. Le répertoire est d'abord
+    renommé : une seule finalisation concurrente aboutit, et un morceau arrivé
+    trop tard est refusé. Les morceaux restent en place jusqu'à
+    close_upload_session (soumission créée) ou restore_upload_session (échec).
+    """
+    missing = session.missing_chunks()
+    if missing:
+        raise IncompleteUploadError(missing)
+    assembling = _assembling_dir(session)
+    try:
+        os.rename(session.path, assembling)
+    except FileNotFoundError:
+        raise UploadSessionNotFoundError(session.upload_id)
+    try:
+        # Lecture, empreinte et écriture des 15 Mo au plus : hors de la boucle d'événements
+        return await asyncio.to_thread(_assemble, session, assembling)
+    except BaseException:
+        restore_upload_session(session)
+        raise
+
+
+def restore_upload_session(session: UploadSession):
+    """La session redevient utilisable : le client peut retenter la finalisation."""
+    assembling = _assembling_dir(session)
+    if os.path.isdir(assembling):
+        os.rename(assembling, session.path)
+
+
+def close_upload_session(session: UploadSession):
+    shutil.rmtree(_assembling_dir(session), ignore_errors=True)
+
+
+def discard_upload_session(upload_id: str):
+    shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
@@ -0,0 +1,20 @@
+# ==========================================================
+# WORKER UVICORN POUR GUNICORN (voir gunicorn.conf.py)
+# ==========================================================
+# Le worker fourni par uvicorn attend sans limite la fin des connexions à
+# l'arrêt : un flux SSE ouvert (tableau de bord) retarderait alors l'arrêt des
+# analyses jusqu'au SIGKILL. Les connexions ont ici WEB_CONNECTION_DRAIN_SECONDS
+# pour se terminer (les clients SSE se reconnectent seuls), puis le lifespan de
+# main.py arrête proprement les workers d'analyse.
+import os
+
+from uvicorn.workers import UvicornWorker
+
+WEB_CONNECTION_DRAIN_SECONDS = int(os.getenv("WEB_CONNECTION_DRAIN_SECONDS", "5"))
+
+
+class LancementUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "timeout_graceful_shutdown": WEB_CONNECTION_DRAIN_SECONDS,
+    }
@@ -0,0 +1,61 @@
+# ==========================================================
+# PROCESSUS WORKER D'ANALYSE (entrée `worker` du Procfile)
+# ==========================================================
+# Consomme la file des soumissions hors du processus web.
+# Dans ce mode, lancer le web avec ANALYSIS_WORKER_MODE=external.
+import asyncio
+import os
+import signal
+
+from prometheus_client import start_http_server
+
+from database import open_pool, close_pool
+from http_client import open_http_client, close_http_client
+from job_queue import AnalysisWorkerPool, ANALYSIS_WORKERS, queue_depth
+from ai_analyzer import open_llm_client, close_llm_client
+from extraction import shutdown_executor
+from metrics import QUEUE_DEPTH
+
+# Port d'exposition des métriques Prometheus du worker (désactivé si vide)
+WORKER_METRICS_PORT = os.getenv("WORKER_METRICS_PORT", "")
+
+
+async def run_worker():
+    await open_pool()
+    await open_http_client()
+    open_llm_client()
+    workers = AnalysisWorkerPool(ANALYSIS_WORKERS)
+    stop_event = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    if WORKER_METRICS_PORT:
+        start_http_server(int(WORKER_METRICS_PORT))
+        print(f"--- INFO: Métriques du worker sur le port {WORKER_METRICS_PORT} ---")
+
+    try:
+        await workers.start()
+        while not stop_event.is_set():
+            try:
+                depth = await queue_depth()
+                for status, count in depth.items():
+                    QUEUE_DEPTH.labels(status=status).set(count)
+            except Exception as e:
+                print(f"--- ERREUR: Lecture de la file impossible: {e} ---")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await workers.stop()
+        shutdown_executor()
+        await close_llm_client()
+        await close_http_client()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    print("--- INFO: Démarrage du worker d'analyse ---")
+    asyncio.run(run_worker())